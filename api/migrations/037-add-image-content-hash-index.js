@@ -0,0 +1,159 @@
+'use strict';
+
+/**
+ * Migration: Add content_hash_extracted Generated Column
+ *
+ * The Python service deduplicates extracted PDF images by content hash
+ * (metadata.content_hash). It looks up the hashes of one document per upload:
+ * - Adds a generated column that extracts content_hash from JSON metadata
+ * - Creates a (kb_id, content_hash_extracted) index so the lookup does not
+ *   scan every image of the KB
+ *
+ * Idempotent - can be run multiple times safely
+ */
+
+module.exports = {
+  up: async (queryInterface, Sequelize) => {
+    const db = queryInterface.sequelize;
+
+    try {
+      console.log('Starting content_hash_extracted migration...');
+
+      // =================================================================
+      // 1. Check if table exists
+      // =================================================================
+      console.log('Checking if yovo_tbl_aiva_images table exists...');
+
+      const [tables] = await db.query(`
+        SELECT TABLE_NAME
+        FROM information_schema.TABLES
+        WHERE table_schema = DATABASE()
+          AND table_name = 'yovo_tbl_aiva_images'
+      `);
+
+      if (tables.length === 0) {
+        console.log('⚠ Table yovo_tbl_aiva_images does not exist, skipping migration');
+        return;
+      }
+
+      console.log('✓ Table yovo_tbl_aiva_images exists');
+
+      // =================================================================
+      // 2. Add generated column
+      // =================================================================
+      console.log('Checking content_hash_extracted column...');
+
+      const [columns] = await db.query(`
+        SELECT COLUMN_NAME
+        FROM information_schema.COLUMNS
+        WHERE table_schema = DATABASE()
+          AND table_name = 'yovo_tbl_aiva_images'
+          AND column_name = 'content_hash_extracted'
+      `);
+
+      if (columns.length === 0) {
+        console.log('Adding content_hash_extracted generated column...');
+        await db.query(`
+          ALTER TABLE yovo_tbl_aiva_images
+          ADD COLUMN content_hash_extracted VARCHAR(64)
+          GENERATED ALWAYS AS (JSON_UNQUOTE(JSON_EXTRACT(metadata, '$.content_hash'))) STORED
+          COMMENT 'Extracted image content hash for PDF image deduplication lookups'
+        `);
+        console.log('✓ Added content_hash_extracted column');
+      } else {
+        console.log('✓ Column content_hash_extracted already exists, skipping');
+      }
+
+      // =================================================================
+      // 3. Create index for fast lookups
+      // =================================================================
+      await ensureIndexExists(db);
+
+      console.log('✓ content_hash_extracted migration completed successfully!');
+
+    } catch (error) {
+      console.error('✗ Migration failed:', error);
+      throw error;
+    }
+  },
+
+  down: async (queryInterface, Sequelize) => {
+    const db = queryInterface.sequelize;
+
+    try {
+      console.log('Rolling back content_hash_extracted migration...');
+
+      // =================================================================
+      // 1. Drop index first (if exists)
+      // =================================================================
+      console.log('Dropping index idx_image_content_hash...');
+
+      try {
+        await db.query(`
+          DROP INDEX idx_image_content_hash ON yovo_tbl_aiva_images
+        `);
+        console.log('✓ Dropped index idx_image_content_hash');
+      } catch (error) {
+        if (error.original && (error.original.errno === 1091 || error.original.code === 'ER_CANT_DROP_FIELD_OR_KEY')) {
+          console.log('⚠ Index idx_image_content_hash does not exist, skipping');
+        } else {
+          throw error;
+        }
+      }
+
+      // =================================================================
+      // 2. Drop generated column
+      // =================================================================
+      console.log('Dropping content_hash_extracted column...');
+
+      try {
+        await db.query(`
+          ALTER TABLE yovo_tbl_aiva_images
+          DROP COLUMN content_hash_extracted
+        `);
+        console.log('✓ Dropped content_hash_extracted column');
+      } catch (error) {
+        if (error.original && (error.original.errno === 1091 || error.original.code === 'ER_CANT_DROP_FIELD_OR_KEY')) {
+          console.log('⚠ Column content_hash_extracted does not exist, skipping');
+        } else {
+          throw error;
+        }
+      }
+
+      console.log('✓ content_hash_extracted rollback completed successfully!');
+
+    } catch (error) {
+      console.error('✗ Rollback failed:', error);
+      throw error;
+    }
+  }
+};
+
+/**
+ * Helper function to ensure index exists
+ */
+async function ensureIndexExists(db) {
+  console.log('Checking if index idx_image_content_hash exists...');
+
+  const [indexes] = await db.query(`
+    SELECT INDEX_NAME
+    FROM information_schema.STATISTICS
+    WHERE table_schema = DATABASE()
+      AND table_name = 'yovo_tbl_aiva_images'
+      AND index_name = 'idx_image_content_hash'
+  `);
+
+  if (indexes.length > 0) {
+    console.log('✓ Index idx_image_content_hash already exists');
+    return;
+  }
+
+  console.log('Creating index idx_image_content_hash...');
+
+  await db.query(`
+    CREATE INDEX idx_image_content_hash
+    ON yovo_tbl_aiva_images (kb_id, content_hash_extracted)
+  `);
+
+  console.log('✓ Successfully created index idx_image_content_hash');
+}
@@ -1178,9 +1178,12 @@ async listDocumentsWithStatus(kbId, options = {}) {
 
     // Delete from Python service (vectors, chunks)
     try {
-      await PythonServiceClient.deleteImage(kbId, imageId);
-	  const filename = image.storage_url.startsWith('/etc/aiva-oai') ? image.storage_url : process.env.APP_BASE_URL + image.storage_url
-      await fs.unlink(filename);
+      const result = await PythonServiceClient.deleteImage(kbId, imageId);
+	  // Identical images extracted from several documents share one file
+	  if (!result?.file_shared) {
+	    const filename = image.storage_url.startsWith('/etc/aiva-oai') ? image.storage_url : process.env.APP_BASE_URL + image.storage_url
+        await fs.unlink(filename);
+	  }
 	  return true;
 	} catch (error) {
       console.error(`Failed to delete from Python service:`, error);
@@ -40,14 +40,19 @@ class Settings(BaseSettings):
     # Query Expansion - Rule-based synonym/variation expansion (FREE - no API cost)
     ENABLE_QUERY_EXPANSION: bool = bool(os.getenv('ENABLE_QUERY_EXPANSION', 'false').lower() == 'true')
     QUERY_EXPANSION_MAX_VARIATIONS: int = int(os.getenv('QUERY_EXPANSION_MAX_VARIATIONS', '5'))
+    # Multi-query retrieval - embed expansion variants in one batch, fuse rankings with RRF
+    ENABLE_MULTI_QUERY_RETRIEVAL: bool = bool(os.getenv('ENABLE_MULTI_QUERY_RETRIEVAL', 'false').lower() == 'true')
     
     # Query Rewriting - LLM-based context-aware query improvement (COST: ~$0.001/query)
     ENABLE_QUERY_REWRITING: bool = True #bool = bool(os.getenv('ENABLE_QUERY_REWRITING', 'false').lower() == 'true')
     QUERY_REWRITER_MODEL: str = os.getenv('QUERY_REWRITER_MODEL', 'gpt-4o-mini')
+    ENABLE_QUERY_REWRITE_CACHE: bool = bool(os.getenv('ENABLE_QUERY_REWRITE_CACHE', 'true').lower() == 'true')
+    QUERY_REWRITE_CACHE_TTL: int = int(os.getenv('QUERY_REWRITE_CACHE_TTL', '3600'))  # Seconds
     
     # BM25 Keyword Search - Hybrid semantic + keyword retrieval (FREE)
     ENABLE_BM25_SEARCH: bool = bool(os.getenv('ENABLE_BM25_SEARCH', 'false').lower() == 'true')
     BM25_WEIGHT: float = float(os.getenv('BM25_WEIGHT', '0.3'))  # 0.3 = 30% BM25, 70% vector
+    BM25_MAX_POSTINGS_PER_TERM: int = int(os.getenv('BM25_MAX_POSTINGS_PER_TERM', '1000'))  # Best chunks read per query term
     
     # MMR Diversity - Avoid duplicate/similar chunks (FREE)
     ENABLE_MMR_DIVERSITY: bool = bool(os.getenv('ENABLE_MMR_DIVERSITY', 'false').lower() == 'true')
@@ -59,8 +64,16 @@ class Settings(BaseSettings):
     
     # Reranking - Cross-encoder or LLM reranking (COST: varies by type)
     ENABLE_RERANKING: bool = bool(os.getenv('ENABLE_RERANKING', 'false').lower() == 'true')
-    RERANKER_TYPE: str = os.getenv('RERANKER_TYPE', 'simple')  # 'simple', 'llm', or 'hybrid'
+    RERANKER_TYPE: str = os.getenv('RERANKER_TYPE', 'simple')  # 'simple', 'cross_encoder', 'llm', or 'hybrid'
     RERANKER_MODEL: str = os.getenv('RERANKER_MODEL', 'gpt-4o-mini')
+    RERANKER_MODE: str = os.getenv('RERANKER_MODE', 'listwise')  # 'listwise' (1 call) or 'pointwise' (1 call per result)
+    RERANKER_LISTWISE_MAX_CHARS: int = int(os.getenv('RERANKER_LISTWISE_MAX_CHARS', '600'))
+    ENABLE_RERANK_CACHE: bool = bool(os.getenv('ENABLE_RERANK_CACHE', 'true').lower() == 'true')
+    RERANK_CACHE_TTL: int = int(os.getenv('RERANK_CACHE_TTL', '3600'))
+    # Local cross-encoder (RERANKER_TYPE=cross_encoder), loaded at startup
+    CROSS_ENCODER_MODEL_PATH: str = os.getenv('CROSS_ENCODER_MODEL_PATH', '')  # Required: local model directory
+    CROSS_ENCODER_MAX_LENGTH: int = int(os.getenv('CROSS_ENCODER_MAX_LENGTH', '256'))
+    CROSS_ENCODER_BATCH_SIZE: int = int(os.getenv('CROSS_ENCODER_BATCH_SIZE', '64'))
     
     # Content-Aware Chunking - Intelligent chunking based on content type (FREE)
     ENABLE_CONTENT_AWARE_CHUNKING: bool = bool(os.getenv('ENABLE_CONTENT_AWARE_CHUNKING', 'false').lower() == 'true')
@@ -74,6 +87,13 @@ class Settings(BaseSettings):
     #          and penalize chunks that just mention PO in wrong context (like GRN)
     ENABLE_INTENT_FILTER: bool = bool(os.getenv('ENABLE_INTENT_FILTER', 'true').lower() == 'true')  # ON by default!
     ENABLE_CONTEXT_ENRICHMENT: bool = bool(os.getenv('ENABLE_CONTEXT_ENRICHMENT', 'true').lower() == 'true')  # ON by default!
+    # Log a structured SLOW_QUERY record (per-stage timings) above this many ms (0 = off)
+    SLOW_QUERY_THRESHOLD_MS: int = int(os.getenv('SLOW_QUERY_THRESHOLD_MS', '2000'))
+    # GET /metrics needs the API key (X-API-Key or Authorization: Bearer) unless public
+    METRICS_PUBLIC: bool = bool(os.getenv('METRICS_PUBLIC', 'false').lower() == 'true')
+    # Per-tenant intent keyword packs (JSON file) and per-chunk keyword profile cache size
+    INTENT_KEYWORD_PACKS_FILE: str = os.getenv('INTENT_KEYWORD_PACKS_FILE', '')
+    INTENT_PROFILE_CACHE_SIZE: int = int(os.getenv('INTENT_PROFILE_CACHE_SIZE', '10000'))
 
     
     # OpenAI
@@ -84,10 +104,20 @@ class Settings(BaseSettings):
     # Embedding
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     EMBEDDING_DIMENSION: int = 1536
+    # Ingestion batcher: requests packed by token budget, run concurrently under a shared rate limit
+    EMBEDDING_BATCH_MAX_TOKENS: int = int(os.getenv('EMBEDDING_BATCH_MAX_TOKENS', '100000'))
+    EMBEDDING_BATCH_MAX_ITEMS: int = int(os.getenv('EMBEDDING_BATCH_MAX_ITEMS', '512'))
+    EMBEDDING_CONCURRENCY: int = int(os.getenv('EMBEDDING_CONCURRENCY', '4'))
+    EMBEDDING_REQUESTS_PER_MINUTE: int = int(os.getenv('EMBEDDING_REQUESTS_PER_MINUTE', '3000'))  # 0 = unlimited
+    EMBEDDING_TOKENS_PER_MINUTE: int = int(os.getenv('EMBEDDING_TOKENS_PER_MINUTE', '1000000'))  # 0 = unlimited
     
     # CLIP
     CLIP_MODEL: str = "ViT-B/32"
     USE_GPU: bool = False
+    CLIP_BATCH_SIZE: int = int(os.getenv('CLIP_BATCH_SIZE', '16'))  # Images per forward pass
+    CLIP_BATCH_MEMORY_MB: int = int(os.getenv('CLIP_BATCH_MEMORY_MB', '512'))  # Estimated pixels + activations per batch
+    # Concurrent single-image/text requests arriving within this window share one forward pass (0 = off)
+    CLIP_MICROBATCH_WINDOW_MS: float = float(os.getenv('CLIP_MICROBATCH_WINDOW_MS', '10'))
     
     # Processing
     MAX_CHUNK_SIZE: int = 2000
@@ -95,6 +125,15 @@ class Settings(BaseSettings):
     DEFAULT_CHUNK_OVERLAP: int = 50
     MAX_WORKERS: int = 4
     PROCESSING_TIMEOUT: int = 300
+    # Rows per executemany / commands per Redis pipeline when storing chunks
+    STORE_BATCH_SIZE: int = int(os.getenv('STORE_BATCH_SIZE', '500'))
+    # Streaming PDF ingestion: extract -> chunk -> embed -> store in page batches
+    ENABLE_STREAMING_PIPELINE: bool = bool(os.getenv('ENABLE_STREAMING_PIPELINE', 'true').lower() == 'true')
+    PIPELINE_PAGE_BATCH: int = int(os.getenv('PIPELINE_PAGE_BATCH', '10'))  # Pages per batch
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv('PIPELINE_QUEUE_SIZE', '2'))  # Batches buffered between stages
+    # Checkpoint ingestion stages under STORAGE_PATH/checkpoints so retries resume
+    ENABLE_INGEST_CHECKPOINTS: bool = bool(os.getenv('ENABLE_INGEST_CHECKPOINTS', 'true').lower() == 'true')
+    CHECKPOINT_TTL_HOURS: int = int(os.getenv('CHECKPOINT_TTL_HOURS', '72'))
     
     # File Limits
     MAX_FILE_SIZE_MB: int = 50
@@ -103,6 +142,19 @@ class Settings(BaseSettings):
     STORAGE_PATH: str = "/etc/aiva-oai/storage"
     
     IMAGE_PROCESSING_CONCURRENCY: int = int(os.getenv('IMAGE_PROCESSING_CONCURRENCY', '1'))
+    # PDF image extraction: smaller images (icons, bullets, spacers) are skipped
+    PDF_IMAGE_MIN_SIDE: int = int(os.getenv('PDF_IMAGE_MIN_SIDE', '32'))  # Pixels
+    PDF_IMAGE_MIN_AREA: int = int(os.getenv('PDF_IMAGE_MIN_AREA', '4096'))  # Pixels (width x height)
+    PDF_IMAGE_MIN_BYTES: int = int(os.getenv('PDF_IMAGE_MIN_BYTES', '1024'))
+    
+    # Durable job queue (Redis Streams) + ingest workers (python -m app.worker)
+    ENABLE_JOB_QUEUE: bool = bool(os.getenv('ENABLE_JOB_QUEUE', 'false').lower() == 'true')
+    INGEST_WORKER_CONCURRENCY: int = int(os.getenv('INGEST_WORKER_CONCURRENCY', '2'))  # Jobs per worker process
+    JOB_VISIBILITY_TIMEOUT: int = int(os.getenv('JOB_VISIBILITY_TIMEOUT', '600'))  # Seconds without heartbeat before reclaim
+    JOB_MAX_ATTEMPTS: int = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))  # Then dead-lettered
+    JOB_RETRY_BACKOFF: int = int(os.getenv('JOB_RETRY_BACKOFF', '30'))  # Seconds, doubled per attempt
+    INGEST_WORKER_METRICS_PORT: int = int(os.getenv('INGEST_WORKER_METRICS_PORT', '0'))  # Worker's own exporter (0 = off)
+    INGEST_WORKER_METRICS_HOST: str = os.getenv('INGEST_WORKER_METRICS_HOST', '127.0.0.1')
     
     # Logging
     LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
@@ -117,6 +169,17 @@ class Settings(BaseSettings):
 
     TABLE_VISION_MODEL: str = "gpt-4o"  # Vision model for table extraction
     USE_VISION_FOR_TABLES: bool = True 
+    # Local pre-pass: only pages with likely tables go to vision, cropped to the table area
+    TABLE_PREFILTER: bool = True
+    TABLE_CROP_PADDING: int = 16  # PDF points around detected tables
+    TABLE_VISION_CONCURRENCY: int = 4  # Vision requests in flight per document
+    TABLE_VISION_REQUESTS_PER_MINUTE: int = 500  # Shared by all documents in the process, 0 = unlimited
+    TABLE_VISION_TOKENS_PER_MINUTE: int = 450000  # Image + prompt input tokens, 0 = unlimited
+    ENABLE_TABLE_VISION_CACHE: bool = True  # Cache by rendered page hash - reprocessing makes no vision calls
+    TABLE_VISION_CACHE_TTL: int = 30 * 24 * 3600  # Seconds
+    TABLE_TEXT_BATCH_SIZE: int = 8  # Distinct tables converted to text per LLM request
+    ENABLE_TABLE_TEXT_CACHE: bool = True  # Cache descriptions by normalized table markdown hash
+    TABLE_TEXT_CACHE_TTL: int = 90 * 24 * 3600  # Seconds
 
     class Config:
         env_file = ".env"
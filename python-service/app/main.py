@@ -11,7 +11,11 @@ from datetime import datetime
 
 from app.config import settings
 from app.routes import health, documents, search, images
+from app.utils.metrics import observe_http, mark_worker_dead
+from app.services.extraction_pool import shutdown_extraction_pool
+from starlette.routing import Match
 import sys
+import time
 
 # Configure logging
 logging.basicConfig(
@@ -61,6 +65,13 @@ async def lifespan(app: FastAPI):
     logger.info("✓ CLIP model loaded and ready!")
     logger.info("=" * 60)
     
+    if settings.ENABLE_RERANKING and settings.RERANKER_TYPE == "cross_encoder":
+        # Load the cross-encoder now (off the event loop) rather than in the first search
+        from app.services.reranker import get_reranker
+        import asyncio
+        await asyncio.to_thread(get_reranker)
+        logger.info("✓ Cross-encoder reranker loaded")
+    
     from app.services.scrape_sync_service import get_scrape_sync_service
     import asyncio
     
@@ -86,6 +97,8 @@ async def lifespan(app: FastAPI):
     # Shutdown: Cleanup
     logger.info("Shutting down: Cleaning up resources...")
     _image_processor = None
+    shutdown_extraction_pool()
+    mark_worker_dead()
 
 # Create FastAPI app with lifespan
 app = FastAPI(
@@ -107,11 +120,16 @@ app.add_middleware(
 # API Key authentication middleware
 @app.middleware("http")
 async def verify_api_key(request: Request, call_next):
-    # Skip auth for health check
-    if request.url.path == "/health":
+    # Skip auth for health check (and the metrics scrape if METRICS_PUBLIC)
+    if request.url.path == "/health" or (request.url.path == "/metrics" and settings.METRICS_PUBLIC):
         return await call_next(request)
     
     api_key = request.headers.get("X-API-Key")
+    if not api_key and request.url.path == "/metrics":
+        # Prometheus scrape configs send credentials as a bearer token
+        authorization = request.headers.get("Authorization", "")
+        if authorization.startswith("Bearer "):
+            api_key = authorization[len("Bearer "):]
     
     if not api_key or api_key != settings.PYTHON_API_KEY:
         return JSONResponse(
@@ -125,6 +143,26 @@ async def verify_api_key(request: Request, call_next):
     
     return await call_next(request)
 
+def _route_template(request: Request) -> str:
+    """Route path template (e.g. /api/v1/kb/{kb_id}/stats) to keep label cardinality low"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", request.url.path)
+    return "unmatched"
+
+# Request latency metrics (outermost middleware - includes auth failures)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        observe_http(request.method, _route_template(request), status, time.perf_counter() - start)
+
 # Exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
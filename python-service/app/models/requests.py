@@ -20,6 +20,7 @@ class SearchRequest(BaseModel):
     search_type: str = Field("hybrid", pattern="^(text|image|hybrid)$")
     filters: Optional[Dict[str, Any]] = Field(default={}, description="Additional filters")
     conversation_history: Optional[List[Dict[str, str]]] = Field(default=None, description="Conversation history for contextual query rewriting")
+    tenant_id: Optional[str] = Field(None, description="Tenant ID (selects intent keyword pack)")
 
 
 class EmbeddingRequest(BaseModel):
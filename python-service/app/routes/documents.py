@@ -13,6 +13,7 @@ from typing import Dict, Any, Optional
 from pydantic import BaseModel
 import logging
 import asyncio
+import os
 import random
 
 logger = logging.getLogger(__name__)
@@ -23,6 +24,9 @@ from app.services.document_processor import DocumentProcessor
 from app.utils.cost_tracking import CostTracker
 from app.services.web_scraper import WebScraper
 from app.services.document_job_processor import get_document_job_processor
+from app.services.job_queue import JobQueue, get_job_queue
+from app.config import settings
+from app.utils.uploads import UploadTooLarge, read_upload, save_upload
 from app.services.scrape_sync_service import get_scrape_sync_service
 
 router = APIRouter()
@@ -128,22 +132,19 @@ async def upload_document(
         # Parse metadata
         metadata_dict = json.loads(metadata) if metadata else {}
         
-        # Read file
-        file_content = await file.read()
-        file_size = len(file_content)
-        
-        # Check file size
-        from app.config import settings
-        max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
-        if file_size > max_size:
-            raise HTTPException(
-                status_code=413,
-                detail=f"File size exceeds maximum of {settings.MAX_FILE_SIZE_MB}MB"
-            )
-        
         # Get job processor
         job_processor = get_document_job_processor()
         
+        # Stream the upload to temp storage (size checked while copying)
+        temp_path = job_processor.temp_file_path(document_id, file.filename)
+        try:
+            file_size = await save_upload(file, temp_path, settings.MAX_FILE_SIZE_MB * 1024 * 1024)
+        except UploadTooLarge as e:
+            job_processor.cleanup_temp_file(document_id)
+            raise HTTPException(status_code=413, detail=str(e))
+        temp_path = str(temp_path)
+        logger.info(f"Saved temp file: {temp_path} ({file_size} bytes)")
+        
         # Create job record
         await job_processor.create_job(
             document_id=document_id,
@@ -155,24 +156,34 @@ async def upload_document(
             metadata=metadata_dict
         )
         
-        # Save file temporarily
-        job_processor.save_temp_file(document_id, file_content, file.filename)
-        
         # Estimate processing time (rough: 1 second per 10KB + 0.5 second per expected chunk)
         estimated_chunks = max(1, file_size // 1500)  # Rough estimate
         estimated_time = max(10, (file_size // 10000) + (estimated_chunks // 2))
         
-        # Add background task for processing
-        background_tasks.add_task(
-            job_processor.process_document_background,
-            document_id=document_id,
-            kb_id=kb_id,
-            tenant_id=tenant_id,
-            file_content=file_content,
-            filename=file.filename,
-            content_type=file.content_type,
-            metadata=metadata_dict
-        )
+        if settings.ENABLE_JOB_QUEUE:
+            # Durable queue - processed by an ingest worker (app/worker.py)
+            get_job_queue().enqueue(JobQueue.TYPE_DOCUMENT, tenant_id, document_id, {
+                "document_id": document_id,
+                "kb_id": kb_id,
+                "tenant_id": tenant_id,
+                "filename": file.filename,
+                "content_type": file.content_type,
+                "metadata": metadata_dict,
+                "file_path": temp_path
+            })
+        else:
+            # Add background task for processing
+            background_tasks.add_task(
+                job_processor.process_document_background,
+                document_id=document_id,
+                kb_id=kb_id,
+                tenant_id=tenant_id,
+                file_content=None,
+                filename=file.filename,
+                content_type=file.content_type,
+                metadata=metadata_dict,
+                file_path=temp_path
+            )
         
         logger.info(f"Document {document_id} queued for processing (size: {file_size} bytes)")
         
@@ -213,17 +224,11 @@ async def upload_document_sync(
         # Parse metadata
         metadata_dict = json.loads(metadata) if metadata else {}
         
-        # Read file
-        file_content = await file.read()
-        
-        # Check file size
-        from app.config import settings
-        max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
-        if len(file_content) > max_size:
-            raise HTTPException(
-                status_code=413,
-                detail=f"File size exceeds maximum of {settings.MAX_FILE_SIZE_MB}MB"
-            )
+        # Read file (size checked while reading)
+        try:
+            file_content = await read_upload(file, settings.MAX_FILE_SIZE_MB * 1024 * 1024)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
         # Process document synchronously (original behavior)
         result = await document_processor.process_document(
@@ -250,6 +255,8 @@ async def upload_document_sync(
             cost=cost
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -323,7 +330,6 @@ async def reprocess_document(document_id: str, background_tasks: BackgroundTasks
     """
     try:
         # Get document info from database
-        from app.services.vector_store import VectorStore
         import mysql.connector
         from app.config import settings
         
@@ -354,16 +360,13 @@ async def reprocess_document(document_id: str, background_tasks: BackgroundTasks
         if not storage_path:
             raise HTTPException(status_code=400, detail="Document file not found")
         
-        # Try to read the file
-        try:
-            with open(storage_path, 'rb') as f:
-                file_content = f.read()
-        except FileNotFoundError:
+        # The job reads the file itself
+        if not os.path.isfile(storage_path):
             raise HTTPException(status_code=400, detail="Document file not found on disk")
+        file_size = os.path.getsize(storage_path)
         
-        # Delete existing chunks
-        vector_store = VectorStore()
-        await vector_store.delete_document(document_id)
+        # Existing chunks are removed by process_document_background, unless
+        # it resumes a checkpoint of a failed run of the same file
         
         # Get job processor and reprocess
         job_processor = get_document_job_processor()
@@ -381,22 +384,34 @@ async def reprocess_document(document_id: str, background_tasks: BackgroundTasks
             kb_id=doc["kb_id"],
             tenant_id=doc["tenant_id"],
             filename=doc["original_filename"] or doc["filename"],
-            file_size=len(file_content),
+            file_size=file_size,
             content_type=doc["file_type"],
             metadata=metadata
         )
         
-        # Add background task
-        background_tasks.add_task(
-            job_processor.process_document_background,
-            document_id=document_id,
-            kb_id=doc["kb_id"],
-            tenant_id=doc["tenant_id"],
-            file_content=file_content,
-            filename=doc["original_filename"] or doc["filename"],
-            content_type=doc["file_type"],
-            metadata=metadata
-        )
+        if settings.ENABLE_JOB_QUEUE:
+            get_job_queue().enqueue(JobQueue.TYPE_DOCUMENT, doc["tenant_id"], document_id, {
+                "document_id": document_id,
+                "kb_id": doc["kb_id"],
+                "tenant_id": doc["tenant_id"],
+                "filename": doc["original_filename"] or doc["filename"],
+                "content_type": doc["file_type"],
+                "metadata": metadata,
+                "file_path": storage_path
+            })
+        else:
+            # Add background task
+            background_tasks.add_task(
+                job_processor.process_document_background,
+                document_id=document_id,
+                kb_id=doc["kb_id"],
+                tenant_id=doc["tenant_id"],
+                file_content=None,
+                filename=doc["original_filename"] or doc["filename"],
+                content_type=doc["file_type"],
+                metadata=metadata,
+                file_path=storage_path
+            )
         
         return {
             "message": "Document reprocessing started",
@@ -437,7 +452,10 @@ async def extract_text(file: UploadFile = File(...)):
     Extract text from document without indexing
     """
     try:
-        file_content = await file.read()
+        try:
+            file_content = await read_upload(file, settings.MAX_FILE_SIZE_MB * 1024 * 1024)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
         extracted = await document_processor.extract_text_only(
             file_content=file_content,
@@ -452,6 +470,8 @@ async def extract_text(file: UploadFile = File(...)):
             "word_count": len(extracted["text"].split())
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -936,17 +956,21 @@ async def scrape_url_async(request: ScrapeUrlRequest, background_tasks: Backgrou
         job_processor.redis_client.hset(job_key, mapping={k: str(v) if v is not None else "" for k, v in job_data.items()})
         job_processor.redis_client.expire(job_key, 86400)  # 24 hours TTL
         
-        # Add background task
-        background_tasks.add_task(
-            _process_scrape_job_background,
-            job_id=job_id,
-            url=request.url,
-            kb_id=request.kb_id,
-            tenant_id=request.tenant_id,
-            max_depth=request.max_depth,
-            max_pages=request.max_pages,
-            metadata=request.metadata or {}
-        )
+        scrape_job = {
+            "job_id": job_id,
+            "url": request.url,
+            "kb_id": request.kb_id,
+            "tenant_id": request.tenant_id,
+            "max_depth": request.max_depth,
+            "max_pages": request.max_pages,
+            "metadata": request.metadata or {}
+        }
+        
+        if settings.ENABLE_JOB_QUEUE:
+            get_job_queue().enqueue(JobQueue.TYPE_SCRAPE, request.tenant_id, job_id, scrape_job)
+        else:
+            # Add background task
+            background_tasks.add_task(job_processor.process_scrape_job, **scrape_job)
         
         logger.info(f"Scrape job {job_id} queued for URL: {request.url}")
         
@@ -993,102 +1017,3 @@ async def get_scrape_job_status(job_id: str):
     except Exception as e:
         logger.error(f"Failed to get scrape job status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
-
-
-async def _process_scrape_job_background(
-    job_id: str,
-    url: str,
-    kb_id: str,
-    tenant_id: str,
-    max_depth: int,
-    max_pages: int,
-    metadata: dict
-):
-    """
-    Background task to process scrape job
-    """
-    job_processor = get_document_job_processor()
-    job_key = f"scrape_job:{job_id}"
-    
-    def update_status(status: str, progress: int = None, current_step: str = None, **kwargs):
-        updates = {"status": status}
-        if progress is not None:
-            updates["progress"] = str(progress)
-        if current_step:
-            updates["current_step"] = current_step
-        for k, v in kwargs.items():
-            updates[k] = str(v) if v is not None else ""
-        job_processor.redis_client.hset(job_key, mapping=updates)
-    
-    try:
-        update_status("scraping", 10, "Starting web scrape...")
-        
-        # Scrape website
-        scrape_result = await web_scraper.scrape_url(
-            url=url,
-            max_depth=max_depth,
-            max_pages=max_pages
-        )
-        
-        total_pages = scrape_result.get('total_pages', 0)
-        update_status("scraping", 30, f"Scraped {total_pages} pages", 
-                     pages_scraped=total_pages, total_pages=total_pages)
-        
-        if total_pages == 0:
-            update_status("failed", 100, "No pages could be scraped",
-                         error_message="No pages could be scraped from the URL",
-                         completed_at=datetime.now().isoformat())
-            return
-        
-        # Process each scraped page
-        update_status("processing", 40, "Processing scraped content...")
-        processed_count = 0
-        
-        for i, page in enumerate(scrape_result['pages']):
-            document_id = str(uuid.uuid4())
-            
-            try:
-                result = await document_processor.process_text_content(
-                    document_id=document_id,
-                    kb_id=kb_id,
-                    tenant_id=tenant_id,
-                    text=page['text'],
-                    title=page['title'],
-                    source_url=page['url'],
-                    metadata={
-                        **metadata,
-                        **page.get('metadata', {}),
-                        'source_type': 'web_scrape',
-                        'depth': page.get('depth', 0),
-                        'scrape_job_id': job_id
-                    }
-                )
-                processed_count += 1
-                
-                # Update progress
-                progress = 40 + int((i + 1) / total_pages * 50)
-                update_status("processing", progress, 
-                             f"Processed {processed_count}/{total_pages} pages",
-                             pages_processed=processed_count)
-                             
-            except Exception as e:
-                logger.error(f"Error processing page {page['url']}: {e}")
-                continue
-        
-        # Update KB stats
-        if processed_count > 0:
-            await job_processor._update_kb_stats(kb_id)
-        
-        # Mark completed
-        update_status("completed", 100, 
-                     f"Completed: {processed_count} pages processed",
-                     pages_processed=processed_count,
-                     completed_at=datetime.now().isoformat())
-        
-        logger.info(f"Scrape job {job_id} completed: {processed_count}/{total_pages} pages")
-        
-    except Exception as e:
-        logger.error(f"Scrape job {job_id} failed: {e}")
-        update_status("failed", 100, str(e),
-                     error_message=str(e),
-                     completed_at=datetime.now().isoformat())
\ No newline at end of file
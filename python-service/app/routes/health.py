@@ -1,13 +1,14 @@
 """
-Health check endpoint
+Health check and metrics endpoints
 """
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 from datetime import datetime
 from app.models.responses import HealthResponse
 import redis
 import mysql.connector
 from app.config import settings
+from app.utils.metrics import render_metrics
 
 router = APIRouter()
 
@@ -56,4 +57,11 @@ async def health_check():
         whoami="aiva-python",
         timestamp=datetime.utcnow().isoformat(),
         services=services
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (aggregated across workers in multiprocess mode)"""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
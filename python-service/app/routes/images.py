@@ -3,6 +3,7 @@ Image Routes
 API endpoints for image upload, search, and management
 """
 
+import asyncio
 import logging
 import json
 import time
@@ -20,6 +21,7 @@ from app.services.image_processor import ImageProcessor
 from app.services.image_vector_store import ImageVectorStore
 from app.services.image_search import ImageSearchService
 from app.utils.cost_tracking import CostTracker
+from app.utils.uploads import UploadTooLarge, read_upload
 import mysql.connector
 from app.config import settings
 
@@ -49,8 +51,11 @@ async def upload_image(
             except:
                 pass
         
-        # Read file
-        contents = await file.read()
+        # Read file (size checked while reading)
+        try:
+            contents = await read_upload(file, settings.MAX_FILE_SIZE_MB * 1024 * 1024)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
         # Initialize processor
         from app.main import get_image_processor
@@ -77,8 +82,7 @@ async def upload_image(
         
         # Save file to disk
         final_file_path = file_storage_path / f"{image_id}_{file.filename}"
-        with open(final_file_path, 'wb') as f:
-            f.write(contents)
+        await asyncio.to_thread(final_file_path.write_bytes, contents)
         
         logger.info(f"Image saved to: {final_file_path}")
         
@@ -162,6 +166,8 @@ async def upload_image(
             cost=cost
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading image: {e}")
         import traceback
@@ -333,10 +339,13 @@ async def get_image_stats(kb_id: str):
 async def delete_image(image_id: str, kb_id: str = Query(...)):
     """
     Delete an image
+    
+    Identical images extracted from several documents share one file and
+    embedding: the first row owns them and the others carry "duplicate_of"
+    in their metadata. Deleting the owner promotes its oldest duplicate, and
+    "file_shared" tells the caller not to remove a file other rows still use.
     """
     try:
-        print(f"{kb_id}")
-        # Delete from database
         conn = mysql.connector.connect(
             host=settings.DB_HOST,
             port=settings.DB_PORT,
@@ -344,32 +353,32 @@ async def delete_image(image_id: str, kb_id: str = Query(...)):
             password=settings.DB_PASSWORD,
             database=settings.DB_NAME
         )
-        cursor = conn.cursor()
         
         try:
-            # Delete the record (no status field, just delete)
-            cursor.execute("""
-                DELETE FROM yovo_tbl_aiva_images
-                WHERE id = %s AND kb_id = %s
-            """, (image_id, kb_id))
-            
-            conn.commit()
-            
-            if cursor.rowcount == 0:
+            result = _delete_image_row(conn, image_id, kb_id)
+            if result is None:
                 raise HTTPException(status_code=404, detail="Image not found")
             
+            # Delete from vector store (a duplicate never had its own vector);
+            # done before the commit so a concurrent delete of the promoted
+            # row waits for it
+            if not result["duplicate"]:
+                vector_store = ImageVectorStore(kb_id)
+                await vector_store.delete_image(image_id)
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         finally:
-            cursor.close()
             conn.close()
         
-        # Delete from vector store
-        vector_store = ImageVectorStore(kb_id)
-        await vector_store.delete_image(image_id)
-        
         return {
             "success": True,
             "message": "Image deleted successfully",
-            "image_id": image_id
+            "image_id": image_id,
+            "file_shared": result["file_shared"],
+            "promoted_image_id": result["promoted_image_id"]
         }
         
     except HTTPException:
@@ -379,6 +388,101 @@ async def delete_image(image_id: str, kb_id: str = Query(...)):
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _delete_image_row(conn, image_id: str, kb_id: str) -> Optional[dict]:
+    """
+    Delete an image row in the open transaction, handing a shared file over
+    
+    Returns:
+        {"duplicate", "file_shared", "promoted_image_id"}, or None if the
+        image doesn't exist
+    """
+    cursor = conn.cursor(dictionary=True)
+    
+    try:
+        cursor.execute("""
+            SELECT id, storage_url, metadata
+            FROM yovo_tbl_aiva_images
+            WHERE id = %s AND kb_id = %s
+            FOR UPDATE
+        """, (image_id, kb_id))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        
+        metadata = _row_metadata(row)
+        duplicate = bool(metadata.get("duplicate_of"))
+        promoted_image_id = None
+        
+        if not duplicate:
+            cursor.execute("""
+                SELECT id, metadata
+                FROM yovo_tbl_aiva_images
+                WHERE kb_id = %s AND JSON_EXTRACT(metadata, '$.duplicate_of') = %s
+                ORDER BY created_at
+                FOR UPDATE
+            """, (kb_id, image_id))
+            duplicates = cursor.fetchall()
+            
+            if duplicates:
+                # The oldest duplicate takes over the file and the embedding
+                promoted = duplicates[0]
+                promoted_image_id = promoted["id"]
+                promoted_metadata = _row_metadata(promoted)
+                promoted_metadata["duplicate_of"] = None
+                for key in ("embedding", "embedding_model", "embedding_dimension"):
+                    if key in metadata:
+                        promoted_metadata[key] = metadata[key]
+                
+                cursor.execute(
+                    "UPDATE yovo_tbl_aiva_images SET metadata = %s WHERE id = %s",
+                    (json.dumps(promoted_metadata), promoted_image_id)
+                )
+                for other in duplicates[1:]:
+                    other_metadata = _row_metadata(other)
+                    other_metadata["duplicate_of"] = promoted_image_id
+                    cursor.execute(
+                        "UPDATE yovo_tbl_aiva_images SET metadata = %s WHERE id = %s",
+                        (json.dumps(other_metadata), other["id"])
+                    )
+                
+                logger.info(f"Image {promoted_image_id} now owns the file of deleted image {image_id}")
+        
+        cursor.execute("""
+            DELETE FROM yovo_tbl_aiva_images
+            WHERE id = %s AND kb_id = %s
+        """, (image_id, kb_id))
+        
+        # Reference count: any other row pointing at the same file keeps it
+        cursor.execute("""
+            SELECT COUNT(*) AS refs
+            FROM yovo_tbl_aiva_images
+            WHERE kb_id = %s AND storage_url = %s
+        """, (kb_id, row["storage_url"]))
+        file_shared = cursor.fetchone()["refs"] > 0
+        
+        return {
+            "duplicate": duplicate,
+            "file_shared": file_shared,
+            "promoted_image_id": promoted_image_id
+        }
+        
+    finally:
+        cursor.close()
+
+
+def _row_metadata(row: dict) -> dict:
+    """Parsed metadata column of an image row"""
+    metadata = row.get("metadata")
+    if isinstance(metadata, (bytes, bytearray)):
+        metadata = metadata.decode("utf-8")
+    if isinstance(metadata, str):
+        try:
+            return json.loads(metadata) or {}
+        except ValueError:
+            return {}
+    return metadata or {}
         
 
 @router.get("/images/{kb_id}/list")
@@ -2,8 +2,12 @@
 Search and embedding routes
 """
 
+import asyncio
+import json
+
 from fastapi import APIRouter, HTTPException, Query
-from typing import List
+from fastapi.responses import StreamingResponse
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 from app.models.requests import SearchRequest, EmbeddingRequest, BatchSearchRequest
 from app.models.responses import SearchResponse, EmbeddingResponse
@@ -49,59 +53,7 @@ async def search_knowledge(request: SearchRequest):
         else:
             logger.info(f"📝 No conversation history provided")
             
-        include_products = False
-        if request.filters:
-            include_products = request.filters.get('include_products', False)
-            
-        # ============================================================
-        # NEW: Check if enhanced search is enabled
-        # ============================================================
-        use_enhanced = (
-            ENHANCED_SEARCH_AVAILABLE and 
-            any([
-                getattr(settings, 'ENABLE_QUERY_EXPANSION', False),
-                getattr(settings, 'ENABLE_QUERY_REWRITING', False),
-                getattr(settings, 'ENABLE_BM25_SEARCH', False),
-                getattr(settings, 'ENABLE_MMR_DIVERSITY', False),
-                getattr(settings, 'ENABLE_RELEVANCE_THRESHOLD', False),
-                getattr(settings, 'ENABLE_RERANKING', False)
-            ])
-        )
-        
-        if use_enhanced:
-            logger.info("Using enhanced search")
-            enhanced_search = get_enhanced_search_service()
-            results = await enhanced_search.search(
-                kb_id=kb_id,
-                query=query,
-                image=request.image,
-                top_k=top_k,
-                search_type=search_type,
-                filters=request.filters or {},
-                include_products=include_products,
-                conversation_history=request.conversation_history
-            )
-        else:
-            # Original search (unchanged)
-            results = await vector_store.search(
-                kb_id=kb_id,
-                query=query,
-                image=request.image,
-                top_k=top_k,
-                search_type=search_type,
-                filters=request.filters or {},
-                include_products=include_products
-            )
-            
-        product_results = results.get("product_results", [])
-        if len(product_results) > top_k:
-            product_results = sorted(
-                product_results,
-                key=lambda x: x.get("score", x.get("similarity_score", 0)),
-                reverse=True
-            )[:top_k]
-            results["product_results"] = product_results
-            logger.info(f"📦 Trimmed product results: {len(product_results)} (requested top_k={top_k})")
+        results = await _run_search(request, top_k, search_type)
             
         processing_time = int((time.time() - start_time) * 1000)
         
@@ -109,79 +61,17 @@ async def search_knowledge(request: SearchRequest):
         is_cached = results.get('cached', False)
         
         # Import models
-        from app.models.responses import SearchResults, SearchMetrics, CostInfo, SearchResult, ScoringDetails
+        from app.models.responses import SearchResults, SearchMetrics
         
         # Convert text_results to SearchResult format
-        text_results = results.get("text_results", [])
-        formatted_text_results = []
-        
-        for r in text_results:
-            # Handle both TextResult objects and dicts
-            if hasattr(r, 'dict'):
-                r_dict = r.dict()
-            elif hasattr(r, 'model_dump'):
-                r_dict = r.model_dump()
-            else:
-                r_dict = r
-            
-            # Convert to SearchResult format
-            scoring_details = r_dict.get("scoring_details", {})
-            if not isinstance(scoring_details, dict):
-                scoring_details = scoring_details.dict() if hasattr(scoring_details, 'dict') else {}
-            
-            search_result = SearchResult(
-                result_id=r_dict.get("result_id"),
-                type=r_dict.get("type", "document"),
-                source=r_dict.get("source", {}),
-                source_type=r_dict.get("source_type", "document"),
-                content=r_dict.get("content", ""),
-                score=r_dict.get("score", 0.0),
-                scoring_details=ScoringDetails(
-                    cosine_similarity=scoring_details.get("cosine_similarity", r_dict.get("score", 0.0)),
-                    bm25_score=scoring_details.get("bm25_score", 0.0),
-                    combined_score=scoring_details.get("combined_score", r_dict.get("score", 0.0))
-                ),
-                metadata=r_dict.get("metadata", {})
-            )
-            formatted_text_results.append(search_result)
+        formatted_text_results = _format_text_results(results.get("text_results", []))
         
         # Calculate cost based on cache status
+        cost_info = _build_cost_info(results, is_cached)
         if is_cached:
-            # Cached results have zero cost
-            cost_info = CostInfo(
-                operation="knowledge_search_cached",
-                base_cost=0.0,
-                embedding_cost=0.0,
-                total_cost=0.0,
-                profit_margin=0.0,
-                final_cost=0.0
-            )
             logger.info(f"✅ Cache HIT - Zero cost")
         else:
-            # Non-cached results calculate normal cost
-            base_cost = 0.0005
-            query_tokens = results.get("query_tokens", 0)
-            
-            # Calculate embedding cost
-            embedding_cost = cost_tracker.calculate_embedding_cost(
-                tokens=query_tokens,
-                model=results.get("embedding_model", "text-embedding-3-small")
-            )
-            
-            # Calculate totals
-            total_cost = base_cost + embedding_cost
-            profit_margin = total_cost * 0.20
-            final_cost = total_cost + profit_margin
-            
-            cost_info = CostInfo(
-                operation="knowledge_search",
-                base_cost=base_cost,
-                embedding_cost=embedding_cost,
-                total_cost=total_cost,
-                profit_margin=profit_margin,
-                final_cost=final_cost
-            )
-            logger.info(f"💰 Cache MISS - Cost: ${final_cost}")
+            logger.info(f"💰 Cache MISS - Cost: ${cost_info.final_cost}")
         
         return SearchResponse(
             results=SearchResults(
@@ -206,6 +96,289 @@ async def search_knowledge(request: SearchRequest):
         raise HTTPException(status_code=500, detail=str(e))
         
 
+def _use_enhanced_search() -> bool:
+    """Whether any enhanced search feature is enabled"""
+    return ENHANCED_SEARCH_AVAILABLE and any([
+        getattr(settings, 'ENABLE_QUERY_EXPANSION', False),
+        getattr(settings, 'ENABLE_QUERY_REWRITING', False),
+        getattr(settings, 'ENABLE_BM25_SEARCH', False),
+        getattr(settings, 'ENABLE_MMR_DIVERSITY', False),
+        getattr(settings, 'ENABLE_RELEVANCE_THRESHOLD', False),
+        getattr(settings, 'ENABLE_RERANKING', False)
+    ])
+
+
+def _top_products(product_results: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+    """Best top_k product matches"""
+    if len(product_results) <= top_k:
+        return product_results
+    return sorted(
+        product_results,
+        key=lambda x: x.get("score", x.get("similarity_score", 0)),
+        reverse=True
+    )[:top_k]
+
+
+async def _run_search(
+    request: SearchRequest,
+    top_k: int,
+    search_type: str,
+    on_stage: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    """
+    Search through the enhanced pipeline when enabled, else plain vector search
+    
+    on_stage is passed through to VectorStore.search on either path.
+    """
+    import logging
+    
+    logger = logging.getLogger(__name__)
+    include_products = bool((request.filters or {}).get('include_products', False))
+    
+    if _use_enhanced_search():
+        logger.info("Using enhanced search")
+        enhanced_search = get_enhanced_search_service()
+        results = await enhanced_search.search(
+            kb_id=request.kb_id,
+            query=request.query,
+            image=request.image,
+            top_k=top_k,
+            search_type=search_type,
+            filters=request.filters or {},
+            include_products=include_products,
+            conversation_history=request.conversation_history,
+            tenant_id=request.tenant_id,
+            on_stage=on_stage
+        )
+    else:
+        # Original search (unchanged)
+        results = await vector_store.search(
+            kb_id=request.kb_id,
+            query=request.query,
+            image=request.image,
+            top_k=top_k,
+            search_type=search_type,
+            filters=request.filters or {},
+            include_products=include_products,
+            on_stage=on_stage
+        )
+    
+    product_results = results.get("product_results", [])
+    if len(product_results) > top_k:
+        results["product_results"] = _top_products(product_results, top_k)
+        logger.info(f"📦 Trimmed product results: {len(results['product_results'])} (requested top_k={top_k})")
+    
+    return results
+
+
+def _format_text_results(text_results: List[Any]) -> list:
+    """Convert TextResult objects / result dicts to SearchResult models"""
+    from app.models.responses import SearchResult, ScoringDetails
+    
+    formatted_text_results = []
+    
+    for r in text_results:
+        # Handle both TextResult objects and dicts
+        if hasattr(r, 'dict'):
+            r_dict = r.dict()
+        elif hasattr(r, 'model_dump'):
+            r_dict = r.model_dump()
+        else:
+            r_dict = r
+        
+        # Convert to SearchResult format
+        scoring_details = r_dict.get("scoring_details", {})
+        if not isinstance(scoring_details, dict):
+            scoring_details = scoring_details.dict() if hasattr(scoring_details, 'dict') else {}
+        
+        search_result = SearchResult(
+            result_id=r_dict.get("result_id"),
+            type=r_dict.get("type", "document"),
+            source=r_dict.get("source", {}),
+            source_type=r_dict.get("source_type", "document"),
+            content=r_dict.get("content", ""),
+            score=r_dict.get("score", 0.0),
+            scoring_details=ScoringDetails(
+                cosine_similarity=scoring_details.get("cosine_similarity", r_dict.get("score", 0.0)),
+                bm25_score=scoring_details.get("bm25_score", 0.0),
+                combined_score=scoring_details.get("combined_score", r_dict.get("score", 0.0))
+            ),
+            metadata=r_dict.get("metadata", {})
+        )
+        formatted_text_results.append(search_result)
+    
+    return formatted_text_results
+
+
+def _build_cost_info(results: Dict[str, Any], is_cached: bool):
+    """Search cost (zero for semantic cache hits)"""
+    from app.models.responses import CostInfo
+    
+    if is_cached:
+        # Cached results have zero cost
+        return CostInfo(
+            operation="knowledge_search_cached",
+            base_cost=0.0,
+            embedding_cost=0.0,
+            total_cost=0.0,
+            profit_margin=0.0,
+            final_cost=0.0
+        )
+    
+    # Non-cached results calculate normal cost
+    base_cost = 0.0005
+    query_tokens = results.get("query_tokens", 0)
+    
+    # Calculate embedding cost
+    embedding_cost = cost_tracker.calculate_embedding_cost(
+        tokens=query_tokens,
+        model=results.get("embedding_model", "text-embedding-3-small")
+    )
+    
+    # Calculate totals
+    total_cost = base_cost + embedding_cost
+    profit_margin = total_cost * 0.20
+    final_cost = total_cost + profit_margin
+    
+    return CostInfo(
+        operation="knowledge_search",
+        base_cost=base_cost,
+        embedding_cost=embedding_cost,
+        total_cost=total_cost,
+        profit_margin=profit_margin,
+        final_cost=final_cost
+    )
+
+
+def _stream_event(event: str, data: Dict[str, Any], fmt: str) -> str:
+    """Serialize one stream event as an NDJSON line or an SSE frame"""
+    if fmt == "sse":
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    return json.dumps({"event": event, **data}, default=str) + "\n"
+
+
+@router.post("/search/stream")
+async def search_knowledge_stream(
+    request: SearchRequest,
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson or sse")
+):
+    """
+    Streaming search - emits results as each stage completes
+    
+    Runs the same pipeline as POST /search (query rewriting, intent
+    filtering, BM25 fusion, semantic cache, search_type).
+    
+    Events (in order of availability):
+        results   stage="retrieved": vector top_k, sent as soon as it is
+                  scored and enriched
+        images    images for the result documents
+        products  product matches (only if filters.include_products)
+        results   stage="ranked" or "reranked": final results, only if
+                  BM25, intent filtering, threshold, MMR or reranking
+                  changed them
+        done      metrics, cost, cache status, enhanced search details
+        error     detail (stream ends)
+    
+    Callers can start prompt assembly on the first event.
+    """
+    import time
+    import logging
+    
+    logger = logging.getLogger(__name__)
+    
+    top_k = request.top_k or 5
+    search_type = request.search_type or "hybrid"
+    include_products = bool((request.filters or {}).get('include_products', False))
+    
+    async def event_stream():
+        start_time = time.time()
+        stage_events: asyncio.Queue = asyncio.Queue()
+        
+        def elapsed_ms() -> int:
+            return int((time.time() - start_time) * 1000)
+        
+        retrieved_ids: List[Optional[str]] = []
+        
+        def stage_event(stage: str, data: Dict[str, Any]) -> Optional[str]:
+            if stage == "retrieved":
+                text_results = _format_text_results(data.get("text_results", []))
+                retrieved_ids[:] = [r.result_id for r in text_results]
+                return _stream_event("results", {
+                    "stage": "retrieved",
+                    "text_results": [r.model_dump() for r in text_results],
+                    "elapsed_ms": elapsed_ms()
+                }, format)
+            if stage == "images":
+                return _stream_event("images", {
+                    "image_results": data.get("image_results", []),
+                    "elapsed_ms": elapsed_ms()
+                }, format)
+            if stage == "products" and include_products:
+                return _stream_event("products", {
+                    "product_results": _top_products(data.get("product_results", []), top_k),
+                    "elapsed_ms": elapsed_ms()
+                }, format)
+            return None
+        
+        async def on_stage(stage: str, data: Dict[str, Any]):
+            await stage_events.put((stage, data))
+        
+        async def run():
+            try:
+                return await _run_search(request, top_k, search_type, on_stage=on_stage)
+            finally:
+                await stage_events.put(None)
+        
+        search_task = asyncio.create_task(run())
+        try:
+            while (item := await stage_events.get()) is not None:
+                event = stage_event(*item)
+                if event is not None:
+                    yield event
+            
+            results = await search_task
+            enhanced = results.get("enhanced_search") or {}
+            
+            final_results = _format_text_results(results.get("text_results", []))
+            if [r.result_id for r in final_results] != retrieved_ids:
+                yield _stream_event("results", {
+                    "stage": "reranked" if "reranking" in enhanced.get("features_applied", []) else "ranked",
+                    "text_results": [r.model_dump() for r in final_results],
+                    "elapsed_ms": elapsed_ms()
+                }, format)
+            
+            is_cached = results.get("cached", False)
+            cost_info = _build_cost_info(results, is_cached)
+            
+            yield _stream_event("done", {
+                "search_type": search_type,
+                "cached": is_cached,
+                "total_found": results.get("total_found", 0),
+                "metrics": {
+                    "query_tokens": results.get("query_tokens"),
+                    "embedding_model": results.get("embedding_model"),
+                    "processing_time_ms": elapsed_ms(),
+                    "chunks_searched": results.get("chunks_searched", 0)
+                },
+                "enhanced_search": enhanced or None,
+                "cost": cost_info.model_dump()
+            }, format)
+            
+        except Exception as e:
+            logger.error(f"Streaming search error: {str(e)}", exc_info=True)
+            yield _stream_event("error", {"detail": str(e)}, format)
+        finally:
+            if not search_task.done():
+                search_task.cancel()
+    
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        event_stream(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.post("/search/batch")
 async def batch_search(request: BatchSearchRequest):
     """
@@ -265,6 +438,27 @@ async def get_kb_stats(kb_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
         
+
+@router.post("/kb/{kb_id}/bm25/rebuild")
+async def rebuild_bm25_index(kb_id: str):
+    """
+    Rebuild the BM25 keyword index for a knowledge base from stored chunks
+    (backfill for KBs ingested before the index existed)
+    """
+    try:
+        from app.services.bm25_index import get_bm25_index
+        
+        bm25_index = get_bm25_index()
+        indexed = await asyncio.to_thread(bm25_index.rebuild_kb, kb_id)
+        
+        return {
+            "status": "success",
+            "kb_id": kb_id,
+            "indexed_chunks": indexed
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/cache/stats")
 async def get_cache_stats(
     kb_id: str = Query(None, description="Knowledge base ID (optional)")
@@ -0,0 +1,342 @@
+"""
+BM25 Inverted Index Service
+Persistent per-KB keyword index in Redis for corpus-wide hybrid retrieval
+
+Built at ingest time (VectorStore.store_document) so keyword search covers
+every chunk in the KB - not just the vector-retrieved candidates.
+
+Redis layout (per KB):
+    bm25:{kb_id}:impacts:{term}    ZSET  chunk_id -> term impact
+    bm25:{kb_id}:doclen            HASH  chunk_id -> token count
+    bm25:{kb_id}:terms:{chunk_id}  SET   terms of the chunk (for deletes)
+    bm25:{kb_id}:stats             HASH  doc_count, total_len, layout
+
+A term's impact is its BM25 term-frequency component for the chunk
+(length-normalized with the KB's average chunk length when indexed), so a
+query only reads the BM25_MAX_POSTINGS_PER_TERM best chunks of each term
+instead of the whole postings list. Document frequency is ZCARD.
+
+KBs indexed with an older layout (no "layout" in stats) count as not
+indexed until POST /kb/{kb_id}/bm25/rebuild.
+"""
+
+import logging
+import math
+import re
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+import redis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Dropped at index and query time - they match nearly every chunk
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been",
+    "to", "of", "in", "for", "on", "with", "at", "by", "from",
+    "and", "or", "as", "it", "its", "this", "that", "these", "those",
+    "do", "does", "did", "can", "could", "would", "should", "will",
+    "i", "me", "my", "we", "our", "you", "your", "what", "which", "who",
+}
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stop words or single characters"""
+    return [
+        t for t in TOKEN_PATTERN.findall(text.lower())
+        if len(t) > 1 and t not in STOP_WORDS
+    ]
+
+
+class BM25Index:
+    """
+    Per-KB BM25 inverted index stored in Redis
+
+    Usage:
+        index = BM25Index()
+        index.index_chunks(kb_id, chunks)          # at ingest
+        hits = index.search(kb_id, "vat refund", 15)  # [(chunk_id, score), ...]
+    """
+
+    LAYOUT_VERSION = "2"
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.redis_client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            password=settings.REDIS_PASSWORD or None,
+            db=settings.REDIS_DB,
+            decode_responses=True
+        )
+        self.prefix = "bm25:"
+        self.k1 = k1
+        self.b = b
+        self.max_postings_per_term = settings.BM25_MAX_POSTINGS_PER_TERM
+
+    def _postings_key(self, kb_id: str, term: str) -> str:
+        return f"{self.prefix}{kb_id}:impacts:{term}"
+
+    def _doclen_key(self, kb_id: str) -> str:
+        return f"{self.prefix}{kb_id}:doclen"
+
+    def _terms_key(self, kb_id: str, chunk_id: str) -> str:
+        return f"{self.prefix}{kb_id}:terms:{chunk_id}"
+
+    def _stats_key(self, kb_id: str) -> str:
+        return f"{self.prefix}{kb_id}:stats"
+
+    def _impact(self, tf: int, doc_len: int, avg_doc_len: float) -> float:
+        """BM25 term-frequency component of a term in a chunk"""
+        denominator = tf + self.k1 * (1 - self.b + self.b * doc_len / max(avg_doc_len, 1))
+        return tf * (self.k1 + 1) / denominator
+
+    def index_chunks(self, kb_id: str, chunks: List[Dict[str, Any]]) -> int:
+        """
+        Add chunks to the KB index in a single pipeline
+
+        Chunks already in the index are removed first, so re-indexing one
+        replaces its postings and length instead of counting it twice.
+
+        Args:
+            kb_id: Knowledge base ID
+            chunks: Chunks with 'chunk_id' and full 'content'
+
+        Returns:
+            Number of chunks indexed
+        """
+        if not chunks:
+            return 0
+
+        chunk_ids = [chunk["chunk_id"] for chunk in chunks]
+        existing = self.redis_client.hmget(self._doclen_key(kb_id), chunk_ids)
+        reindexed = [chunk_id for chunk_id, doc_len in zip(chunk_ids, existing) if doc_len is not None]
+        if reindexed:
+            self.remove_chunks(kb_id, reindexed)
+
+        tokenized = []
+        for chunk in chunks:
+            tokens = tokenize(chunk.get("content", ""))
+            if tokens:
+                tokenized.append((chunk["chunk_id"], tokens))
+
+        if not tokenized:
+            return 0
+
+        stats = self.redis_client.hgetall(self._stats_key(kb_id))
+        indexed = len(tokenized)
+        total_len = sum(len(tokens) for _, tokens in tokenized)
+        avg_doc_len = (int(stats.get("total_len", 0)) + total_len) / (int(stats.get("doc_count", 0)) + indexed)
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for chunk_id, tokens in tokenized:
+            term_freqs = Counter(tokens)
+            for term, tf in term_freqs.items():
+                pipe.zadd(self._postings_key(kb_id, term), {chunk_id: self._impact(tf, len(tokens), avg_doc_len)})
+            pipe.sadd(self._terms_key(kb_id, chunk_id), *term_freqs.keys())
+            pipe.hset(self._doclen_key(kb_id), chunk_id, len(tokens))
+
+        if not stats:
+            # New index: this layout. An old-layout KB stays unmarked until rebuilt
+            pipe.hset(self._stats_key(kb_id), "layout", self.LAYOUT_VERSION)
+        pipe.hincrby(self._stats_key(kb_id), "doc_count", indexed)
+        pipe.hincrby(self._stats_key(kb_id), "total_len", total_len)
+        pipe.execute()
+
+        logger.info(f"BM25 index: added {indexed} chunks to KB {kb_id}")
+        return indexed
+
+    def remove_chunks(self, kb_id: str, chunk_ids: List[str]) -> int:
+        """
+        Remove chunks from the KB index
+
+        Returns:
+            Number of chunks removed
+        """
+        if not chunk_ids:
+            return 0
+
+        # Fetch terms and lengths for all chunks in one round trip
+        pipe = self.redis_client.pipeline(transaction=False)
+        for chunk_id in chunk_ids:
+            pipe.smembers(self._terms_key(kb_id, chunk_id))
+        pipe.hmget(self._doclen_key(kb_id), chunk_ids)
+        fetched = pipe.execute()
+
+        term_sets, doc_lens = fetched[:-1], fetched[-1]
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        removed = 0
+        removed_len = 0
+
+        for chunk_id, terms, doc_len in zip(chunk_ids, term_sets, doc_lens):
+            if doc_len is None:
+                continue
+            for term in terms:
+                pipe.zrem(self._postings_key(kb_id, term), chunk_id)
+            pipe.delete(self._terms_key(kb_id, chunk_id))
+            pipe.hdel(self._doclen_key(kb_id), chunk_id)
+            removed += 1
+            removed_len += int(doc_len)
+
+        if removed:
+            pipe.hincrby(self._stats_key(kb_id), "doc_count", -removed)
+            pipe.hincrby(self._stats_key(kb_id), "total_len", -removed_len)
+            pipe.execute()
+
+        logger.info(f"BM25 index: removed {removed} chunks from KB {kb_id}")
+        return removed
+
+    def clear_kb(self, kb_id: str):
+        """Drop the whole index for a KB"""
+        keys = list(self.redis_client.scan_iter(match=f"{self.prefix}{kb_id}:*", count=1000))
+        for i in range(0, len(keys), 1000):
+            self.redis_client.delete(*keys[i:i + 1000])
+        logger.info(f"BM25 index: cleared KB {kb_id} ({len(keys)} keys)")
+
+    def get_stats(self, kb_id: str) -> Dict[str, Any]:
+        """Document count, total token count and index layout of a KB"""
+        stats = self.redis_client.hgetall(self._stats_key(kb_id))
+        return {
+            "doc_count": int(stats.get("doc_count", 0)),
+            "total_len": int(stats.get("total_len", 0)),
+            "layout": stats.get("layout")
+        }
+
+    def is_indexed(self, kb_id: str) -> bool:
+        """True if the KB has at least one chunk indexed with the current layout"""
+        stats = self.get_stats(kb_id)
+        return stats["doc_count"] > 0 and stats["layout"] == self.LAYOUT_VERSION
+
+    def search(
+        self,
+        kb_id: str,
+        query: str,
+        top_k: int = 15,
+        extra_terms: Optional[List[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Score the chunks with the highest impact for each query term
+
+        Candidates are each term's BM25_MAX_POSTINGS_PER_TERM best chunks, so
+        cost is bounded however common the term is; candidates are then
+        scored on every query term.
+
+        Args:
+            kb_id: Knowledge base ID
+            query: Query text
+            top_k: Number of hits to return
+            extra_terms: Additional terms (e.g. query expansion synonyms)
+
+        Returns:
+            List of (chunk_id, bm25_score) sorted by score, descending
+        """
+        terms = tokenize(query)
+        for term in extra_terms or []:
+            terms.extend(tokenize(term))
+        query_terms = list(dict.fromkeys(terms))  # Dedupe, keep order
+
+        if not query_terms:
+            return []
+
+        stats = self.get_stats(kb_id)
+        doc_count = stats["doc_count"]
+        if doc_count <= 0:
+            return []
+
+        # Document frequency and top postings of every term in one round trip
+        pipe = self.redis_client.pipeline(transaction=False)
+        for term in query_terms:
+            key = self._postings_key(kb_id, term)
+            pipe.zcard(key)
+            pipe.zrevrange(key, 0, self.max_postings_per_term - 1, withscores=True)
+        fetched = pipe.execute()
+
+        term_impacts = [dict(postings) for postings in fetched[1::2]]
+        candidate_ids = set()
+        for impacts in term_impacts:
+            candidate_ids.update(impacts)
+
+        # Candidates found through one term may sit past the cut-off of
+        # another: one ZMSCORE per truncated term (Redis >= 6.2)
+        missing = {}
+        for i, df in enumerate(fetched[0::2]):
+            if df > len(term_impacts[i]):
+                missing[i] = [chunk_id for chunk_id in candidate_ids if chunk_id not in term_impacts[i]]
+        missing = {i: chunk_ids for i, chunk_ids in missing.items() if chunk_ids}
+        if missing:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for i, chunk_ids in missing.items():
+                pipe.zmscore(self._postings_key(kb_id, query_terms[i]), chunk_ids)
+            for (i, chunk_ids), impacts in zip(missing.items(), pipe.execute()):
+                for chunk_id, impact in zip(chunk_ids, impacts):
+                    if impact is not None:
+                        term_impacts[i][chunk_id] = impact
+
+        scores: Dict[str, float] = {}
+        for df, impacts in zip(fetched[0::2], term_impacts):
+            if df == 0:
+                continue
+            idf = math.log((doc_count - df + 0.5) / (df + 0.5) + 1)
+
+            for chunk_id, impact in impacts.items():
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * impact
+
+        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        return ranked[:top_k]
+
+    def rebuild_kb(self, kb_id: str, batch_size: int = 500) -> int:
+        """
+        Rebuild the KB index from MySQL chunks (backfill for existing KBs)
+
+        Returns:
+            Number of chunks indexed
+        """
+        import mysql.connector
+
+        self.clear_kb(kb_id)
+
+        conn = mysql.connector.connect(
+            host=settings.DB_HOST,
+            port=settings.DB_PORT,
+            user=settings.DB_USER,
+            password=settings.DB_PASSWORD,
+            database=settings.DB_NAME
+        )
+        cursor = conn.cursor(dictionary=True)
+
+        try:
+            cursor.execute(
+                "SELECT id as chunk_id, content FROM yovo_tbl_aiva_document_chunks WHERE kb_id = %s",
+                (kb_id,)
+            )
+
+            total = 0
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                total += self.index_chunks(kb_id, rows)
+
+            logger.info(f"BM25 index: rebuilt KB {kb_id} with {total} chunks")
+            return total
+
+        finally:
+            cursor.close()
+            conn.close()
+
+
+# Singleton instance
+_bm25_index: Optional[BM25Index] = None
+
+
+def get_bm25_index() -> BM25Index:
+    """Get or create the BM25 index singleton"""
+    global _bm25_index
+    if _bm25_index is None:
+        _bm25_index = BM25Index()
+    return _bm25_index
@@ -0,0 +1,172 @@
+"""
+Document Checkpoint
+Persisted ingestion stages so a retried or reprocessed document resumes
+instead of redoing paid work (table vision calls, CLIP, embeddings)
+
+Files under {STORAGE_PATH}/checkpoints/{document_id}/:
+    <stage>.json          extraction result, chunk lists (hash kept in Redis)
+    embeddings/*.npz      embedded vectors, one file per API response
+
+Redis hash doc_checkpoint:{document_id} (TTL CHECKPOINT_TTL_HOURS) holds the
+source file hash and per-stage hashes; a checkpoint is only resumed for the
+same file. Which chunks are already stored comes from MySQL
+(VectorStore.get_stored_chunk_ids), so it can't drift from the real state.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentCheckpoint:
+    """Stage checkpoint for one document"""
+
+    KEY_PREFIX = "doc_checkpoint:"
+
+    def __init__(self, document_id: str, redis_client, root: Path):
+        self.document_id = document_id
+        self.redis_client = redis_client
+        self.key = f"{self.KEY_PREFIX}{document_id}"
+        self.path = Path(root) / document_id
+        self.ttl = settings.CHECKPOINT_TTL_HOURS * 3600
+        self.dropped = False
+
+    @staticmethod
+    def file_hash(source: Union[bytes, str]) -> str:
+        """sha256 of file bytes, or of a file read in blocks"""
+        if not isinstance(source, str):
+            return hashlib.sha256(source).hexdigest()
+
+        digest = hashlib.sha256()
+        with open(source, 'rb') as f:
+            while block := f.read(1024 * 1024):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _data_hash(raw: bytes) -> str:
+        return hashlib.sha256(raw).hexdigest()[:16]
+
+    def open(self, file_hash: str) -> bool:
+        """
+        Resume the checkpoint for this file or start a new one
+
+        Returns:
+            True if an existing checkpoint is resumed
+        """
+        meta = self.redis_client.hgetall(self.key)
+        if meta and meta.get("file_hash") == file_hash and self.path.exists():
+            self.redis_client.expire(self.key, self.ttl)
+            logger.info(f"Resuming checkpoint for document {self.document_id}")
+            return True
+
+        self.clear()
+        (self.path / "embeddings").mkdir(parents=True, exist_ok=True)
+        self.redis_client.hset(self.key, mapping={
+            "file_hash": file_hash,
+            "created_at": datetime.now().isoformat()
+        })
+        self.redis_client.expire(self.key, self.ttl)
+        return False
+
+    def _write_atomic(self, path: Path, raw: bytes):
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+        os.replace(tmp_path, path)
+
+    def save(self, stage: str, data: Any):
+        """Persist a stage result (JSON) and record its hash"""
+        raw = json.dumps(data, default=str).encode('utf-8')
+        self._write_atomic(self.path / f"{stage}.json", raw)
+        self.redis_client.hset(self.key, f"{stage}_hash", self._data_hash(raw))
+
+    def load(self, stage: str) -> Optional[Any]:
+        """Stage result, or None if missing or not matching its recorded hash"""
+        path = self.path / f"{stage}.json"
+        expected = self.redis_client.hget(self.key, f"{stage}_hash")
+        if not expected or not path.exists():
+            return None
+
+        raw = path.read_bytes()
+        if self._data_hash(raw) != expected:
+            logger.warning(f"Checkpoint stage {stage} for {self.document_id} is corrupt, ignoring")
+            return None
+        return json.loads(raw)
+
+    def save_embeddings(self, items: List[Dict[str, Any]]):
+        """Persist embedded chunks: [{"chunk_id", "embedding", "tokens"}]"""
+        if not items:
+            return
+        path = self.path / "embeddings" / f"{uuid.uuid4().hex}.npz"
+        tmp_path = path.with_name(f".{path.stem}.tmp.npz")
+        np.savez(
+            tmp_path,
+            chunk_ids=np.array([item["chunk_id"] for item in items]),
+            embeddings=np.asarray([item["embedding"] for item in items], dtype=np.float32),
+            tokens=np.array([item.get("tokens", 0) for item in items], dtype=np.int64)
+        )
+        os.replace(tmp_path, path)
+
+    def load_embeddings(self) -> Dict[str, Dict[str, Any]]:
+        """chunk_id -> {"chunk_id", "embedding", "tokens"} for everything embedded so far"""
+        embedded = {}
+        directory = self.path / "embeddings"
+        if not directory.exists():
+            return embedded
+
+        for path in directory.glob("*.npz"):
+            if path.name.startswith("."):
+                continue
+            try:
+                with np.load(path) as data:
+                    for chunk_id, vector, tokens in zip(data["chunk_ids"], data["embeddings"], data["tokens"]):
+                        embedded[str(chunk_id)] = {
+                            "chunk_id": str(chunk_id),
+                            "embedding": vector.tolist(),
+                            "tokens": int(tokens)
+                        }
+            except Exception as e:
+                logger.warning(f"Skipping unreadable checkpoint file {path}: {e}")
+
+        return embedded
+
+    def clear(self):
+        """Drop the checkpoint (document completed or restarted)"""
+        self.redis_client.delete(self.key)
+        if self.path.exists():
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def drop(self):
+        """Clear and stop using the checkpoint, so the next run starts over"""
+        self.dropped = True
+        self.clear()
+
+    @classmethod
+    def prune_expired(cls, redis_client, root: Path) -> int:
+        """Remove checkpoint directories whose Redis key has expired"""
+        root = Path(root)
+        if not root.exists():
+            return 0
+
+        removed = 0
+        for path in root.iterdir():
+            if path.is_dir() and not redis_client.exists(f"{cls.KEY_PREFIX}{path.name}"):
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+
+        if removed:
+            logger.info(f"Removed {removed} expired document checkpoints")
+        return removed
@@ -10,7 +10,7 @@ import logging
 import json
 import time
 import os
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union
 from datetime import datetime
 from pathlib import Path
 import redis
@@ -18,6 +18,8 @@ import mysql.connector
 import uuid
 
 from app.config import settings
+from app.services.document_checkpoint import DocumentCheckpoint
+from app.utils.metrics import record_ingest_job
 
 logger = logging.getLogger(__name__)
 
@@ -48,6 +50,13 @@ class DocumentJobProcessor:
         self.job_prefix = "doc_job:"
         self.temp_storage_path = Path(getattr(settings, 'STORAGE_PATH', '/etc/aiva-oai/storage')) / "temp_documents"
         self.temp_storage_path.mkdir(parents=True, exist_ok=True)
+        self.checkpoint_path = Path(getattr(settings, 'STORAGE_PATH', '/etc/aiva-oai/storage')) / "checkpoints"
+        
+        if settings.ENABLE_INGEST_CHECKPOINTS:
+            try:
+                DocumentCheckpoint.prune_expired(self.redis_client, self.checkpoint_path)
+            except Exception as e:
+                logger.warning(f"Could not prune document checkpoints: {e}")
         
         logger.info(f"DocumentJobProcessor initialized. Temp storage: {self.temp_storage_path}")
     
@@ -207,13 +216,15 @@ class DocumentJobProcessor:
         self.redis_client.hset(job_key, mapping=updates)
         logger.debug(f"Updated job {document_id}: {updates}")
     
-    def save_temp_file(self, document_id: str, file_content: bytes, filename: str) -> str:
-        """Save file to temporary storage, return path"""
-        # Create subdirectory for this document
+    def temp_file_path(self, document_id: str, filename: str) -> Path:
+        """Temp storage path for an upload (creates the document's directory)"""
         doc_dir = self.temp_storage_path / document_id
         doc_dir.mkdir(parents=True, exist_ok=True)
-        
-        file_path = doc_dir / filename
+        return doc_dir / filename
+    
+    def save_temp_file(self, document_id: str, file_content: bytes, filename: str) -> str:
+        """Save file to temporary storage, return path"""
+        file_path = self.temp_file_path(document_id, filename)
         with open(file_path, 'wb') as f:
             f.write(file_content)
         
@@ -245,14 +256,34 @@ class DocumentJobProcessor:
         document_id: str,
         kb_id: str,
         tenant_id: str,
-        file_content: bytes,
+        file_content: Optional[bytes],
         filename: str,
         content_type: str,
-        metadata: Dict[str, Any] = None
+        metadata: Dict[str, Any] = None,
+        file_path: str = None,
+        final_attempt: bool = True,
+        raise_errors: bool = False
     ):
         """
         Main background processing function.
-        This runs in a background task after the API returns.
+        This runs in a background task after the API returns, or in an
+        ingest worker (app/worker.py) when ENABLE_JOB_QUEUE is on.
+        
+        PDFs go through the streaming pipeline (_process_pdf_streaming) when
+        ENABLE_STREAMING_PIPELINE is on; everything else is extracted,
+        chunked, embedded and stored in one pass (_process_buffered).
+        
+        With ENABLE_INGEST_CHECKPOINTS, stage results are checkpointed
+        (DocumentCheckpoint) and a retry or reprocess of the same file
+        resumes after the last completed stage/batch instead of starting over.
+        
+        Args:
+            file_content: File bytes, or None to work from file_path / the
+                temp file (streamed uploads); bytes are then only loaded for
+                formats that can't be opened by path
+            final_attempt: False when the queue will retry a failure - the job
+                goes back to queued and the temp file is kept
+            raise_errors: Re-raise processing errors (queue workers)
         """
         from app.services.document_processor import DocumentProcessor
         from app.services.text_processor import TextProcessor
@@ -270,160 +301,49 @@ class DocumentJobProcessor:
                 current_step="Starting document processing..."
             )
             
-            # Initialize services
-            doc_processor = DocumentProcessor()
-            text_processor = TextProcessor()
-            embedding_service = EmbeddingService()
-            vector_store = VectorStore()
+            source = file_content
+            if source is None:
+                source = self._job_file_path(document_id, filename, file_path)
             
-            # Step 1: Extract content (5-20%)
-            await self.update_job_status(
-                document_id,
-                self.STATUS_PROCESSING,
-                progress=10,
-                current_step="Extracting document content..."
-            )
+            # Initialize services
+            services = {
+                "doc_processor": DocumentProcessor(),
+                "text_processor": TextProcessor(),
+                "embedding_service": EmbeddingService(),
+                "vector_store": VectorStore()
+            }
+            embedding_service = services["embedding_service"]
             
-            extraction_result = await doc_processor._extract_content(
-                file_content,
-                filename,
-                content_type,
-                document_id=document_id,
-                kb_id=kb_id,
-                tenant_id=tenant_id
-            )
+            checkpoint = await self._open_checkpoint(document_id, source, services["vector_store"])
             
-            table_chunks = extraction_result.get("table_chunks", [])
-            table_processing_stats = extraction_result.get("table_processing_stats", {})
-
-            if table_chunks:
-                logger.info(f"Document {document_id}: Found {len(table_chunks)} table row chunks")
-
-            # Update job status to show table processing progress
-            if table_processing_stats:
-                await self.update_job_status(
-                    document_id,
-                    self.STATUS_PROCESSING,
-                    progress=20,
-                    current_step=f"Processed {table_processing_stats.get('tables_processed', 0)} tables"
+            if settings.ENABLE_STREAMING_PIPELINE and self._is_pdf(filename, content_type):
+                result = await self._process_pdf_streaming(
+                    services, document_id, kb_id, tenant_id, source, filename, content_type, metadata,
+                    checkpoint=checkpoint
+                )
+            else:
+                result = await self._process_buffered(
+                    services, document_id, kb_id, tenant_id, source, filename, content_type, metadata,
+                    checkpoint=checkpoint
                 )
-                
-            await self.update_job_status(
-                document_id,
-                self.STATUS_PROCESSING,
-                progress=20,
-                current_step=f"Extracted {extraction_result.get('pages', 1)} pages"
-            )
-            
-            # Step 2: Process text and create chunks (20-40%)
-            await self.update_job_status(
-                document_id,
-                self.STATUS_CHUNKING,
-                progress=25,
-                current_step="Creating document chunks..."
-            )
-            
-            processed = await text_processor.process_text(
-                text=extraction_result["text"],
-                document_id=document_id,
-                kb_id=kb_id,
-                metadata={
-                    **(metadata or {}),
-                    "filename": filename,
-                    "content_type": content_type,
-                    "pages": extraction_result.get("pages", 0),
-                    "extracted_images": extraction_result.get("images", 0)
-                },
-                preserve_formatting=True
-            )
-            
-            table_chunks = extraction_result.get("table_chunks", [])
-            if table_chunks:
-                logger.info(f"Adding {len(table_chunks)} table row chunks")
-                
-                # Get the current chunk count to continue indexing
-                current_chunk_count = len(processed["chunks"])
-                
-                for idx, chunk in enumerate(table_chunks):
-                    chunk_id = str(uuid.uuid4())
-                    processed["chunks"].append({
-                        "chunk_id": chunk_id,
-                        "chunk_index": current_chunk_count + idx,  # ADD THIS LINE
-                        "content": chunk["content"],
-                        "type": "table",
-                        "metadata": {
-                            **chunk.get("metadata", {}),
-                            "document_id": document_id,
-                            "kb_id": kb_id
-                        }
-                    })
-                    
-            total_chunks = len(processed["chunks"])
-            
-            await self.update_job_status(
-                document_id,
-                self.STATUS_CHUNKING,
-                progress=40,
-                current_step=f"Created {total_chunks} chunks",
-                total_chunks=total_chunks
-            )
-            
-            logger.info(f"Document {document_id}: Created {total_chunks} chunks")
-            
-            # Step 3: Generate embeddings in batches (40-80%)
-            await self.update_job_status(
-                document_id,
-                self.STATUS_EMBEDDING,
-                progress=45,
-                current_step="Generating embeddings..."
-            )
-            
-            # Use batch embedding for efficiency
-            embeddings_result = await self._generate_embeddings_batched(
-                embedding_service,
-                processed["chunks"],
-                document_id,
-                batch_size=100  # Process 100 chunks per API call
-            )
-            
-            await self.update_job_status(
-                document_id,
-                self.STATUS_EMBEDDING,
-                progress=80,
-                current_step=f"Generated {len(embeddings_result['embeddings'])} embeddings",
-                processed_chunks=len(embeddings_result['embeddings'])
-            )
-            
-            # Step 4: Store in vector store (80-95%)
-            await self.update_job_status(
-                document_id,
-                self.STATUS_STORING,
-                progress=85,
-                current_step="Storing vectors..."
-            )
             
-            await vector_store.store_document(
-                document_id=document_id,
-                kb_id=kb_id,
-                tenant_id=tenant_id,
-                chunks=processed["chunks"],
-                embeddings=embeddings_result["embeddings"]
-            )
+            total_chunks = result["total_chunks"]
             
             # Step 5: Update database and finalize (95-100%)
             processing_time = int((time.time() - start_time) * 1000)
             
             processing_stats = {
-                "total_pages": extraction_result.get("pages", 0),
+                "total_pages": result["pages"],
                 "total_chunks": total_chunks,
-                "extracted_images": extraction_result.get("images", 0),
-                "detected_tables": extraction_result.get("tables", 0),  # Already exists but now has real count
-                "table_chunks_added": len(extraction_result.get("table_chunks", [])),  # NEW
-                "table_processing_cost": extraction_result.get("table_processing_stats", {}).get("estimated_cost_usd", 0),  # NEW               
-                "total_tokens": embeddings_result.get("total_tokens", 0),
+                "extracted_images": result["images"],
+                "detected_tables": result["tables"],  # Already exists but now has real count
+                "table_chunks_added": result["table_chunks_added"],  # NEW
+                "table_processing_cost": result["table_processing_cost"],  # NEW               
+                "table_pages_skipped": result["table_pages_skipped"],
+                "total_tokens": result["total_tokens"],
                 "processing_time_ms": processing_time,
-                "chunks_by_type": processed.get("chunks_by_type", {}),
-                "languages": processed.get("languages", []),
+                "chunks_by_type": result["chunks_by_type"],
+                "languages": result["languages"],
                 "embedding_model": embedding_service.model
             }
             
@@ -461,12 +381,32 @@ class DocumentJobProcessor:
             
             # Cleanup temp files
             self.cleanup_temp_file(document_id)
+            if checkpoint is not None:
+                await asyncio.to_thread(checkpoint.clear)
             
             logger.info(f"Document {document_id} processed successfully in {processing_time}ms")
+            record_ingest_job(
+                "completed",
+                time.time() - start_time,
+                chunks=total_chunks,
+                pages=result["pages"]
+            )
             
         except Exception as e:
             logger.error(f"Document processing failed for {document_id}: {e}", exc_info=True)
             
+            if not final_attempt:
+                record_ingest_job("retried", time.time() - start_time)
+                await self.update_job_status(
+                    document_id,
+                    self.STATUS_QUEUED,
+                    current_step="Processing failed, queued for retry",
+                    error_message=str(e)
+                )
+                raise
+            
+            record_ingest_job("failed", time.time() - start_time)
+            
             # Update job status to failed
             await self.update_job_status(
                 document_id,
@@ -478,84 +418,809 @@ class DocumentJobProcessor:
             # Update document in MySQL
             await self._update_document_failed(document_id, str(e))
             
+            # Drop partially stored chunks; the checkpoint is kept so a
+            # reprocess of the same file can still resume
+            try:
+                await VectorStore().delete_document(document_id)
+            except Exception as cleanup_error:
+                logger.error(f"Failed to remove partial chunks for {document_id}: {cleanup_error}")
+            
             # Cleanup temp files
             self.cleanup_temp_file(document_id)
+            
+            if raise_errors:
+                raise
     
-    async def _generate_embeddings_batched(
+    def _job_file_path(self, document_id: str, filename: str, file_path: str = None) -> str:
+        """File of a job without bytes: file_path if given, else the upload's temp file"""
+        path = Path(file_path) if file_path else self.temp_storage_path / document_id / filename
+        if not path.exists():
+            raise FileNotFoundError(f"No stored file for document {document_id}")
+        return str(path)
+    
+    @staticmethod
+    def _is_pdf(filename: str, content_type: str) -> bool:
+        """Same PDF detection as DocumentProcessor._extract_content"""
+        return filename.lower().split('.')[-1] == 'pdf' or 'pdf' in (content_type or '')
+    
+    async def _open_checkpoint(
+        self, document_id: str, source: Union[bytes, str], vector_store
+    ) -> Optional[DocumentCheckpoint]:
+        """
+        Resume or start the document's checkpoint (None when disabled)
+        
+        Unless a checkpoint of the same file is resumed, chunks left by an
+        earlier run (lost worker, reprocess) are removed first.
+        """
+        checkpoint = None
+        resumed = False
+        
+        if settings.ENABLE_INGEST_CHECKPOINTS:
+            try:
+                checkpoint = DocumentCheckpoint(document_id, self.redis_client, self.checkpoint_path)
+                resumed = await asyncio.to_thread(checkpoint.open, DocumentCheckpoint.file_hash(source))
+            except Exception as e:
+                logger.warning(f"Checkpointing unavailable for document {document_id}: {e}")
+                checkpoint = None
+        
+        if not resumed:
+            await vector_store.delete_document(document_id)
+        
+        return checkpoint
+    
+    async def _load_checkpoint(self, checkpoint: Optional[DocumentCheckpoint], stage: str) -> Optional[Any]:
+        """Stage result from the checkpoint, or None (disabled, dropped, missing, unreadable)"""
+        if checkpoint is None or checkpoint.dropped:
+            return None
+        
+        try:
+            data = await asyncio.to_thread(checkpoint.load, stage)
+        except Exception as e:
+            logger.warning(f"Could not load checkpoint stage {stage} for {checkpoint.document_id}: {e}")
+            return None
+        
+        if data is not None:
+            logger.info(f"Document {checkpoint.document_id}: resumed {stage} from checkpoint")
+        return data
+    
+    async def _save_checkpoint(self, checkpoint: Optional[DocumentCheckpoint], stage: str, data: Any):
+        """
+        Checkpoint a stage result
+        
+        A failed save drops the checkpoint for the rest of the run: a later
+        run then starts over and deletes the chunks stored by this one
+        instead of resuming with chunks (and random chunk IDs) it can't
+        match. If even that fails the stage fails.
+        """
+        if checkpoint is None or checkpoint.dropped:
+            return
+        
+        try:
+            await asyncio.to_thread(checkpoint.save, stage, data)
+        except Exception as e:
+            logger.warning(
+                f"Could not save checkpoint stage {stage} for {checkpoint.document_id}, "
+                f"dropping checkpoint: {e}"
+            )
+            try:
+                await asyncio.to_thread(checkpoint.drop)
+            except Exception as drop_error:
+                raise RuntimeError(
+                    f"Checkpoint for document {checkpoint.document_id} could not be saved or dropped: {drop_error}"
+                ) from e
+    
+    async def _load_checkpoint_embeddings(self, checkpoint: Optional[DocumentCheckpoint]) -> Dict[str, Any]:
+        """chunk_id -> embedding for chunks embedded by an earlier run"""
+        if checkpoint is None:
+            return {}
+        
+        try:
+            embedded = await asyncio.to_thread(checkpoint.load_embeddings)
+        except Exception as e:
+            logger.warning(f"Could not load checkpointed embeddings for {checkpoint.document_id}: {e}")
+            return {}
+        
+        if embedded:
+            logger.info(f"Document {checkpoint.document_id}: {len(embedded)} embeddings from checkpoint")
+        return embedded
+    
+    async def _unstored_chunks(
         self,
-        embedding_service,
+        vector_store,
+        document_id: str,
         chunks: List[Dict[str, Any]],
+        checkpoint: Optional[DocumentCheckpoint]
+    ) -> List[Dict[str, Any]]:
+        """Chunks not stored yet (a resumed run may have stored some already)"""
+        if checkpoint is None:
+            return chunks
+        
+        stored = await vector_store.get_stored_chunk_ids(document_id)
+        return [chunk for chunk in chunks if chunk["chunk_id"] not in stored]
+    
+    async def _process_buffered(
+        self,
+        services: Dict[str, Any],
         document_id: str,
-        batch_size: int = 100
+        kb_id: str,
+        tenant_id: str,
+        source: Union[bytes, str],
+        filename: str,
+        content_type: str,
+        metadata: Dict[str, Any] = None,
+        checkpoint: Optional[DocumentCheckpoint] = None
     ) -> Dict[str, Any]:
         """
-        Generate embeddings in batches for efficiency.
-        OpenAI allows up to 2048 texts per request.
+        Extract the whole document, then chunk, embed and store it (steps 1-4)
+        
+        PDFs are extracted from `source` as is (bytes or path); other formats
+        are read into memory first.
         
-        Note: embedding_service.generate_batch_embeddings() returns List[List[float]]
+        Extraction and chunks are checkpointed as whole stages, embeddings
+        per API response; a resumed run only embeds and stores what's missing.
+        
+        Returns:
+            Totals for processing_stats (see process_document_background)
         """
-        all_embeddings = []
-        total_tokens = 0
+        doc_processor = services["doc_processor"]
+        text_processor = services["text_processor"]
+        embedding_service = services["embedding_service"]
+        vector_store = services["vector_store"]
         
-        total_chunks = len(chunks)
+        # Step 1: Extract content (5-20%)
+        await self.update_job_status(
+            document_id,
+            self.STATUS_PROCESSING,
+            progress=10,
+            current_step="Extracting document content..."
+        )
         
-        for i in range(0, total_chunks, batch_size):
-            batch = chunks[i:i + batch_size]
-            batch_texts = [chunk["content"] for chunk in batch]
+        extraction_result = await self._load_checkpoint(checkpoint, "extraction")
+        if extraction_result is None:
+            if isinstance(source, str) and not self._is_pdf(filename, content_type):
+                source = await asyncio.to_thread(Path(source).read_bytes)
             
-            # Generate batch embeddings
-            try:
-                # generate_batch_embeddings returns List[List[float]] - just the raw embeddings
-                batch_embedding_vectors = await embedding_service.generate_batch_embeddings(batch_texts)
+            extraction_result = await doc_processor._extract_content(
+                source,
+                filename,
+                content_type,
+                document_id=document_id,
+                kb_id=kb_id,
+                tenant_id=tenant_id
+            )
+            await self._save_checkpoint(checkpoint, "extraction", {
+                key: value for key, value in extraction_result.items() if key != "extracted_images"
+            })
+        
+        table_chunks = extraction_result.get("table_chunks", [])
+        table_processing_stats = extraction_result.get("table_processing_stats", {})
+
+        if table_chunks:
+            logger.info(f"Document {document_id}: Found {len(table_chunks)} table row chunks")
+
+        # Update job status to show table processing progress
+        if table_processing_stats:
+            await self.update_job_status(
+                document_id,
+                self.STATUS_PROCESSING,
+                progress=20,
+                current_step=f"Processed {table_processing_stats.get('tables_processed', 0)} tables"
+            )
+            
+        await self.update_job_status(
+            document_id,
+            self.STATUS_PROCESSING,
+            progress=20,
+            current_step=f"Extracted {extraction_result.get('pages', 1)} pages"
+        )
+        
+        # Step 2: Process text and create chunks (20-40%)
+        await self.update_job_status(
+            document_id,
+            self.STATUS_CHUNKING,
+            progress=25,
+            current_step="Creating document chunks..."
+        )
+        
+        # Chunk IDs are random, so reusing the checkpointed chunks is what lets
+        # checkpointed embeddings and already stored rows be matched up
+        processed = await self._load_checkpoint(checkpoint, "chunks")
+        if processed is None:
+            processed = await text_processor.process_text(
+                text=extraction_result["text"],
+                document_id=document_id,
+                kb_id=kb_id,
+                metadata={
+                    **(metadata or {}),
+                    "filename": filename,
+                    "content_type": content_type,
+                    "pages": extraction_result.get("pages", 0),
+                    "extracted_images": extraction_result.get("images", 0)
+                },
+                preserve_formatting=True
+            )
+            
+            if table_chunks:
+                logger.info(f"Adding {len(table_chunks)} table row chunks")
+                processed["chunks"].extend(
+                    self._table_row_chunks(table_chunks, document_id, kb_id, len(processed["chunks"]))
+                )
+            
+            await self._save_checkpoint(checkpoint, "chunks", {
+                "chunks": processed["chunks"],
+                "chunks_by_type": processed.get("chunks_by_type", {}),
+                "languages": processed.get("languages", [])
+            })
                 
-                # Map embeddings to chunks
-                for j, (chunk, embedding_vector) in enumerate(zip(batch, batch_embedding_vectors)):
-                    # Count tokens for this chunk
-                    chunk_tokens = embedding_service.count_tokens(chunk["content"])
-                    
-                    all_embeddings.append({
-                        "chunk_id": chunk["chunk_id"],
-                        "embedding": embedding_vector,
-                        "tokens": chunk_tokens
-                    })
-                    total_tokens += chunk_tokens
+        total_chunks = len(processed["chunks"])
+        
+        await self.update_job_status(
+            document_id,
+            self.STATUS_CHUNKING,
+            progress=40,
+            current_step=f"Created {total_chunks} chunks",
+            total_chunks=total_chunks
+        )
+        
+        logger.info(f"Document {document_id}: Created {total_chunks} chunks")
+        
+        # Step 3: Generate embeddings in batches (40-80%)
+        await self.update_job_status(
+            document_id,
+            self.STATUS_EMBEDDING,
+            progress=45,
+            current_step="Generating embeddings..."
+        )
+        
+        # Use batch embedding for efficiency
+        embeddings_result = await self._generate_embeddings_batched(
+            embedding_service,
+            processed["chunks"],
+            document_id,
+            cached=await self._load_checkpoint_embeddings(checkpoint),
+            checkpoint=checkpoint
+        )
+        
+        await self.update_job_status(
+            document_id,
+            self.STATUS_EMBEDDING,
+            progress=80,
+            current_step=f"Generated {len(embeddings_result['embeddings'])} embeddings",
+            processed_chunks=len(embeddings_result['embeddings'])
+        )
+        
+        # Step 4: Store in vector store (80-95%)
+        await self.update_job_status(
+            document_id,
+            self.STATUS_STORING,
+            progress=85,
+            current_step="Storing vectors..."
+        )
+        
+        chunks_to_store = await self._unstored_chunks(vector_store, document_id, processed["chunks"], checkpoint)
+        if chunks_to_store:
+            await vector_store.store_document(
+                document_id=document_id,
+                kb_id=kb_id,
+                tenant_id=tenant_id,
+                chunks=chunks_to_store,
+                embeddings=embeddings_result["embeddings"]
+            )
+        
+        return {
+            "pages": extraction_result.get("pages", 0),
+            "total_chunks": total_chunks,
+            "images": extraction_result.get("images", 0),
+            "tables": extraction_result.get("tables", 0),
+            "table_chunks_added": len(table_chunks),
+            "table_processing_cost": table_processing_stats.get("estimated_cost_usd", 0),
+            "table_pages_skipped": table_processing_stats.get("pages_skipped", 0),
+            "total_tokens": embeddings_result.get("total_tokens", 0),
+            "chunks_by_type": processed.get("chunks_by_type", {}),
+            "languages": processed.get("languages", [])
+        }
+    
+    @staticmethod
+    def _table_row_chunks(
+        table_chunks: List[Dict[str, Any]],
+        document_id: str,
+        kb_id: str,
+        start_index: int
+    ) -> List[Dict[str, Any]]:
+        """Chunk objects for TableProcessor row chunks, indexed after the text chunks"""
+        return [
+            {
+                "chunk_id": str(uuid.uuid4()),
+                "chunk_index": start_index + idx,
+                "content": chunk["content"],
+                "type": "table",
+                "metadata": {
+                    **chunk.get("metadata", {}),
+                    "document_id": document_id,
+                    "kb_id": kb_id
+                }
+            }
+            for idx, chunk in enumerate(table_chunks)
+        ]
+    
+    async def _process_pdf_streaming(
+        self,
+        services: Dict[str, Any],
+        document_id: str,
+        kb_id: str,
+        tenant_id: str,
+        source: Union[bytes, str],
+        filename: str,
+        content_type: str,
+        metadata: Dict[str, Any] = None,
+        checkpoint: Optional[DocumentCheckpoint] = None
+    ) -> Dict[str, Any]:
+        """
+        Streaming PDF ingestion: page extraction -> chunking -> embedding -> store
+        
+        Stages run concurrently and hand PIPELINE_PAGE_BATCH-page batches to
+        each other through bounded queues (PIPELINE_QUEUE_SIZE), so memory
+        stays flat regardless of page count and progress follows pages
+        actually stored. Tables and images (_extract_pdf_extras) are processed
+        alongside and their chunks go through the same stages last.
+        
+        With a checkpoint, the extras and every chunked batch are saved; a
+        resumed run replays saved batches without extracting or chunking them
+        again, and only embeds and stores chunks that are missing. Chunks
+        stored before a failure are kept for the retry (process_document_background
+        removes them once the job fails for good).
+        
+        Returns:
+            Totals for processing_stats (see process_document_background)
+        """
+        from app.services import extractors
+        from app.services.extraction_pool import run_extraction
+        
+        doc_processor = services["doc_processor"]
+        text_processor = services["text_processor"]
+        embedding_service = services["embedding_service"]
+        vector_store = services["vector_store"]
+        
+        page_batch = max(1, settings.PIPELINE_PAGE_BATCH)
+        source = self._pdf_source(document_id, filename, source)
+        
+        total_pages = await run_extraction(extractors.pdf_page_count, source)
+        if total_pages > settings.MAX_PAGES_PER_DOCUMENT:
+            raise ValueError(
+                f"PDF has {total_pages} pages, maximum is {settings.MAX_PAGES_PER_DOCUMENT}"
+            )
+        
+        await self.update_job_status(
+            document_id,
+            self.STATUS_PROCESSING,
+            progress=10,
+            current_step=f"Processing {total_pages} pages..."
+        )
+        
+        chunk_metadata = {
+            **(metadata or {}),
+            "filename": filename,
+            "content_type": content_type,
+            "pages": total_pages
+        }
+        totals = {
+            "pages": total_pages,
+            "total_chunks": 0,
+            "images": 0,
+            "tables": 0,
+            "table_chunks_added": 0,
+            "table_processing_cost": 0,
+            "table_pages_skipped": 0,
+            "total_tokens": 0,
+            "chunks_by_type": {},
+            "languages": []
+        }
+        state = {"next_index": 0, "pages_stored": 0}
+        
+        cached_embeddings = await self._load_checkpoint_embeddings(checkpoint)
+        stored_chunk_ids = set()
+        if checkpoint is not None:
+            stored_chunk_ids = await vector_store.get_stored_chunk_ids(document_id)
+        
+        page_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+        embedded_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.PIPELINE_QUEUE_SIZE)
+        
+        async def extract_extras():
+            extras = await self._load_checkpoint(checkpoint, "extras")
+            if extras is None:
+                extras = await doc_processor._extract_pdf_extras(
+                    source,
+                    document_id=document_id,
+                    kb_id=kb_id,
+                    tenant_id=tenant_id,
+                    filename=filename
+                )
+                await self._save_checkpoint(checkpoint, "extras", {
+                    key: value for key, value in extras.items() if key != "extracted_images"
+                })
+            return extras
+        
+        extras_task = asyncio.create_task(extract_extras())
+        
+        async def extract_pages():
+            # Saved batches are only replayed while they're contiguous, so
+            # chunk indexes stay consistent with what was stored before
+            resuming = checkpoint is not None
+            
+            for start in range(0, total_pages, page_batch):
+                end = min(start + page_batch, total_pages)
+                item = {"batch": f"batch_{start}", "pages": end - start, "last_page": end}
+                
+                saved = await self._load_checkpoint(checkpoint, item["batch"]) if resuming else None
+                if saved is not None:
+                    await page_queue.put({**item, "saved": saved})
+                    continue
+                resuming = False
+                
+                pages = await run_extraction(extractors.extract_pdf_pages, source, start, end)
+                text = "\n\n".join(f"[Page {number}]\n{page_text}" for number, page_text in pages)
+                await page_queue.put({**item, "text": text})
+            
+            extras = await extras_task
+            totals["images"] = extras["images"]
+            totals["tables"] = extras["tables"]
+            totals["table_chunks_added"] = len(extras["table_chunks"])
+            totals["table_processing_cost"] = extras["table_processing_stats"].get("estimated_cost_usd", 0)
+            totals["table_pages_skipped"] = extras["table_processing_stats"].get("pages_skipped", 0)
+            
+            table_text = doc_processor._format_table_descriptions(extras["table_descriptions"])
+            if table_text or extras["table_chunks"]:
+                item = {"batch": "batch_tables", "pages": 0}
+                saved = await self._load_checkpoint(checkpoint, item["batch"]) if resuming else None
+                if saved is not None:
+                    item["saved"] = saved
+                else:
+                    item.update(text=table_text, table_chunks=extras["table_chunks"])
+                await page_queue.put(item)
+            await page_queue.put(None)
+        
+        def add_counts(chunks_by_type: Dict[str, int], languages: List[str]):
+            for chunk_type, count in chunks_by_type.items():
+                totals["chunks_by_type"][chunk_type] = totals["chunks_by_type"].get(chunk_type, 0) + count
+            for language in languages:
+                if language not in totals["languages"]:
+                    totals["languages"].append(language)
+        
+        async def chunk_pages():
+            while (item := await page_queue.get()) is not None:
+                saved = item.pop("saved", None)
+                if saved is not None:
+                    add_counts(saved["chunks_by_type"], saved["languages"])
+                    state["next_index"] = saved["next_index"]
+                    await chunk_queue.put({**item, "chunks": saved["chunks"]})
+                    continue
+                
+                chunks = []
+                chunks_by_type = {}
+                languages = []
+                if item["text"].strip():
+                    processed = await text_processor.process_text(
+                        text=item["text"],
+                        document_id=document_id,
+                        kb_id=kb_id,
+                        metadata=chunk_metadata,
+                        preserve_formatting=True
+                    )
+                    chunks = processed["chunks"]
+                    for chunk in chunks:
+                        chunk["chunk_index"] += state["next_index"]
+                    chunks_by_type = processed.get("chunks_by_type", {})
+                    languages = processed.get("languages", [])
+                    add_counts(chunks_by_type, languages)
                 
-                # Update progress
-                processed_so_far = i + len(batch)
-                progress = 45 + int((processed_so_far / total_chunks) * 35)  # 45-80%
+                if item.get("table_chunks"):
+                    logger.info(f"Adding {len(item['table_chunks'])} table row chunks")
+                    chunks.extend(self._table_row_chunks(
+                        item["table_chunks"], document_id, kb_id, state["next_index"] + len(chunks)
+                    ))
+                
+                state["next_index"] += len(chunks)
+                await self._save_checkpoint(checkpoint, item["batch"], {
+                    "chunks": chunks,
+                    "next_index": state["next_index"],
+                    "chunks_by_type": chunks_by_type,
+                    "languages": languages
+                })
+                await chunk_queue.put({"batch": item["batch"], "pages": item["pages"],
+                                       "last_page": item.get("last_page"), "chunks": chunks})
+            await chunk_queue.put(None)
+        
+        async def embed_chunks():
+            while (item := await chunk_queue.get()) is not None:
+                pending = [chunk for chunk in item["chunks"] if chunk["chunk_id"] not in stored_chunk_ids]
+                embeddings = {"embeddings": [], "total_tokens": 0}
+                if pending:
+                    embeddings = await self._embed_chunks(
+                        embedding_service, pending, document_id,
+                        cached=cached_embeddings, checkpoint=checkpoint
+                    )
+                totals["total_tokens"] += embeddings["total_tokens"]
+                await embedded_queue.put({**item, "pending": pending, "embeddings": embeddings["embeddings"]})
+            await embedded_queue.put(None)
+        
+        async def store_chunks():
+            while (item := await embedded_queue.get()) is not None:
+                if item["pending"]:
+                    await vector_store.store_document(
+                        document_id=document_id,
+                        kb_id=kb_id,
+                        tenant_id=tenant_id,
+                        chunks=item["pending"],
+                        embeddings=item["embeddings"],
+                        mark_completed=False
+                    )
+                totals["total_chunks"] += len(item["chunks"])
+                state["pages_stored"] += item["pages"]
+                
+                if item.get("last_page"):
+                    step = f"Stored pages 1-{item['last_page']} of {total_pages}"
+                else:
+                    step = "Stored table data"
                 await self.update_job_status(
                     document_id,
-                    self.STATUS_EMBEDDING,
-                    progress=progress,
-                    current_step=f"Generating embeddings... ({processed_so_far}/{total_chunks})",
-                    processed_chunks=processed_so_far
+                    self.STATUS_PROCESSING,
+                    progress=10 + int(state["pages_stored"] / max(total_pages, 1) * 85),  # 10-95%
+                    current_step=f"{step} ({totals['total_chunks']} chunks)",
+                    total_chunks=state["next_index"],
+                    processed_chunks=totals["total_chunks"]
                 )
-                
-                logger.debug(f"Processed batch {i // batch_size + 1}: {len(batch)} chunks")
-                
-            except Exception as e:
-                logger.error(f"Batch embedding failed at index {i}: {e}")
-                # Fall back to individual processing for this batch
-                for chunk in batch:
-                    try:
-                        result = await embedding_service.generate_embedding(chunk["content"])
-                        all_embeddings.append({
-                            "chunk_id": chunk["chunk_id"],
-                            "embedding": result["embedding"],
-                            "tokens": result["tokens"]
-                        })
-                        total_tokens += result["tokens"]
-                    except Exception as chunk_error:
-                        logger.error(f"Failed to generate embedding for chunk {chunk['chunk_id']}: {chunk_error}")
+        
+        stages = [
+            asyncio.create_task(stage())
+            for stage in (extract_pages, chunk_pages, embed_chunks, store_chunks)
+        ]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            for task in stages + [extras_task]:
+                task.cancel()
+            await asyncio.gather(*stages, extras_task, return_exceptions=True)
+            raise
+        
+        logger.info(
+            f"Document {document_id}: streamed {total_pages} pages into {totals['total_chunks']} chunks"
+        )
+        return totals
+    
+    def _pdf_source(self, document_id: str, filename: str, source: Union[bytes, str]) -> Union[bytes, str]:
+        """
+        File path for extraction pool tasks when there is one (avoids
+        pickling the whole PDF for every page batch), else the bytes
+        """
+        if isinstance(source, str):
+            return source
+        file_path = self.temp_storage_path / document_id / filename
+        return str(file_path) if file_path.exists() else source
+    
+    async def _generate_embeddings_batched(
+        self,
+        embedding_service,
+        chunks: List[Dict[str, Any]],
+        document_id: str,
+        batch_size: int = None,
+        cached: Dict[str, Any] = None,
+        checkpoint: Optional[DocumentCheckpoint] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate embeddings with the token-aware batcher: requests are packed
+        by token budget and run concurrently under the shared rate limiter;
+        failing requests are bisected. Billed tokens come from API usage.
+        
+        Args:
+            batch_size: Max chunks per request (default EMBEDDING_BATCH_MAX_ITEMS)
+            cached, checkpoint: See _embed_chunks
+        """
+        async def report_progress(done: int, total: int):
+            progress = 45 + int((done / total) * 35)  # 45-80%
+            await self.update_job_status(
+                document_id,
+                self.STATUS_EMBEDDING,
+                progress=progress,
+                current_step=f"Generating embeddings... ({done}/{total})",
+                processed_chunks=done
+            )
+        
+        return await self._embed_chunks(
+            embedding_service, chunks, document_id, batch_size=batch_size, on_progress=report_progress,
+            cached=cached, checkpoint=checkpoint
+        )
+    
+    async def _embed_chunks(
+        self,
+        embedding_service,
+        chunks: List[Dict[str, Any]],
+        document_id: str,
+        batch_size: int = None,
+        on_progress=None,
+        cached: Dict[str, Any] = None,
+        checkpoint: Optional[DocumentCheckpoint] = None
+    ) -> Dict[str, Any]:
+        """
+        Embed chunks with EmbeddingBatcher; chunks that fail are logged and left out
+        
+        Args:
+            cached: chunk_id -> embedding from an earlier run's checkpoint;
+                those chunks aren't sent again
+            checkpoint: Each API response's vectors are saved to it
+        """
+        from app.services.embedding_batcher import EmbeddingBatcher
+        
+        total_chunks = len(chunks)
+        cached = cached or {}
+        pending = [chunk for chunk in chunks if chunk["chunk_id"] not in cached]
+        
+        on_result = None
+        if checkpoint is not None:
+            async def on_result(indices: List[int], vectors: List[List[float]], tokens: List[int]):
+                if checkpoint.dropped:
+                    return
+                await asyncio.to_thread(checkpoint.save_embeddings, [
+                    {"chunk_id": pending[index]["chunk_id"], "embedding": vector, "tokens": count}
+                    for index, vector, count in zip(indices, vectors, tokens)
+                ])
+        
+        result = {"embeddings": [], "tokens": [], "total_tokens": 0, "requests": 0}
+        if pending:
+            batcher = EmbeddingBatcher(embedding_service, max_items_per_request=batch_size)
+            result = await batcher.embed(
+                [chunk["content"] for chunk in pending], on_progress=on_progress, on_result=on_result
+            )
+        
+        embedded = {}
+        for chunk, vector, tokens in zip(pending, result["embeddings"], result["tokens"]):
+            if vector is None:
+                logger.error(f"Failed to generate embedding for chunk {chunk['chunk_id']}")
+                continue
+            embedded[chunk["chunk_id"]] = {
+                "chunk_id": chunk["chunk_id"],
+                "embedding": vector,
+                "tokens": tokens
+            }
+        
+        all_embeddings = []
+        cached_tokens = 0
+        for chunk in chunks:
+            if chunk["chunk_id"] in cached:
+                all_embeddings.append(cached[chunk["chunk_id"]])
+                cached_tokens += cached[chunk["chunk_id"]]["tokens"]
+            elif chunk["chunk_id"] in embedded:
+                all_embeddings.append(embedded[chunk["chunk_id"]])
+        
+        logger.info(
+            f"Document {document_id}: embedded {len(all_embeddings)}/{total_chunks} chunks "
+            f"in {result['requests']} requests ({total_chunks - len(pending)} from checkpoint)"
+        )
         
         return {
             "embeddings": all_embeddings,
             "total_embeddings": len(all_embeddings),
-            "total_tokens": total_tokens,
+            "total_tokens": result["total_tokens"] + cached_tokens,
             "model": embedding_service.model,
             "dimension": embedding_service.dimension
         }
     
+    async def process_scrape_job(
+        self,
+        job_id: str,
+        url: str,
+        kb_id: str,
+        tenant_id: str,
+        max_depth: int,
+        max_pages: int,
+        metadata: dict,
+        final_attempt: bool = True,
+        raise_errors: bool = False
+    ):
+        """
+        Scrape a URL and ingest every page (scrape_job:{job_id} status hash)
+        
+        Runs as a background task or in an ingest worker; final_attempt and
+        raise_errors work as in process_document_background.
+        """
+        from app.services.document_processor import DocumentProcessor
+        from app.services.web_scraper import WebScraper
+        
+        web_scraper = WebScraper()
+        document_processor = DocumentProcessor()
+        job_key = f"scrape_job:{job_id}"
+        
+        def update_status(status: str, progress: int = None, current_step: str = None, **kwargs):
+            updates = {"status": status}
+            if progress is not None:
+                updates["progress"] = str(progress)
+            if current_step:
+                updates["current_step"] = current_step
+            for k, v in kwargs.items():
+                updates[k] = str(v) if v is not None else ""
+            self.redis_client.hset(job_key, mapping=updates)
+        
+        try:
+            update_status("scraping", 10, "Starting web scrape...")
+            
+            # Scrape website
+            scrape_result = await web_scraper.scrape_url(
+                url=url,
+                max_depth=max_depth,
+                max_pages=max_pages
+            )
+            
+            total_pages = scrape_result.get('total_pages', 0)
+            update_status("scraping", 30, f"Scraped {total_pages} pages", 
+                         pages_scraped=total_pages, total_pages=total_pages)
+            
+            if total_pages == 0:
+                update_status("failed", 100, "No pages could be scraped",
+                             error_message="No pages could be scraped from the URL",
+                             completed_at=datetime.now().isoformat())
+                return
+            
+            # Process each scraped page
+            update_status("processing", 40, "Processing scraped content...")
+            processed_count = 0
+            
+            for i, page in enumerate(scrape_result['pages']):
+                document_id = str(uuid.uuid4())
+                
+                try:
+                    result = await document_processor.process_text_content(
+                        document_id=document_id,
+                        kb_id=kb_id,
+                        tenant_id=tenant_id,
+                        text=page['text'],
+                        title=page['title'],
+                        source_url=page['url'],
+                        metadata={
+                            **metadata,
+                            **page.get('metadata', {}),
+                            'source_type': 'web_scrape',
+                            'depth': page.get('depth', 0),
+                            'scrape_job_id': job_id
+                        }
+                    )
+                    processed_count += 1
+                    
+                    # Update progress
+                    progress = 40 + int((i + 1) / total_pages * 50)
+                    update_status("processing", progress, 
+                                 f"Processed {processed_count}/{total_pages} pages",
+                                 pages_processed=processed_count)
+                                 
+                except Exception as e:
+                    logger.error(f"Error processing page {page['url']}: {e}")
+                    continue
+            
+            # Update KB stats
+            if processed_count > 0:
+                await self._update_kb_stats(kb_id)
+            
+            # Mark completed
+            update_status("completed", 100, 
+                         f"Completed: {processed_count} pages processed",
+                         pages_processed=processed_count,
+                         completed_at=datetime.now().isoformat())
+            
+            logger.info(f"Scrape job {job_id} completed: {processed_count}/{total_pages} pages")
+            
+        except Exception as e:
+            logger.error(f"Scrape job {job_id} failed: {e}")
+            
+            if not final_attempt:
+                update_status("queued", 0, "Scrape failed, queued for retry", error_message=str(e))
+                raise
+            
+            update_status("failed", 100, str(e),
+                         error_message=str(e),
+                         completed_at=datetime.now().isoformat())
+            
+            if raise_errors:
+                raise
+    
     async def _update_document_completed(self, document_id: str, processing_stats: Dict[str, Any]):
         """Update document status to completed in MySQL"""
         conn = self._get_mysql_connection()
@@ -5,20 +5,16 @@ Document Processor Service - ENHANCED VERSION
 - Generates CLIP embeddings for images
 """
 
+import asyncio
 import io
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union
 from datetime import datetime
 import json
 import uuid
 import os
 from pathlib import Path
 
-from pypdf import PdfReader
-from docx import Document
-from pptx import Presentation
-from openpyxl import load_workbook
-from bs4 import BeautifulSoup
 from PIL import Image
 
 # NEW: For PDF image extraction
@@ -36,6 +32,8 @@ from app.services.vector_store import VectorStore
 from app.services.pdf_image_extractor import PDFImageExtractor
 from app.models.responses import DocumentProcessingResult, EmbeddingResult
 from app.services.table_processor import get_table_processor
+from app.services import extractors
+from app.services.extraction_pool import run_extraction
 
 logger = logging.getLogger(__name__)
 
@@ -202,7 +200,7 @@ class DocumentProcessor:
     
     async def _extract_content(
         self,
-        file_content: bytes,
+        file_content: Union[bytes, str],
         filename: str,
         content_type: str,
         document_id: str = None,  # ✅ Added
@@ -213,7 +211,7 @@ class DocumentProcessor:
         Extract content from different file types
         
         Args:
-            file_content: File content as bytes
+            file_content: File content as bytes (PDFs: bytes or a file path)
             filename: Original filename
             content_type: MIME type
             document_id: Document ID (for image extraction)
@@ -251,7 +249,7 @@ class DocumentProcessor:
     
     async def _extract_pdf(
         self, 
-        file_content: bytes, 
+        file_content: Union[bytes, str], 
         document_id: str = None, 
         kb_id: str = None, 
         tenant_id: str = None,
@@ -261,105 +259,197 @@ class DocumentProcessor:
         Extract text, images, AND tables from PDF
         
         Args:
-            file_content: PDF file bytes
+            file_content: PDF file bytes, or a file path
             document_id: Document ID (required for image extraction)
             kb_id: Knowledge base ID (required for image extraction)
             tenant_id: Tenant ID (required for image extraction)
             filename: Original filename for context
         """
         try:
-            import fitz  # PyMuPDF
-            from pypdf import PdfReader
-            
-            # Extract text using PyPDF2
-            pdf_file = io.BytesIO(file_content)
-            reader = PdfReader(pdf_file)
-            
-            text_parts = []
-            total_pages = len(reader.pages)
-            
-            for page_num, page in enumerate(reader.pages, 1):
-                text = page.extract_text()
-                if text:
-                    text_parts.append(f"[Page {page_num}]\n{text}")
+            # Extract text using pypdf (extraction pool, off the event loop)
+            text_result = await run_extraction(extractors.extract_pdf_text, file_content)
             
-            full_text = "\n\n".join(text_parts)
-            
-            # ============================================
-            # NEW: Process tables using TableProcessor
-            # ============================================
-            table_processor = get_table_processor()
-            document_name = filename.rsplit('.', 1)[0] if filename else "Document"
-            
-            table_result = await table_processor.process_document_tables(
-                pdf_content=file_content,
-                document_name=document_name,
-                document_context=document_name
+            extras = await self._extract_pdf_extras(
+                file_content,
+                document_id=document_id,
+                kb_id=kb_id,
+                tenant_id=tenant_id,
+                filename=filename
             )
             
-            tables_found = table_result.get("tables_found", 0)
-            table_descriptions = table_result.get("table_descriptions", [])
-            table_chunks = table_result.get("table_chunks", [])
-            processing_stats = table_result.get("processing_stats", {})
-            
-            logger.info(f"PDF table processing: {tables_found} tables found, {len(table_descriptions)} descriptions, {len(table_chunks)} row chunks")
-            
             # Append table descriptions to the document text
             # This ensures they get chunked and embedded
-            if table_descriptions:
-                table_section = "\n\n" + "=" * 50 + "\n"
-                table_section += "TABLE DATA (Natural Language)\n"
-                table_section += "=" * 50 + "\n\n"
-                
-                for desc in table_descriptions:
-                    table_section += f"\n{desc['content']}\n\n---\n"
-                
-                full_text += table_section
-            
-            # ============================================
-            # END NEW: Table processing
-            # ============================================
-            
-            # Extract images if document_id, kb_id, and tenant_id are provided
-            extracted_images = []
-            image_count = 0
-            
-            if document_id and kb_id and tenant_id:
-                try:
-                    logger.info(f"Extracting images from PDF document {document_id}...")
-                    
-                    extracted_images = await self.pdf_image_extractor.extract_pdf_images(
-                        pdf_content=file_content,
-                        document_id=document_id,
-                        kb_id=kb_id,
-                        tenant_id=tenant_id
-                    )
-                    
-                    image_count = len(extracted_images)
-                    logger.info(f"✅ Extracted {image_count} images from PDF")
-                    
-                    if image_count > 0:
-                        await self._process_extracted_images(extracted_images, kb_id, tenant_id)
-                        
-                except Exception as e:
-                    logger.error(f"Error extracting images from PDF: {e}")
-                    image_count = 0
+            full_text = text_result["text"] + self._format_table_descriptions(extras["table_descriptions"])
             
             return {
                 "text": full_text,
-                "pages": total_pages,
-                "images": image_count,
-                "extracted_images": extracted_images,
-                "tables": tables_found,  # UPDATED: Now returns actual count
-                "table_chunks": table_chunks,  # NEW: Row-level chunks for precise retrieval
-                "table_processing_stats": processing_stats  # NEW: Stats for monitoring
+                "pages": text_result["pages"],
+                "images": extras["images"],
+                "extracted_images": extras["extracted_images"],
+                "tables": extras["tables"],  # UPDATED: Now returns actual count
+                "table_chunks": extras["table_chunks"],  # NEW: Row-level chunks for precise retrieval
+                "table_processing_stats": extras["table_processing_stats"]  # NEW: Stats for monitoring
             }
             
         except Exception as e:
             logger.error(f"PDF extraction error: {e}")
             raise
+    
+    async def _extract_pdf_extras(
+        self,
+        file_content: Union[bytes, str],
+        document_id: str = None,
+        kb_id: str = None,
+        tenant_id: str = None,
+        filename: str = None
+    ) -> Dict[str, Any]:
+        """
+        Tables (TableProcessor) and embedded images of a PDF - everything
+        except the page text. Used by _extract_pdf and by the streaming
+        ingestion pipeline, which runs it alongside page extraction.
+        
+        Returns:
+            tables, table_descriptions, table_chunks, table_processing_stats,
+            images, extracted_images
+        """
+        # ============================================
+        # NEW: Process tables using TableProcessor
+        # ============================================
+        table_processor = get_table_processor()
+        document_name = filename.rsplit('.', 1)[0] if filename else "Document"
+        
+        table_result = await table_processor.process_document_tables(
+            pdf_content=file_content,
+            document_name=document_name,
+            document_context=document_name
+        )
+        
+        tables_found = table_result.get("tables_found", 0)
+        table_descriptions = table_result.get("table_descriptions", [])
+        table_chunks = table_result.get("table_chunks", [])
+        processing_stats = table_result.get("processing_stats", {})
+        
+        logger.info(f"PDF table processing: {tables_found} tables found, {len(table_descriptions)} descriptions, {len(table_chunks)} row chunks")
+        
+        # ============================================
+        # END NEW: Table processing
+        # ============================================
+        
+        # Extract images if document_id, kb_id, and tenant_id are provided
+        extracted_images = []
+        image_count = 0
+        
+        if document_id and kb_id and tenant_id:
+            try:
+                logger.info(f"Extracting images from PDF document {document_id}...")
+                
+                extracted_images = await self.pdf_image_extractor.extract_pdf_images(
+                    pdf_content=file_content,
+                    document_id=document_id,
+                    kb_id=kb_id,
+                    tenant_id=tenant_id,
+                    kb_images_lookup=lambda content_hashes: asyncio.to_thread(
+                        self._get_kb_images, kb_id, content_hashes
+                    )
+                )
+                
+                image_count = len(extracted_images)
+                logger.info(f"✅ Extracted {image_count} images from PDF")
+                
+                if image_count > 0:
+                    await self._process_extracted_images(extracted_images, kb_id, tenant_id)
+                    
+            except Exception as e:
+                logger.error(f"Error extracting images from PDF: {e}")
+                image_count = 0
+        
+        return {
+            "tables": tables_found,
+            "table_descriptions": table_descriptions,
+            "table_chunks": table_chunks,
+            "table_processing_stats": processing_stats,
+            "images": image_count,
+            "extracted_images": extracted_images
+        }
+    
+    @staticmethod
+    def _format_table_descriptions(table_descriptions: List[Dict[str, Any]]) -> str:
+        """Natural-language table section appended to the document text ("" if none)"""
+        if not table_descriptions:
+            return ""
+        
+        table_section = "\n\n" + "=" * 50 + "\n"
+        table_section += "TABLE DATA (Natural Language)\n"
+        table_section += "=" * 50 + "\n\n"
+        
+        for desc in table_descriptions:
+            table_section += f"\n{desc['content']}\n\n---\n"
+        
+        return table_section
 
 
+    @staticmethod
+    def _get_kb_images(kb_id: str, content_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Extracted images with the given content hashes already stored in a KB
+        
+        {content_hash: {"id", "filename", "storage_url", "duplicate_of", "document_ids"}},
+        the earliest row per hash first. Looks up the indexed
+        content_hash_extracted column (migration 037). Empty if the lookup
+        fails (images are then stored again rather than lost).
+        """
+        import mysql.connector
+        
+        kb_images: Dict[str, Dict[str, Any]] = {}
+        if not content_hashes:
+            return kb_images
+        
+        try:
+            conn = mysql.connector.connect(
+                host=settings.DB_HOST,
+                port=settings.DB_PORT,
+                user=settings.DB_USER,
+                password=settings.DB_PASSWORD,
+                database=settings.DB_NAME
+            )
+            cursor = conn.cursor(dictionary=True)
+            try:
+                placeholders = ", ".join(["%s"] * len(content_hashes))
+                cursor.execute(
+                    f"""SELECT id, document_id, filename, storage_url, metadata
+                        FROM yovo_tbl_aiva_images
+                        WHERE kb_id = %s AND content_hash_extracted IN ({placeholders})
+                        ORDER BY created_at""",
+                    (kb_id, *content_hashes)
+                )
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+                conn.close()
+        except Exception as e:
+            logger.warning(f"Could not load stored images for KB {kb_id}: {e}")
+            return kb_images
+        
+        for row in rows:
+            try:
+                metadata = json.loads(row["metadata"]) if isinstance(row["metadata"], str) else (row["metadata"] or {})
+            except ValueError:
+                continue
+            content_hash = metadata.get("content_hash")
+            if not content_hash:
+                continue
+            
+            entry = kb_images.setdefault(content_hash, {
+                "id": row["id"],
+                "filename": row["filename"],
+                "storage_url": row["storage_url"],
+                "duplicate_of": metadata.get("duplicate_of"),
+                "document_ids": set()
+            })
+            entry["document_ids"].add(row["document_id"] or metadata.get("document_id"))
+        
+        return kb_images
+    
     async def _process_extracted_images(
         self, 
         extracted_images: List[Dict[str, Any]], 
@@ -396,38 +486,19 @@ class DocumentProcessor:
             logger.info(f"Processing {len(extracted_images)} extracted images...")
             print(f"Processing {len(extracted_images)} extracted images...")
             #print(f"{extracted_images}")
+            # Identical images already embedded in this KB share that file and
+            # embedding; only the row for this document is added
+            embedded = await self._embed_extracted_images(
+                [img_meta for img_meta in extracted_images if not img_meta.get("duplicate_of")],
+                processor,
+                vector_store
+            )
+            
             for img_meta in extracted_images:
                 try:
-                    # Read image file from disk
-                    #print(f"Processed image {img_meta}...")
-                    image_path = img_meta["storage_path"]
-            
-                    with open(image_path, "rb") as f:
-                        image_bytes = f.read()
-                    
-                    # Verify file was saved correctly
-                    if len(image_bytes) == 0:
-                        logger.error(f"Image file is empty: {image_path}")
-                        print(f"Image file is empty: {image_path}")
+                    if not img_meta.get("duplicate_of") and img_meta["id"] not in embedded:
                         continue
                     
-                    # Open image with PIL
-                    pil_image = Image.open(io.BytesIO(image_bytes))
-                    
-                    # Convert to RGB if necessary for CLIP
-                    if pil_image.mode != "RGB":
-                        pil_image = pil_image.convert("RGB")
-                    
-                    # Generate embedding
-                    embedding_result = await processor.generate_image_embedding(pil_image)
-                    
-                    # Save to vector store
-                    await vector_store.add_image(
-                        image_id=img_meta["id"],
-                        embedding=embedding_result["embedding"],
-                        metadata=img_meta
-                    )
-                    
                     # Save to MySQL database
                     cursor.execute(
                         """INSERT INTO yovo_tbl_aiva_images (
@@ -452,7 +523,10 @@ class DocumentProcessor:
                                 "image_index": img_meta["image_index"],
                                 "embedding_dimension": img_meta["embedding_dimension"],
                                 "format": img_meta.get("format"),
-                                "mode": img_meta.get("mode")
+                                "mode": img_meta.get("mode"),
+                                "content_hash": img_meta.get("content_hash"),
+                                "pages": img_meta.get("pages"),
+                                "duplicate_of": img_meta.get("duplicate_of")
                             })
                         )
                     )
@@ -474,6 +548,81 @@ class DocumentProcessor:
         except Exception as e:
             logger.error(f"Error in _process_extracted_images: {e}")
             raise
+    
+    @staticmethod
+    async def _embed_extracted_images(
+        extracted_images: List[Dict[str, Any]],
+        processor,
+        vector_store
+    ) -> set:
+        """
+        CLIP-embed extracted images in batches and add them to the vector store
+        
+        Images are read from disk one batch (CLIP_BATCH_SIZE) at a time. If a
+        batch fails, its images are embedded one by one so a single bad image
+        doesn't drop the rest.
+        
+        Returns:
+            IDs of the images embedded
+        """
+        embedded = set()
+        
+        for start in range(0, len(extracted_images), processor.batch_size):
+            loaded = []
+            for img_meta in extracted_images[start:start + processor.batch_size]:
+                try:
+                    # Read image file from disk
+                    image_path = img_meta["storage_path"]
+                    
+                    with open(image_path, "rb") as f:
+                        image_bytes = f.read()
+                    
+                    # Verify file was saved correctly
+                    if len(image_bytes) == 0:
+                        logger.error(f"Image file is empty: {image_path}")
+                        continue
+                    
+                    # Open image with PIL
+                    pil_image = Image.open(io.BytesIO(image_bytes))
+                    
+                    # Convert to RGB if necessary for CLIP
+                    if pil_image.mode != "RGB":
+                        pil_image = pil_image.convert("RGB")
+                    
+                    loaded.append((img_meta, pil_image))
+                except Exception as e:
+                    logger.error(f"Error loading image {img_meta.get('id', 'unknown')}: {e}")
+            
+            if not loaded:
+                continue
+            
+            try:
+                results = await processor.generate_image_embeddings([image for _, image in loaded])
+            except Exception as e:
+                logger.warning(f"Batch image embedding failed ({len(loaded)} images), embedding one by one: {e}")
+                results = []
+                for img_meta, image in loaded:
+                    try:
+                        results.append(await processor.generate_image_embedding(image))
+                    except Exception as e:
+                        logger.error(f"Error embedding image {img_meta['id']}: {e}")
+                        results.append(None)
+            
+            for (img_meta, _), embedding_result in zip(loaded, results):
+                if embedding_result is None:
+                    continue
+                try:
+                    # Save to vector store
+                    await vector_store.add_image(
+                        image_id=img_meta["id"],
+                        embedding=embedding_result["embedding"],
+                        metadata=img_meta
+                    )
+                    embedded.add(img_meta["id"])
+                except Exception as e:
+                    logger.error(f"Error adding image {img_meta['id']} to vector store: {e}")
+        
+        return embedded
             
     
     async def _store_images_in_db(
@@ -552,38 +701,7 @@ class DocumentProcessor:
     async def _extract_docx(self, file_content: bytes) -> Dict[str, Any]:
         """Extract text from DOCX with markdown formatting"""
         try:
-            doc_file = io.BytesIO(file_content)
-            doc = Document(doc_file)
-            
-            text_parts = []
-            
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    # Preserve heading styles
-                    if para.style.name.startswith('Heading'):
-                        level = para.style.name[-1]
-                        text_parts.append(f"{'#' * int(level)} {para.text}")
-                    else:
-                        text_parts.append(para.text)
-            
-            # Extract tables with markdown
-            for table in doc.tables:
-                table_md = []
-                for row in table.rows:
-                    row_text = " | ".join([cell.text for cell in row.cells])
-                    table_md.append(f"| {row_text} |")
-                
-                if table_md:
-                    text_parts.append("\n" + "\n".join(table_md) + "\n")
-            
-            full_text = "\n\n".join(text_parts)
-            
-            return {
-                "text": full_text,
-                "pages": len(doc.sections),
-                "images": 0,
-                "tables": len(doc.tables)
-            }
+            return await run_extraction(extractors.extract_docx, file_content)
             
         except Exception as e:
             print(f"DOCX extraction error: {e}")
@@ -592,29 +710,7 @@ class DocumentProcessor:
     async def _extract_pptx(self, file_content: bytes) -> Dict[str, Any]:
         """Extract text from PPTX with markdown formatting"""
         try:
-            pptx_file = io.BytesIO(file_content)
-            prs = Presentation(pptx_file)
-            
-            text_parts = []
-            
-            for slide_num, slide in enumerate(prs.slides, 1):
-                slide_text = [f"## Slide {slide_num}\n"]
-                
-                for shape in slide.shapes:
-                    if hasattr(shape, "text") and shape.text.strip():
-                        slide_text.append(shape.text)
-                
-                if len(slide_text) > 1:
-                    text_parts.append("\n".join(slide_text))
-            
-            full_text = "\n\n---\n\n".join(text_parts)
-            
-            return {
-                "text": full_text,
-                "pages": len(prs.slides),
-                "images": 0,
-                "tables": 0
-            }
+            return await run_extraction(extractors.extract_pptx, file_content)
             
         except Exception as e:
             print(f"PPTX extraction error: {e}")
@@ -623,31 +719,7 @@ class DocumentProcessor:
     async def _extract_xlsx(self, file_content: bytes) -> Dict[str, Any]:
         """Extract text from XLSX with markdown table formatting"""
         try:
-            xlsx_file = io.BytesIO(file_content)
-            wb = load_workbook(xlsx_file, data_only=True)
-            
-            text_parts = []
-            
-            for sheet_name in wb.sheetnames:
-                sheet = wb[sheet_name]
-                sheet_text = [f"## Sheet: {sheet_name}\n"]
-                
-                # Format as markdown table
-                for row in sheet.iter_rows(values_only=True):
-                    row_text = " | ".join([str(cell) if cell is not None else "" for cell in row])
-                    sheet_text.append(f"| {row_text} |")
-                
-                if len(sheet_text) > 1:
-                    text_parts.append("\n".join(sheet_text))
-            
-            full_text = "\n\n---\n\n".join(text_parts)
-            
-            return {
-                "text": full_text,
-                "pages": len(wb.sheetnames),
-                "images": 0,
-                "tables": len(wb.sheetnames)
-            }
+            return await run_extraction(extractors.extract_xlsx, file_content)
             
         except Exception as e:
             logger.error(f"XLSX extraction error: {e}")
@@ -672,33 +744,7 @@ class DocumentProcessor:
     async def _extract_html(self, file_content: bytes) -> Dict[str, Any]:
         """Extract text from HTML with markdown conversion"""
         try:
-            html = file_content.decode('utf-8', errors='ignore')
-            soup = BeautifulSoup(html, 'lxml')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            
-            # Convert HTML structure to markdown-ish format
-            text_parts = []
-            
-            for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-                level = int(heading.name[1])
-                text_parts.append(f"{'#' * level} {heading.get_text().strip()}")
-            
-            for para in soup.find_all('p'):
-                text = para.get_text().strip()
-                if text:
-                    text_parts.append(text)
-            
-            full_text = "\n\n".join(text_parts)
-            
-            return {
-                "text": full_text,
-                "pages": 1,
-                "images": 0,
-                "tables": 0
-            }
+            return await run_extraction(extractors.extract_html, file_content)
             
         except Exception as e:
             logger.error(f"HTML extraction error: {e}")
@@ -741,62 +787,17 @@ class DocumentProcessor:
     async def _extract_json(self, file_content: bytes) -> Dict[str, Any]:
         """Extract and format JSON content for knowledge base"""
         try:
-            text = file_content.decode('utf-8', errors='ignore')
+            result = await run_extraction(extractors.extract_json, file_content)
             
-            # Parse JSON to validate and pretty-print
-            import json as json_module
-            try:
-                data = json_module.loads(text)
-                
-                # Convert JSON to readable text format
-                formatted_text = self._json_to_readable_text(data)
-                
-            except json_module.JSONDecodeError:
+            if not result.pop("valid_json"):
                 # If invalid JSON, treat as plain text
                 logger.warning("Invalid JSON, treating as plain text")
-                formatted_text = text
             
-            return {
-                "text": formatted_text,
-                "pages": 1,
-                "images": 0,
-                "tables": 0
-            }
+            return result
             
         except Exception as e:
             logger.error(f"JSON extraction error: {e}")
             raise
-
-
-    def _json_to_readable_text(self, data: Any, prefix: str = "", depth: int = 0) -> str:
-        """Convert JSON structure to readable text for embedding"""
-        lines = []
-        indent = "  " * depth
-        
-        if isinstance(data, dict):
-            for key, value in data.items():
-                readable_key = key.replace('_', ' ').replace('-', ' ').title()
-                
-                if isinstance(value, (dict, list)):
-                    lines.append(f"{indent}## {readable_key}")
-                    lines.append(self._json_to_readable_text(value, prefix, depth + 1))
-                else:
-                    if value is not None and str(value).strip():
-                        lines.append(f"{indent}{readable_key}: {value}")
-                        
-        elif isinstance(data, list):
-            for i, item in enumerate(data):
-                if isinstance(item, dict):
-                    # Check for common name/title fields
-                    item_name = item.get('name') or item.get('title') or item.get('id') or f"Item {i + 1}"
-                    lines.append(f"{indent}### {item_name}")
-                    lines.append(self._json_to_readable_text(item, prefix, depth + 1))
-                else:
-                    lines.append(f"{indent}- {item}")
-        else:
-            lines.append(f"{indent}{data}")
-        
-        return '\n'.join(lines)
         
     async def process_text_content(
         self,
@@ -0,0 +1,283 @@
+"""
+Embedding Batcher
+Token-aware, concurrent embedding requests for ingestion
+
+- Packs texts into requests by token budget (and max inputs per request)
+- Runs up to N requests concurrently under a process-wide rate limiter
+  (requests/min + tokens/min), so parallel documents share one budget
+- Billed tokens come from the API's usage field (no second tokenizer pass)
+- A failing request is bisected until the bad input is isolated, instead
+  of falling back to one call per chunk
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Async token-bucket limiter for requests/min and tokens/min (0 = unlimited)
+
+    Waiters are served in arrival order.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        """Lock for the running loop (the singleton may outlive an event loop)"""
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                float(self.requests_per_minute),
+                self._request_allowance + elapsed * self.requests_per_minute / 60
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + elapsed * self.tokens_per_minute / 60
+            )
+
+    async def acquire(self, tokens: int = 0):
+        """Wait until one request carrying `tokens` tokens fits in the budget"""
+        if not self.requests_per_minute and not self.tokens_per_minute:
+            return
+
+        # A single request larger than the whole per-minute budget waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+
+        async with self._get_lock():
+            while True:
+                self._refill()
+                request_deficit = (1 - self._request_allowance) if self.requests_per_minute else 0
+                token_deficit = (tokens - self._token_allowance) if self.tokens_per_minute else 0
+
+                if request_deficit <= 0 and token_deficit <= 0:
+                    if self.requests_per_minute:
+                        self._request_allowance -= 1
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens
+                    return
+
+                wait = 0.0
+                if request_deficit > 0:
+                    wait = max(wait, request_deficit * 60 / self.requests_per_minute)
+                if token_deficit > 0:
+                    wait = max(wait, token_deficit * 60 / self.tokens_per_minute)
+                await asyncio.sleep(wait)
+
+
+class EmbeddingBatcher:
+    """
+    Embed many texts with token-packed, concurrent, rate-limited requests
+
+    Usage:
+        batcher = EmbeddingBatcher(embedding_service)
+        result = await batcher.embed([chunk["content"] for chunk in chunks])
+        result["embeddings"][i]   # vector for texts[i], or None if it failed
+    """
+
+    RATE_LIMIT_RETRIES = 4
+
+    def __init__(
+        self,
+        embedding_service,
+        max_tokens_per_request: int = None,
+        max_items_per_request: int = None,
+        concurrency: int = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
+        self.embedding_service = embedding_service
+        self.max_tokens_per_request = max_tokens_per_request or settings.EMBEDDING_BATCH_MAX_TOKENS
+        self.max_items_per_request = max_items_per_request or settings.EMBEDDING_BATCH_MAX_ITEMS
+        self.concurrency = max(1, concurrency or settings.EMBEDDING_CONCURRENCY)
+        self.rate_limiter = rate_limiter or get_embedding_rate_limiter()
+
+    def pack(self, token_counts: List[Tuple[int, int]]) -> List[List[Tuple[int, int]]]:
+        """
+        Greedily pack (index, tokens) pairs into requests, in input order
+
+        Returns:
+            List of batches, each within max_tokens_per_request / max_items_per_request
+        """
+        batches = []
+        current = []
+        current_tokens = 0
+
+        for index, tokens in token_counts:
+            if current and (
+                current_tokens + tokens > self.max_tokens_per_request
+                or len(current) >= self.max_items_per_request
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append((index, tokens))
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    async def embed(
+        self,
+        texts: List[str],
+        on_progress: Optional[Callable[[int, int], Any]] = None,
+        on_result: Optional[Callable[[List[int], List[List[float]], List[int]], Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Embed texts
+
+        Args:
+            texts: Input texts
+            on_progress: Optional callback (done, total), sync or async,
+                called after every successful request
+            on_result: Optional callback (text indices, vectors, token
+                counts), sync or async, called with each successful
+                request's vectors (e.g. to checkpoint them)
+
+        Returns:
+            {
+                "embeddings": vectors aligned with texts (None = failed),
+                "tokens": per-text token counts (from the single packing pass),
+                "total_tokens": billed tokens (API usage),
+                "failed": indices of texts that could not be embedded,
+                "requests": number of API requests made
+            }
+        """
+        total = len(texts)
+        prepared: List[Optional[str]] = [None] * total
+        token_counts: List[int] = [0] * total
+        failed: List[int] = []
+
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                failed.append(i)
+                continue
+            prepared[i], token_counts[i] = self.embedding_service.prepare_text(text)
+
+        batches = self.pack([(i, token_counts[i]) for i in range(total) if prepared[i] is not None])
+
+        state = {
+            "embeddings": [None] * total,
+            "total_tokens": 0,
+            "done": 0,
+            "requests": 0,
+        }
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(batch: List[Tuple[int, int]]):
+            await self._embed_batch(batch, prepared, state, failed, semaphore, total, on_progress, on_result)
+
+        await asyncio.gather(*(run(batch) for batch in batches))
+
+        if failed:
+            logger.error(f"Embedding failed for {len(failed)}/{total} texts")
+
+        logger.info(
+            f"Embedded {total - len(failed)}/{total} texts in {state['requests']} requests "
+            f"({len(batches)} packed batches, concurrency={self.concurrency}, "
+            f"{state['total_tokens']} tokens)"
+        )
+
+        return {
+            "embeddings": state["embeddings"],
+            "tokens": token_counts,
+            "total_tokens": state["total_tokens"],
+            "failed": sorted(failed),
+            "requests": state["requests"],
+        }
+
+    async def _embed_batch(self, batch, prepared, state, failed, semaphore, total, on_progress, on_result=None):
+        """Embed one packed batch; on failure bisect until the bad input is isolated"""
+        indices = [index for index, _ in batch]
+        batch_tokens = sum(tokens for _, tokens in batch)
+
+        state["requests"] += 1
+        try:
+            result = await self._request([prepared[i] for i in indices], batch_tokens, semaphore)
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Embedding failed for text {indices[0]}: {e}")
+                failed.append(indices[0])
+                return
+
+            logger.warning(f"Embedding request with {len(batch)} texts failed ({e}), bisecting")
+            mid = len(batch) // 2
+            await asyncio.gather(
+                self._embed_batch(batch[:mid], prepared, state, failed, semaphore, total, on_progress, on_result),
+                self._embed_batch(batch[mid:], prepared, state, failed, semaphore, total, on_progress, on_result)
+            )
+            return
+
+        for index, vector in zip(indices, result["embeddings"]):
+            state["embeddings"][index] = vector
+        state["total_tokens"] += result["tokens"] or batch_tokens
+        state["done"] += len(indices)
+
+        if on_result:
+            try:
+                outcome = on_result(indices, result["embeddings"], [tokens for _, tokens in batch])
+                if inspect.isawaitable(outcome):
+                    await outcome
+            except Exception as e:
+                logger.warning(f"Embedding result callback failed: {e}")
+
+        if on_progress:
+            try:
+                progress = on_progress(state["done"], total)
+                if inspect.isawaitable(progress):
+                    await progress
+            except Exception as e:
+                logger.warning(f"Embedding progress callback failed: {e}")
+
+    async def _request(self, texts: List[str], tokens: int, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """One rate-limited request; 429s are retried with backoff rather than bisected"""
+        for attempt in range(self.RATE_LIMIT_RETRIES + 1):
+            await self.rate_limiter.acquire(tokens)
+            try:
+                async with semaphore:
+                    return await self.embedding_service.embed_batch(texts)
+            except Exception as e:
+                if getattr(e, "status_code", None) != 429 or attempt == self.RATE_LIMIT_RETRIES:
+                    raise
+                delay = 2 ** attempt
+                logger.warning(f"Embedding rate limited, retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+
+# Process-wide limiter: concurrent ingest jobs share one API budget
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_embedding_rate_limiter() -> RateLimiter:
+    """Get or create the embedding RateLimiter singleton"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(
+            requests_per_minute=settings.EMBEDDING_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.EMBEDDING_TOKENS_PER_MINUTE
+        )
+    return _rate_limiter
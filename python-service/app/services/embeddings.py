@@ -4,11 +4,12 @@ Generate embeddings using OpenAI
 """
 
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 import tiktoken
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
 from app.config import settings
+from app.utils.metrics import track_openai, record_openai_tokens
 
 logger = logging.getLogger(__name__)
 
@@ -16,8 +17,12 @@ logger = logging.getLogger(__name__)
 class EmbeddingService:
     """Generate embeddings for text"""
     
+    # Max input tokens per text (text-embedding-3-*)
+    MAX_INPUT_TOKENS = 8191
+    
     def __init__(self):
         self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.model = settings.EMBEDDING_MODEL
         self.dimension = settings.EMBEDDING_DIMENSION
         
@@ -53,10 +58,12 @@ class EmbeddingService:
         
         # Generate embedding
         try:
-            response = self.client.embeddings.create(
-                input=text,
-                model=model
-            )
+            with track_openai("embeddings", model):
+                response = self.client.embeddings.create(
+                    input=text,
+                    model=model
+                )
+            record_openai_tokens("embeddings", model, getattr(response, "usage", None))
             
             embedding = response.data[0].embedding
             
@@ -76,34 +83,27 @@ class EmbeddingService:
         chunks: List[Dict[str, Any]]
     ) -> Dict[str, Any]:
         """
-        Generate embeddings for multiple chunks
+        Generate embeddings for multiple chunks (token-packed concurrent batches)
         """
-        embeddings = []
-        total_tokens = 0
+        from app.services.embedding_batcher import EmbeddingBatcher
         
-        for chunk in chunks:
-            text = chunk["content"]
-            
-            try:
-                result = await self.generate_embedding(text)
-                
-                embeddings.append({
-                    "chunk_id": chunk["chunk_id"],
-                    "embedding": result["embedding"],
-                    "tokens": result["tokens"]
-                })
-                
-                total_tokens += result["tokens"]
-                
-            except Exception as e:
-                logger.error(f"Failed to generate embedding for chunk {chunk['chunk_id']}: {e}")
-                # Continue with other chunks
+        result = await EmbeddingBatcher(self).embed([chunk["content"] for chunk in chunks])
+        
+        embeddings = []
+        for chunk, vector, tokens in zip(chunks, result["embeddings"], result["tokens"]):
+            if vector is None:
+                logger.error(f"Failed to generate embedding for chunk {chunk['chunk_id']}")
                 continue
+            embeddings.append({
+                "chunk_id": chunk["chunk_id"],
+                "embedding": vector,
+                "tokens": tokens
+            })
         
         return {
             "embeddings": embeddings,
             "total_embeddings": len(embeddings),
-            "total_tokens": total_tokens,
+            "total_tokens": result["total_tokens"],
             "model": self.model,
             "dimension": self.dimension
         }
@@ -112,6 +112,42 @@ class EmbeddingService:
         """Count tokens in text"""
         return len(self.tokenizer.encode(text))
     
+    def prepare_text(self, text: str) -> Tuple[str, int]:
+        """
+        Tokenize once: returns (text truncated to MAX_INPUT_TOKENS, token count)
+        """
+        encoded = self.tokenizer.encode(text)
+        if len(encoded) > self.MAX_INPUT_TOKENS:
+            logger.warning(f"Text too long ({len(encoded)} tokens), truncating to {self.MAX_INPUT_TOKENS}")
+            return self.tokenizer.decode(encoded[:self.MAX_INPUT_TOKENS]), self.MAX_INPUT_TOKENS
+        return text, len(encoded)
+    
+    async def embed_batch(
+        self,
+        texts: List[str],
+        model: str = None
+    ) -> Dict[str, Any]:
+        """
+        One embeddings request (non-blocking client)
+        
+        Returns:
+            {"embeddings": [...] in input order, "tokens": billed tokens from response.usage}
+        """
+        model = model or self.model
+        
+        with track_openai("embeddings", model):
+            response = await self.async_client.embeddings.create(
+                input=texts,
+                model=model
+            )
+        usage = getattr(response, "usage", None)
+        record_openai_tokens("embeddings", model, usage)
+        
+        return {
+            "embeddings": [data.embedding for data in sorted(response.data, key=lambda d: d.index)],
+            "tokens": getattr(usage, "total_tokens", 0) or 0
+        }
+    
     async def generate_batch_embeddings(
         self,
         texts: List[str],
@@ -130,10 +166,12 @@ class EmbeddingService:
         
         try:
             # OpenAI allows batch embedding requests
-            response = self.client.embeddings.create(
-                input=texts,
-                model=model
-            )
+            with track_openai("embeddings", model):
+                response = self.client.embeddings.create(
+                    input=texts,
+                    model=model
+                )
+            record_openai_tokens("embeddings", model, getattr(response, "usage", None))
             
             embeddings = [data.embedding for data in response.data]
             
@@ -11,7 +11,7 @@ VERSION 2 CHANGES:
 FEATURES:
 - Query expansion (rule-based, for BM25 boost)
 - Query rewriting (LLM-based, context-aware)  
-- BM25 hybrid scoring
+- BM25 hybrid scoring (corpus-wide via per-KB inverted index)
 - **NEW: Intent-aware context filtering**
 - MMR diversity
 - Relevance threshold
@@ -19,15 +19,18 @@ FEATURES:
 """
 
 import re
+import json
 import time
 import logging
-from typing import Any, Dict, List, Optional, Set
-from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from collections import Counter, OrderedDict
 from enum import Enum
 from dataclasses import dataclass
 
 import numpy as np
 
+from app.utils.timing import SpanRecorder, log_slow_query
+
 logger = logging.getLogger(__name__)
 
 
@@ -54,6 +57,54 @@ class IntentMatch:
     confidence: float
 
 
+class KeywordMatcher:
+    """
+    Finds every keyword of a set in one regex pass.
+    
+    Keywords are compiled into a single lookahead alternation (longest first),
+    so each position reports its longest keyword; keywords that are prefixes
+    of it are added from a precomputed table. The hit set equals running a
+    separate substring check per keyword.
+    """
+    
+    def __init__(self, groups: Dict[str, List[str]]):
+        self.keyword_groups: Dict[str, Set[str]] = {}
+        for group, keywords in groups.items():
+            for keyword in keywords:
+                keyword = keyword.lower().strip()
+                if keyword:
+                    self.keyword_groups.setdefault(keyword, set()).add(group)
+        
+        keywords = sorted(self.keyword_groups, key=len, reverse=True)
+        self.pattern = re.compile(
+            '(?=(' + '|'.join(re.escape(k) for k in keywords) + '))'
+        ) if keywords else None
+        
+        # keyword -> all keywords that are a prefix of it (itself included)
+        self.prefix_hits = {
+            keyword: frozenset(k for k in keywords if keyword.startswith(k))
+            for keyword in keywords
+        }
+    
+    def find(self, text_lower: str) -> Set[str]:
+        """Return the set of keywords present in (already lowercased) text."""
+        if self.pattern is None:
+            return set()
+        
+        hits: Set[str] = set()
+        for match in self.pattern.finditer(text_lower):
+            hits |= self.prefix_hits[match.group(1)]
+        return hits
+    
+    def count_by_group(self, hits: Set[str]) -> Dict[str, int]:
+        """Count distinct keyword hits per group."""
+        counts: Dict[str, int] = {}
+        for keyword in hits:
+            for group in self.keyword_groups.get(keyword, ()):
+                counts[group] = counts.get(group, 0) + 1
+        return counts
+
+
 class IntentDetector:
     """Lightweight intent detection for search queries."""
     
@@ -96,41 +147,117 @@ class IntentDetector:
         'matrix',  # "purchase order matrix" is creation
     ]
     
+    DEFAULT_PACK = "default"
+    
+    # Each intent's patterns folded into one compiled alternation
+    _INTENT_REGEXES = [
+        (QueryIntent.CREATE, re.compile('|'.join(f'(?:{p})' for p in CREATE_PATTERNS)), 0.8),
+        (QueryIntent.FIND, re.compile('|'.join(f'(?:{p})' for p in FIND_PATTERNS)), 0.7),
+        (QueryIntent.EXPLAIN, re.compile('|'.join(f'(?:{p})' for p in EXPLAIN_PATTERNS)), 0.7),
+    ]
+    
+    _SUBJECT_STOPWORDS = re.compile(
+        r'\b(how|to|do|i|can|what|is|the|a|an|create|make|find|where|generate|steps?|for)\b'
+    )
+    
+    def __init__(self, keyword_packs_file: str = "", profile_cache_size: int = 10000):
+        self.profile_cache_size = profile_cache_size
+        self._profile_cache: "OrderedDict[tuple, Set[str]]" = OrderedDict()
+        
+        self.matchers: Dict[str, KeywordMatcher] = {
+            self.DEFAULT_PACK: KeywordMatcher({
+                "wrong": self.WRONG_CONTEXT_KEYWORDS,
+                "right": self.RIGHT_CONTEXT_KEYWORDS,
+            })
+        }
+        if keyword_packs_file:
+            self._load_keyword_packs(keyword_packs_file)
+    
+    def _load_keyword_packs(self, path: str):
+        """
+        Load per-tenant keyword packs from a JSON file:
+        
+            {"<tenant_id>": {"wrong_context": [...], "right_context": [...], "extend": true}}
+        
+        With "extend" (default) the pack adds to the built-in keywords,
+        otherwise it replaces them.
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                packs = json.load(f)
+            
+            for tenant_id, pack in packs.items():
+                wrong = list(pack.get("wrong_context", []))
+                right = list(pack.get("right_context", []))
+                if pack.get("extend", True):
+                    wrong = self.WRONG_CONTEXT_KEYWORDS + wrong
+                    right = self.RIGHT_CONTEXT_KEYWORDS + right
+                self.matchers[str(tenant_id)] = KeywordMatcher({"wrong": wrong, "right": right})
+            
+            logger.info(f"Loaded {len(packs)} intent keyword packs from {path}")
+        except Exception as e:
+            logger.error(f"Failed to load intent keyword packs from {path}: {e}")
+    
+    def get_matcher(self, tenant_id: Optional[str] = None) -> tuple:
+        """Return (pack name, matcher) for a tenant, falling back to the default pack."""
+        if tenant_id and tenant_id in self.matchers:
+            return tenant_id, self.matchers[tenant_id]
+        return self.DEFAULT_PACK, self.matchers[self.DEFAULT_PACK]
+    
     def detect(self, query: str) -> IntentMatch:
         """Detect query intent."""
         query_lower = query.lower()
         
-        # Check CREATE intent
-        for pattern in self.CREATE_PATTERNS:
-            if re.search(pattern, query_lower):
-                subject = self._extract_subject(query_lower)
-                return IntentMatch(QueryIntent.CREATE, subject, 0.8)
-        
-        # Check FIND intent
-        for pattern in self.FIND_PATTERNS:
-            if re.search(pattern, query_lower):
+        # CREATE, then FIND, then EXPLAIN
+        for intent, regex, confidence in self._INTENT_REGEXES:
+            if regex.search(query_lower):
                 subject = self._extract_subject(query_lower)
-                return IntentMatch(QueryIntent.FIND, subject, 0.7)
-        
-        # Check EXPLAIN intent
-        for pattern in self.EXPLAIN_PATTERNS:
-            if re.search(pattern, query_lower):
-                subject = self._extract_subject(query_lower)
-                return IntentMatch(QueryIntent.EXPLAIN, subject, 0.7)
+                return IntentMatch(intent, subject, confidence)
         
         return IntentMatch(QueryIntent.UNKNOWN, "", 0.3)
     
     def _extract_subject(self, query: str) -> str:
         """Extract the main subject from query."""
         # Remove common question words
-        cleaned = re.sub(
-            r'\b(how|to|do|i|can|what|is|the|a|an|create|make|find|where|generate|steps?|for)\b',
-            '', query
-        )
+        cleaned = self._SUBJECT_STOPWORDS.sub('', query)
         words = [w.strip() for w in cleaned.split() if len(w.strip()) > 2]
         return ' '.join(words[:4])
     
-    def calculate_context_score(self, content: str, intent: IntentMatch) -> float:
+    def get_keyword_profile(
+        self,
+        content_lower: str,
+        chunk_id: str = "",
+        tenant_id: Optional[str] = None
+    ) -> Dict[str, int]:
+        """
+        Wrong/right context keyword counts for a chunk.
+        
+        Hits are cached per (pack, chunk_id) so a chunk that shows up in
+        many searches is only scanned once.
+        """
+        pack_name, matcher = self.get_matcher(tenant_id)
+        
+        cache_key = (pack_name, chunk_id) if chunk_id else None
+        hits = self._profile_cache.get(cache_key) if cache_key else None
+        
+        if hits is None:
+            hits = matcher.find(content_lower)
+            if cache_key:
+                self._profile_cache[cache_key] = hits
+                if len(self._profile_cache) > self.profile_cache_size:
+                    self._profile_cache.popitem(last=False)
+        elif cache_key:
+            self._profile_cache.move_to_end(cache_key)
+        
+        return matcher.count_by_group(hits)
+    
+    def calculate_context_score(
+        self,
+        content: str,
+        intent: IntentMatch,
+        chunk_id: str = "",
+        tenant_id: Optional[str] = None
+    ) -> float:
         """
         Calculate how well content matches the intent context.
         
@@ -147,18 +274,9 @@ class IntentDetector:
         if subject_lower and subject_lower not in content_lower:
             return 0.0
         
-        wrong_score = 0
-        right_score = 0
-        
-        # Check for wrong context indicators
-        for keyword in self.WRONG_CONTEXT_KEYWORDS:
-            if keyword in content_lower:
-                wrong_score += 1
-        
-        # Check for right context indicators
-        for keyword in self.RIGHT_CONTEXT_KEYWORDS:
-            if keyword in content_lower:
-                right_score += 1
+        profile = self.get_keyword_profile(content_lower, chunk_id, tenant_id)
+        wrong_score = profile.get("wrong", 0)
+        right_score = profile.get("right", 0)
         
         # Calculate final modifier
         if wrong_score > right_score and wrong_score >= 2:
@@ -198,10 +316,12 @@ class EnhancedSearchService:
         
         self.settings = settings
         self.vector_store = VectorStore()
+        self.bm25_index = self.vector_store.bm25_index
         
         # Feature flags (from settings)
         self.enable_query_expansion = getattr(settings, 'ENABLE_QUERY_EXPANSION', False)
         self.enable_query_rewriting = getattr(settings, 'ENABLE_QUERY_REWRITING', False)
+        self.enable_multi_query = getattr(settings, 'ENABLE_MULTI_QUERY_RETRIEVAL', False)
         self.enable_bm25 = getattr(settings, 'ENABLE_BM25_SEARCH', False)
         self.enable_mmr = getattr(settings, 'ENABLE_MMR_DIVERSITY', False)
         self.enable_threshold = getattr(settings, 'ENABLE_RELEVANCE_THRESHOLD', False)
@@ -214,9 +334,13 @@ class EnhancedSearchService:
         self.min_relevance = getattr(settings, 'MIN_RELEVANCE_SCORE', 0.5)
         self.reranker_type = getattr(settings, 'RERANKER_TYPE', 'simple')
         self.max_variations = getattr(settings, 'QUERY_EXPANSION_MAX_VARIATIONS', 5)
+        self.slow_query_threshold_ms = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 2000)
         
         # Intent detector (always available, lightweight)
-        self.intent_detector = IntentDetector()
+        self.intent_detector = IntentDetector(
+            keyword_packs_file=getattr(settings, 'INTENT_KEYWORD_PACKS_FILE', ''),
+            profile_cache_size=getattr(settings, 'INTENT_PROFILE_CACHE_SIZE', 10000)
+        )
         
         # Lazy-load services only if needed
         self.query_expansion_service = None
@@ -224,13 +348,14 @@ class EnhancedSearchService:
         self.reranker = None
         
         # Initialize enabled services
-        if self.enable_query_expansion:
+        if self.enable_query_expansion or self.enable_multi_query:
             try:
                 from app.services.query_expansion import get_query_expansion_service
                 self.query_expansion_service = get_query_expansion_service()
             except ImportError as e:
                 logger.warning(f"Query expansion not available: {e}")
                 self.enable_query_expansion = False
+                self.enable_multi_query = False
         
         if self.enable_query_rewriting:
             try:
@@ -252,6 +377,7 @@ class EnhancedSearchService:
             f"EnhancedSearchService initialized - "
             f"expansion={self.enable_query_expansion}, "
             f"rewriting={self.enable_query_rewriting}, "
+            f"multi_query={self.enable_multi_query}, "
             f"bm25={self.enable_bm25}, "
             f"intent_filter={self.enable_intent_filter}, "
             f"mmr={self.enable_mmr}, "
@@ -283,11 +409,14 @@ class EnhancedSearchService:
         # Override flags for this search
         use_expansion: Optional[bool] = None,
         use_rewriting: Optional[bool] = None,
+        use_multi_query: Optional[bool] = None,
         use_bm25: Optional[bool] = None,
         use_intent_filter: Optional[bool] = None,
         use_mmr: Optional[bool] = None,
         use_threshold: Optional[bool] = None,
         use_reranking: Optional[bool] = None,
+        tenant_id: Optional[str] = None,
+        on_stage: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
     ) -> Dict[str, Any]:
         """
         Enhanced search with all RAG improvements.
@@ -295,19 +424,27 @@ class EnhancedSearchService:
         Flow:
         1. Query rewriting (if conversation context)
         2. Query expansion (for BM25 keywords)
-        3. Single vector search (main retrieval)
-        4. BM25 score boosting
+        3. Single vector search (main retrieval) - or multi-query: all
+           expansion variants embedded in one batch, fused with RRF
+        4. BM25 keyword search over the KB index, fused with vector candidates
         5. Intent-aware context filtering (NEW!)
         6. Relevance threshold
         7. MMR diversity
         8. Reranking
+        
+        on_stage, if given, is passed to VectorStore.search so a streaming
+        caller gets the vector top_k ("retrieved") as soon as step 3 has
+        scored and enriched it, then "images" and "products". Steps 4-8
+        only change the final order returned here.
         """
         start_time = time.time()
+        spans = SpanRecorder()
         original_query = query
         
         # Determine which features to use
         do_expansion = use_expansion if use_expansion is not None else self.enable_query_expansion
         do_rewriting = use_rewriting if use_rewriting is not None else self.enable_query_rewriting
+        do_multi_query = use_multi_query if use_multi_query is not None else self.enable_multi_query
         do_bm25 = use_bm25 if use_bm25 is not None else self.enable_bm25
         do_intent_filter = use_intent_filter if use_intent_filter is not None else self.enable_intent_filter
         do_mmr = use_mmr if use_mmr is not None else self.enable_mmr
@@ -325,7 +462,8 @@ class EnhancedSearchService:
         # ============================================================
         intent_match = None
         if do_intent_filter:
-            intent_match = self.intent_detector.detect(query)
+            with spans.span("intent_detection"):
+                intent_match = self.intent_detector.detect(query)
             if intent_match.intent != QueryIntent.UNKNOWN:
                 logger.info(f"Detected intent: {intent_match.intent.value}, subject: '{intent_match.subject}'")
         
@@ -334,33 +472,61 @@ class EnhancedSearchService:
         # ============================================================
         rewritten_query = query
         if do_rewriting and conversation_history and self.query_rewriter:
-            try:
-                rewritten_query = await self.query_rewriter.rewrite(
-                    query=query,
-                    conversation_history=conversation_history
-                )
-                if rewritten_query != query:
-                    logger.info(f"Query rewritten: '{query[:30]}' -> '{rewritten_query[:50]}'")
-            except Exception as e:
-                logger.error(f"Query rewriting error: {e}")
-                rewritten_query = query
+            with spans.span("rewrite"):
+                try:
+                    rewritten_query = await self.query_rewriter.rewrite(
+                        query=query,
+                        conversation_history=conversation_history
+                    )
+                    if rewritten_query != query:
+                        logger.info(f"Query rewritten: '{query[:30]}' -> '{rewritten_query[:50]}'")
+                except Exception as e:
+                    logger.error(f"Query rewriting error: {e}")
+                    rewritten_query = query
         
         # ============================================================
         # Step 2: Query Expansion (for BM25 terms only)
         # ============================================================
         search_terms: List[str] = []
         if do_expansion and self.query_expansion_service:
-            try:
-                search_terms = self.query_expansion_service.get_search_terms(rewritten_query)
-                logger.debug(f"Expanded search terms: {search_terms}")
-            except Exception as e:
-                logger.error(f"Query expansion error: {e}")
-                search_terms = []
+            with spans.span("expansion"):
+                try:
+                    search_terms = self.query_expansion_service.get_search_terms(rewritten_query)
+                    logger.debug(f"Expanded search terms: {search_terms}")
+                except Exception as e:
+                    logger.error(f"Query expansion error: {e}")
+                    search_terms = []
         
         # ============================================================
-        # Step 3: SINGLE Vector Search
+        # Step 3: SINGLE Vector Search (multi-query: one batched embed call)
         # ============================================================
+        query_variants = [rewritten_query]
+        if do_multi_query and self.query_expansion_service:
+            try:
+                query_variants = self._get_query_variants(rewritten_query)
+            except Exception as e:
+                logger.error(f"Query variant generation error: {e}")
+        
+        vector_stage = None
+        if on_stage is not None:
+            async def vector_stage(stage: str, data: Dict[str, Any]):
+                # Candidates are over-fetched for filtering - emit only top_k
+                if stage == "retrieved":
+                    data = {**data, "text_results": data["text_results"][:top_k]}
+                await on_stage(stage, data)
+        
         try:
+            with spans.span("embedding"):
+                variant_embeddings = None
+                if len(query_variants) > 1:
+                    variant_embeddings, query_embedding_result = await self._embed_query_variants(query_variants)
+                    logger.info(f"Multi-query retrieval with {len(query_variants)} variants")
+                else:
+                    # Embed once - reused to score keyword-only hits during fusion
+                    query_embedding_result = await self.vector_store.embedding_service.generate_embedding(
+                        rewritten_query
+                    )
+            
             # Get more results if we'll be filtering/reranking
             fetch_multiplier = 3 if (do_mmr or do_reranking or do_intent_filter) else 1
             results = await self.vector_store.search(
@@ -370,7 +536,11 @@ class EnhancedSearchService:
                 top_k=top_k * fetch_multiplier,
                 search_type=search_type,
                 filters=filters or {},
-                include_products=include_products
+                include_products=include_products,
+                query_embedding_result=query_embedding_result,
+                variant_embeddings=variant_embeddings,
+                spans=spans,
+                on_stage=vector_stage
             )
         except Exception as e:
             logger.error(f"Vector search error: {e}")
@@ -383,6 +553,16 @@ class EnhancedSearchService:
             all_results.append(result_dict)
         
         if not all_results:
+            log_slow_query(
+                logger,
+                spans,
+                self.slow_query_threshold_ms,
+                kb_id=kb_id,
+                query=original_query[:100],
+                rewritten_query=rewritten_query[:100] if rewritten_query != original_query else None,
+                results=0,
+                features=[]
+            )
             return {
                 "total_found": 0,
                 "returned": 0,
@@ -392,62 +572,92 @@ class EnhancedSearchService:
                 "query_tokens": results.get("query_tokens", 0),
                 "embedding_model": results.get("embedding_model", ""),
                 "chunks_searched": results.get("chunks_searched", 0),
+                "search_time_ms": int((time.time() - start_time) * 1000),
                 "cached": results.get("cached", False),
                 "enhanced_search": {
                     "original_query": original_query,
-                    "features_applied": []
+                    "rewritten_query": rewritten_query if rewritten_query != original_query else None,
+                    "features_applied": [],
+                    "timings": spans.as_dict()
                 }
             }
         
         features_applied = []
+        if variant_embeddings:
+            features_applied.append("multi_query")
         
         # ============================================================
-        # Step 4: BM25 Score Boosting (if enabled)
+        # Step 4: BM25 Hybrid Retrieval (if enabled)
         # ============================================================
-        if do_bm25 and search_terms:
-            try:
-                bm25_scores = self._calculate_bm25_scores_fast(search_terms, all_results)
-                all_results = self._merge_bm25_scores(all_results, bm25_scores)
-                features_applied.append("bm25")
-                logger.debug(f"BM25 boosting applied with {len(search_terms)} terms")
-            except Exception as e:
-                logger.error(f"BM25 error: {e}")
+        if do_bm25:
+            with spans.span("bm25"):
+                try:
+                    if self.bm25_index.is_indexed(kb_id):
+                        # Corpus-wide keyword search, fused with vector candidates
+                        keyword_hits = self.bm25_index.search(
+                            kb_id,
+                            rewritten_query,
+                            top_k=top_k * fetch_multiplier,
+                            extra_terms=search_terms
+                        )
+                        all_results = await self._fuse_keyword_hits(
+                            kb_id,
+                            all_results,
+                            keyword_hits,
+                            np.array(query_embedding_result["embedding"])
+                        )
+                        features_applied.append("bm25")
+                        logger.debug(f"BM25 index fusion applied with {len(keyword_hits)} keyword hits")
+                    elif search_terms:
+                        # KB not indexed yet - rescore the vector candidates only
+                        bm25_scores = self._calculate_bm25_scores_fast(search_terms, all_results)
+                        all_results = self._merge_bm25_scores(all_results, bm25_scores)
+                        features_applied.append("bm25")
+                        logger.debug(f"BM25 boosting applied with {len(search_terms)} terms")
+                except Exception as e:
+                    logger.error(f"BM25 error: {e}")
         
         # ============================================================
         # Step 5: Intent-Aware Context Filtering (NEW!)
         # ============================================================
         if do_intent_filter and intent_match and intent_match.intent != QueryIntent.UNKNOWN:
-            try:
-                boosted_count = 0
-                penalized_count = 0
-                
-                for result in all_results:
-                    content = result.get("content", "")
-                    original_score = result.get("score", 0.5)
+            with spans.span("intent_filter"):
+                try:
+                    boosted_count = 0
+                    penalized_count = 0
                     
-                    # Calculate context modifier
-                    modifier = self.intent_detector.calculate_context_score(content, intent_match)
-                    
-                    if modifier != 0:
-                        new_score = max(0.0, min(1.0, original_score + modifier))
-                        result["score"] = new_score
-                        result["_intent_modifier"] = modifier
+                    for result in all_results:
+                        content = result.get("content", "")
+                        original_score = result.get("score", 0.5)
                         
-                        if modifier > 0:
-                            boosted_count += 1
-                        else:
-                            penalized_count += 1
-                
-                # Re-sort by score
-                all_results.sort(key=lambda x: x.get("score", 0), reverse=True)
-                
-                features_applied.append("intent_filter")
-                logger.info(
-                    f"Intent filter applied: intent={intent_match.intent.value}, "
-                    f"boosted={boosted_count}, penalized={penalized_count}"
-                )
-            except Exception as e:
-                logger.error(f"Intent filter error: {e}")
+                        # Calculate context modifier
+                        modifier = self.intent_detector.calculate_context_score(
+                            content,
+                            intent_match,
+                            chunk_id=result.get("chunk_id") or result.get("result_id", ""),
+                            tenant_id=tenant_id
+                        )
+                        
+                        if modifier != 0:
+                            new_score = max(0.0, min(1.0, original_score + modifier))
+                            result["score"] = new_score
+                            result["_intent_modifier"] = modifier
+                            
+                            if modifier > 0:
+                                boosted_count += 1
+                            else:
+                                penalized_count += 1
+                    
+                    # Re-sort by score
+                    all_results.sort(key=lambda x: x.get("score", 0), reverse=True)
+                    
+                    features_applied.append("intent_filter")
+                    logger.info(
+                        f"Intent filter applied: intent={intent_match.intent.value}, "
+                        f"boosted={boosted_count}, penalized={penalized_count}"
+                    )
+                except Exception as e:
+                    logger.error(f"Intent filter error: {e}")
         
         # ============================================================
         # Step 6: Relevance Threshold Filter (if enabled)
@@ -481,27 +691,31 @@ class EnhancedSearchService:
         # Step 7: MMR Diversity (if enabled)
         # ============================================================
         if do_mmr and len(all_results) > top_k:
-            try:
-                all_results = self._apply_mmr(all_results, top_k)
-                features_applied.append("mmr")
-                logger.debug(f"MMR applied, {len(all_results)} diverse results")
-            except Exception as e:
-                logger.error(f"MMR error: {e}")
+            with spans.span("mmr"):
+                try:
+                    chunk_ids = [r.get("chunk_id") or r.get("result_id", "") for r in all_results]
+                    embeddings = self.vector_store.get_chunk_embeddings(kb_id, chunk_ids)
+                    all_results = self._apply_mmr(all_results, top_k, embeddings)
+                    features_applied.append("mmr")
+                    logger.debug(f"MMR applied, {len(all_results)} diverse results")
+                except Exception as e:
+                    logger.error(f"MMR error: {e}")
         
         # ============================================================
         # Step 8: Reranking (if enabled)
         # ============================================================
         if do_reranking and self.reranker and len(all_results) > 1:
-            try:
-                all_results = await self.reranker.rerank(
-                    query=rewritten_query,
-                    results=all_results,
-                    top_k=top_k
-                )
-                features_applied.append("reranking")
-                logger.debug(f"Reranked to {len(all_results)} results")
-            except Exception as e:
-                logger.error(f"Reranking error: {e}")
+            with spans.span("reranking"):
+                try:
+                    all_results = await self.reranker.rerank(
+                        query=rewritten_query,
+                        results=all_results,
+                        top_k=top_k
+                    )
+                    features_applied.append("reranking")
+                    logger.debug(f"Reranked to {len(all_results)} results")
+                except Exception as e:
+                    logger.error(f"Reranking error: {e}")
         
         # Final trim to top_k
         final_results = all_results[:top_k]
@@ -536,6 +750,7 @@ class EnhancedSearchService:
                 "original_query": original_query,
                 "rewritten_query": rewritten_query if rewritten_query != original_query else None,
                 "search_terms": search_terms if search_terms else None,
+                "query_variants": query_variants if len(query_variants) > 1 else None,
                 "detected_intent": intent_match.intent.value if intent_match else None,
                 "intent_subject": intent_match.subject if intent_match else None,
                 "features_applied": features_applied,
@@ -543,10 +758,22 @@ class EnhancedSearchService:
                 "intent_filter_used": do_intent_filter,
                 "mmr_used": do_mmr,
                 "threshold_used": do_threshold,
-                "reranking_used": do_reranking
+                "reranking_used": do_reranking,
+                "timings": spans.as_dict()
             }
         }
         
+        log_slow_query(
+            logger,
+            spans,
+            self.slow_query_threshold_ms,
+            kb_id=kb_id,
+            query=original_query[:100],
+            rewritten_query=rewritten_query[:100] if rewritten_query != original_query else None,
+            results=len(final_results),
+            features=features_applied
+        )
+        
         logger.info(
             f"Enhanced search complete: {len(final_results)} results in {search_time}ms "
             f"(features: {', '.join(features_applied) if features_applied else 'none'})"
@@ -612,6 +839,39 @@ class EnhancedSearchService:
         
         return scores
     
+    async def _fuse_keyword_hits(
+        self,
+        kb_id: str,
+        results: List[Dict[str, Any]],
+        keyword_hits: List[tuple],
+        query_embedding: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """
+        Fuse BM25 index hits with vector candidates.
+        
+        Keyword-only hits (missed by the embedding) are scored against the
+        query vector and enriched, then everything gets the weighted
+        vector/BM25 combination from _merge_bm25_scores.
+        """
+        if not keyword_hits:
+            return results
+        
+        max_score = keyword_hits[0][1]
+        bm25_scores = {
+            chunk_id: score / max_score for chunk_id, score in keyword_hits
+        } if max_score > 0 else {}
+        
+        present = {r.get("chunk_id") or r.get("result_id", "") for r in results}
+        missing = [chunk_id for chunk_id, _ in keyword_hits if chunk_id not in present]
+        
+        if missing:
+            scored = await self.vector_store.score_chunks(kb_id, missing, query_embedding)
+            enriched = await self.vector_store._enrich_results(scored)
+            results.extend(self._to_dict(r) for r in enriched)
+            logger.debug(f"BM25 index added {len(enriched)} keyword-only candidates")
+        
+        return self._merge_bm25_scores(results, bm25_scores)
+    
     def _merge_bm25_scores(
         self,
         results: List[Dict[str, Any]],
@@ -633,51 +893,132 @@ class EnhancedSearchService:
         results.sort(key=lambda x: x.get("score", 0), reverse=True)
         return results
     
+    def _get_query_variants(self, query: str) -> List[str]:
+        """Query first, then distinct expansion variants (up to max_variations total)."""
+        variants = [query]
+        seen = {" ".join(query.lower().split())}
+        
+        for variant in self.query_expansion_service.expand(query, self.max_variations):
+            key = " ".join((variant or "").lower().split())
+            if key and key not in seen:
+                seen.add(key)
+                variants.append(variant)
+        
+        return variants[:max(1, self.max_variations)]
+    
+    async def _embed_query_variants(self, variants: List[str]) -> tuple:
+        """
+        Embed all variants in a single batched request.
+        
+        Returns:
+            (variant embeddings, generate_embedding()-style result for the
+            first variant, with tokens summed over the batch)
+        """
+        embedding_service = self.vector_store.embedding_service
+        embeddings = await embedding_service.generate_batch_embeddings(variants)
+        
+        query_embedding_result = {
+            "embedding": embeddings[0],
+            "model": embedding_service.model,
+            "tokens": sum(embedding_service.count_tokens(v) for v in variants),
+            "dimension": len(embeddings[0])
+        }
+        return embeddings, query_embedding_result
+    
     def _apply_mmr(
         self,
         results: List[Dict[str, Any]],
-        top_k: int
+        top_k: int,
+        embeddings: Optional[Dict[str, np.ndarray]] = None
     ) -> List[Dict[str, Any]]:
-        """Apply Maximal Marginal Relevance for diversity."""
+        """
+        Apply Maximal Marginal Relevance for diversity.
+        
+        Uses the candidates' stored embeddings when every candidate has one,
+        otherwise falls back to word-set Jaccard similarity.
+        """
         if len(results) <= top_k:
             return results
         
-        # Simple content-based MMR
-        selected = [results[0]]
-        candidates = results[1:]
+        chunk_ids = [r.get("chunk_id") or r.get("result_id", "") for r in results]
+        if embeddings and all(chunk_id in embeddings for chunk_id in chunk_ids):
+            matrix = np.vstack([embeddings[chunk_id] for chunk_id in chunk_ids])
+            return self._apply_mmr_vectors(results, top_k, matrix)
+        
+        return self._apply_mmr_jaccard(results, top_k)
+    
+    def _apply_mmr_vectors(
+        self,
+        results: List[Dict[str, Any]],
+        top_k: int,
+        matrix: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """
+        Vectorized MMR over the candidate embedding matrix.
+        
+        Pairwise cosine similarities are computed once; each greedy step only
+        updates the running max-similarity-to-selected vector.
+        """
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        normalized = matrix / norms
+        similarity = normalized @ normalized.T
+        
+        relevance = np.array([r.get("score", 0) for r in results], dtype=np.float32)
+        available = np.ones(len(results), dtype=bool)
+        
+        # Highest-scored result is always kept first
+        selected = [0]
+        available[0] = False
+        max_sim = similarity[0].copy()
+        
+        while len(selected) < top_k and available.any():
+            mmr_scores = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * max_sim
+            mmr_scores[~available] = -np.inf
+            
+            best = int(np.argmax(mmr_scores))
+            selected.append(best)
+            available[best] = False
+            np.maximum(max_sim, similarity[best], out=max_sim)
+        
+        return [results[i] for i in selected]
+    
+    def _apply_mmr_jaccard(
+        self,
+        results: List[Dict[str, Any]],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """Content-based MMR fallback (word-set Jaccard) when vectors are unavailable."""
+        # Word sets computed once per candidate
+        word_sets = [set(r.get("content", "").lower().split()) for r in results]
+        
+        selected = [0]
+        candidates = list(range(1, len(results)))
+        max_sim = [0.0] * len(results)
         
         while len(selected) < top_k and candidates:
+            last_words = word_sets[selected[-1]]
             best_candidate = None
             best_mmr_score = -float('inf')
             
-            for candidate in candidates:
-                relevance = candidate.get("score", 0)
+            for idx in candidates:
+                # Only similarity to the newest selection can raise max_sim
+                c_words = word_sets[idx]
+                if c_words or last_words:
+                    sim = len(c_words & last_words) / len(c_words | last_words)
+                    max_sim[idx] = max(max_sim[idx], sim)
                 
-                # Calculate max similarity to selected
-                max_sim = 0
-                candidate_content = candidate.get("content", "").lower()
-                for s in selected:
-                    selected_content = s.get("content", "").lower()
-                    # Simple Jaccard similarity
-                    c_words = set(candidate_content.split())
-                    s_words = set(selected_content.split())
-                    if c_words or s_words:
-                        sim = len(c_words & s_words) / len(c_words | s_words)
-                        max_sim = max(max_sim, sim)
-                
-                mmr_score = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * max_sim
+                relevance = results[idx].get("score", 0)
+                mmr_score = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * max_sim[idx]
                 
                 if mmr_score > best_mmr_score:
                     best_mmr_score = mmr_score
-                    best_candidate = candidate
+                    best_candidate = idx
             
-            if best_candidate:
-                selected.append(best_candidate)
-                candidates.remove(best_candidate)
-            else:
-                break
+            selected.append(best_candidate)
+            candidates.remove(best_candidate)
         
-        return selected
+        return [results[i] for i in selected]
 
 
 # Singleton
@@ -0,0 +1,131 @@
+"""
+Extraction Pool
+Bounded process pool for CPU-bound document extraction
+
+Parsing PDFs/Office files holds the GIL for seconds at a time; running it in
+the API worker's event loop (or a thread) stalls every search request on
+that worker. Extraction tasks (app/services/extractors.py) run here instead:
+
+- pool size = MAX_WORKERS (0 = run in a thread, no pool)
+- each task is bounded by PROCESSING_TIMEOUT; a timed-out task's pool is
+  replaced and its workers killed
+- tasks of other callers that were queued or running on a replaced or
+  crashed pool (BrokenProcessPool, cancelled future) are resubmitted to the
+  new pool, up to RETRY_ATTEMPTS times
+"""
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+# Submissions per task: a task can lose its pool to another caller's timeout as well as to a crash
+RETRY_ATTEMPTS = 3
+
+
+def get_extraction_pool() -> Optional[ProcessPoolExecutor]:
+    """Get or create the extraction pool (None when MAX_WORKERS <= 0)"""
+    global _pool
+    if settings.MAX_WORKERS <= 0:
+        return None
+    if _pool is None:
+        # spawn: don't fork the API worker's event loop, Redis/MySQL sockets and threads
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"Extraction pool started with {settings.MAX_WORKERS} workers")
+    return _pool
+
+
+def _reset_pool(pool: ProcessPoolExecutor, kill: bool = False):
+    """
+    Replace pool (if still current); kill=True terminates its workers (hung task)
+
+    Queued futures aren't cancelled: they fail with BrokenProcessPool once
+    the workers are gone and their callers resubmit them (run_extraction).
+    """
+    global _pool
+    if _pool is pool:
+        _pool = None
+
+    if kill:
+        for process in list((getattr(pool, "_processes", None) or {}).values()):
+            try:
+                process.terminate()
+            except Exception:
+                pass
+
+    pool.shutdown(wait=False)
+
+
+def _task_cancelled() -> bool:
+    """True if the calling task itself is being cancelled (not just its pool future)"""
+    task = asyncio.current_task()
+    cancelling = getattr(task, "cancelling", None)
+    return bool(cancelling and cancelling())
+
+
+async def run_extraction(func: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+    """
+    Run a picklable extraction function off the event loop
+
+    Args:
+        func: Module-level function (see app/services/extractors.py)
+        *args: Picklable arguments
+        timeout: Seconds (default PROCESSING_TIMEOUT)
+
+    Raises:
+        TimeoutError: Task exceeded the timeout
+    """
+    timeout = timeout or settings.PROCESSING_TIMEOUT
+    name = getattr(func, "__name__", str(func))
+
+    for attempt in range(RETRY_ATTEMPTS):
+        pool = get_extraction_pool()
+
+        if pool is None:
+            return await asyncio.wait_for(asyncio.to_thread(func, *args), timeout)
+
+        try:
+            future = pool.submit(func, *args)
+        except (BrokenProcessPool, RuntimeError):
+            # Pool broken or shut down by another caller between get and submit
+            _reset_pool(pool)
+            if attempt == RETRY_ATTEMPTS - 1:
+                raise
+            continue
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Extraction task {name} timed out after {timeout}s, restarting pool")
+            _reset_pool(pool, kill=True)
+            raise TimeoutError(f"{name} exceeded processing timeout ({timeout}s)")
+        except asyncio.CancelledError:
+            # Our own cancellation propagates; a future cancelled with its pool is resubmitted
+            if _task_cancelled() or not future.cancelled() or attempt == RETRY_ATTEMPTS - 1:
+                raise
+            logger.warning(f"Extraction task {name} was cancelled with its pool, resubmitting")
+        except BrokenProcessPool:
+            _reset_pool(pool)
+            if attempt == RETRY_ATTEMPTS - 1:
+                raise
+            logger.warning(f"Extraction pool broken while running {name}, retrying on a new pool")
+
+
+def shutdown_extraction_pool():
+    """Stop pool workers (app shutdown)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        logger.info("Extraction pool stopped")
@@ -0,0 +1,356 @@
+"""
+Document Extractors
+CPU-bound, per-format text extraction as plain module-level functions
+
+Everything here takes file bytes (PDFs: bytes or a path) and returns
+picklable results, and imports no app settings/services, so the functions
+can run in extraction pool worker processes (see extraction_pool.py).
+PDFs given by path are memory-mapped rather than read into memory.
+"""
+
+import io
+import json
+import mmap
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+def _pdf_reader(source: Union[bytes, str]):
+    """PdfReader over file bytes or a memory-mapped file path"""
+    from pypdf import PdfReader
+
+    if not isinstance(source, str):
+        return PdfReader(io.BytesIO(source))
+
+    # PdfReader(path) reads the whole file into a BytesIO; a read-only map
+    # lets the OS page in only what parsing touches
+    with open(source, 'rb') as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file - let pypdf raise its usual error
+            return PdfReader(source)
+    return PdfReader(mapped)
+
+
+def open_pymupdf(source: Union[bytes, str]):
+    """PyMuPDF document over file bytes or a file path (read on demand by MuPDF)"""
+    import fitz
+
+    if isinstance(source, str):
+        return fitz.open(source, filetype="pdf")
+    return fitz.open(stream=source, filetype="pdf")
+
+
+def pdf_page_count(source: Union[bytes, str]) -> int:
+    """Number of pages in a PDF (bytes or path)"""
+    return len(_pdf_reader(source).pages)
+
+
+def extract_pdf_pages(source: Union[bytes, str], start: int, end: int) -> List[Tuple[int, str]]:
+    """
+    Extract text for pages [start, end) of a PDF (0-based, bytes or path)
+
+    Returns:
+        [(page_number, text)] with 1-based page numbers, empty pages skipped
+    """
+    reader = _pdf_reader(source)
+
+    pages = []
+    for index in range(start, min(end, len(reader.pages))):
+        text = reader.pages[index].extract_text()
+        if text:
+            pages.append((index + 1, text))
+    return pages
+
+
+def extract_pdf_text(file_content: bytes) -> Dict[str, Any]:
+    """Extract page text from a PDF (pypdf)"""
+    reader = _pdf_reader(file_content)
+
+    text_parts = []
+    for page_num, page in enumerate(reader.pages, 1):
+        text = page.extract_text()
+        if text:
+            text_parts.append(f"[Page {page_num}]\n{text}")
+
+    return {
+        "text": "\n\n".join(text_parts),
+        "pages": len(reader.pages)
+    }
+
+
+# A table cell value: 1,250  -3.5  (12)  45%  $300
+_NUMERIC_CELL = re.compile(r'^[(\-+]?[$€£]?\d[\d,.]*%?\)?$')
+
+
+def _numeric_rows_bbox(page, min_rows: int) -> Optional[Tuple[float, float, float, float]]:
+    """
+    Bounding box of borderless-table rows on a PyMuPDF page: text rows
+    (words grouped by baseline, across blocks) with 3+ numeric cells.
+    None if there are fewer than min_rows such rows.
+    """
+    rows: Dict[int, List[tuple]] = {}
+    for word in page.get_text("words"):
+        rows.setdefault(round(word[3] / 3), []).append(word)
+
+    boxes = [
+        (min(w[0] for w in words), min(w[1] for w in words), max(w[2] for w in words), max(w[3] for w in words))
+        for words in rows.values()
+        if sum(1 for w in words if _NUMERIC_CELL.match(w[4])) >= 3
+    ]
+    if len(boxes) < min_rows:
+        return None
+
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+def find_table_regions(
+    source: Union[bytes, str],
+    padding: float = 16,
+    min_numeric_rows: int = 3
+) -> Dict[str, Any]:
+    """
+    Cheap local pass flagging PDF pages that likely contain tables
+
+    A page is flagged when PyMuPDF's find_tables (ruling lines) finds a
+    table or the page has min_numeric_rows rows of 3+ numeric cells
+    (borderless tables). A flagged page gets one region: the union of what
+    was found, padded, with extra room above for multi-line headers.
+
+    Returns:
+        {"pages": page count, "regions": {page_index: (x0, y0, x1, y1)}}
+    """
+    doc = open_pymupdf(source)
+    try:
+        regions = {}
+        for index in range(doc.page_count):
+            page = doc[index]
+            rect = page.rect
+
+            boxes = []
+            try:
+                boxes.extend(tuple(table.bbox) for table in page.find_tables().tables)
+            except Exception:
+                # No find_tables (PyMuPDF < 1.23) or a page it can't parse - keep the whole page
+                boxes.append((rect.x0, rect.y0, rect.x1, rect.y1))
+
+            numeric = _numeric_rows_bbox(page, min_numeric_rows)
+            if numeric:
+                boxes.append(numeric)
+            if not boxes:
+                continue
+
+            regions[index] = (
+                max(rect.x0, min(b[0] for b in boxes) - padding),
+                max(rect.y0, min(b[1] for b in boxes) - padding * 3),
+                min(rect.x1, max(b[2] for b in boxes) + padding),
+                min(rect.y1, max(b[3] for b in boxes) + padding)
+            )
+
+        return {"pages": doc.page_count, "regions": regions}
+    finally:
+        doc.close()
+
+
+def render_pdf_regions(
+    source: Union[bytes, str],
+    regions: List[Tuple[int, Optional[Tuple[float, float, float, float]]]],
+    zoom: float = 2.0
+) -> List[Tuple[int, bytes]]:
+    """
+    PNG renders of PDF page regions
+
+    Args:
+        regions: [(page_index, (x0, y0, x1, y1) or None for the whole page)]
+
+    Returns:
+        [(page_index, png_bytes)]
+    """
+    import fitz
+
+    doc = open_pymupdf(source)
+    try:
+        matrix = fitz.Matrix(zoom, zoom)
+        images = []
+        for index, clip in regions:
+            pix = doc[index].get_pixmap(matrix=matrix, clip=fitz.Rect(clip) if clip else None)
+            images.append((index, pix.tobytes("png")))
+        return images
+    finally:
+        doc.close()
+
+
+def extract_docx(file_content: bytes) -> Dict[str, Any]:
+    """Extract text from DOCX with markdown formatting"""
+    from docx import Document
+
+    doc = Document(io.BytesIO(file_content))
+
+    text_parts = []
+
+    for para in doc.paragraphs:
+        if para.text.strip():
+            # Preserve heading styles
+            if para.style.name.startswith('Heading'):
+                level = para.style.name[-1]
+                text_parts.append(f"{'#' * int(level)} {para.text}")
+            else:
+                text_parts.append(para.text)
+
+    # Extract tables with markdown
+    for table in doc.tables:
+        table_md = []
+        for row in table.rows:
+            row_text = " | ".join([cell.text for cell in row.cells])
+            table_md.append(f"| {row_text} |")
+
+        if table_md:
+            text_parts.append("\n" + "\n".join(table_md) + "\n")
+
+    return {
+        "text": "\n\n".join(text_parts),
+        "pages": len(doc.sections),
+        "images": 0,
+        "tables": len(doc.tables)
+    }
+
+
+def extract_pptx(file_content: bytes) -> Dict[str, Any]:
+    """Extract text from PPTX with markdown formatting"""
+    from pptx import Presentation
+
+    prs = Presentation(io.BytesIO(file_content))
+
+    text_parts = []
+
+    for slide_num, slide in enumerate(prs.slides, 1):
+        slide_text = [f"## Slide {slide_num}\n"]
+
+        for shape in slide.shapes:
+            if hasattr(shape, "text") and shape.text.strip():
+                slide_text.append(shape.text)
+
+        if len(slide_text) > 1:
+            text_parts.append("\n".join(slide_text))
+
+    return {
+        "text": "\n\n---\n\n".join(text_parts),
+        "pages": len(prs.slides),
+        "images": 0,
+        "tables": 0
+    }
+
+
+def extract_xlsx(file_content: bytes) -> Dict[str, Any]:
+    """Extract text from XLSX with markdown table formatting"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(file_content), data_only=True)
+
+    text_parts = []
+
+    for sheet_name in wb.sheetnames:
+        sheet = wb[sheet_name]
+        sheet_text = [f"## Sheet: {sheet_name}\n"]
+
+        # Format as markdown table
+        for row in sheet.iter_rows(values_only=True):
+            row_text = " | ".join([str(cell) if cell is not None else "" for cell in row])
+            sheet_text.append(f"| {row_text} |")
+
+        if len(sheet_text) > 1:
+            text_parts.append("\n".join(sheet_text))
+
+    return {
+        "text": "\n\n---\n\n".join(text_parts),
+        "pages": len(wb.sheetnames),
+        "images": 0,
+        "tables": len(wb.sheetnames)
+    }
+
+
+def extract_html(file_content: bytes) -> Dict[str, Any]:
+    """Extract text from HTML with markdown conversion"""
+    from bs4 import BeautifulSoup
+
+    html = file_content.decode('utf-8', errors='ignore')
+    soup = BeautifulSoup(html, 'lxml')
+
+    # Remove script and style elements
+    for script in soup(["script", "style"]):
+        script.decompose()
+
+    # Convert HTML structure to markdown-ish format
+    text_parts = []
+
+    for heading in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
+        level = int(heading.name[1])
+        text_parts.append(f"{'#' * level} {heading.get_text().strip()}")
+
+    for para in soup.find_all('p'):
+        text = para.get_text().strip()
+        if text:
+            text_parts.append(text)
+
+    return {
+        "text": "\n\n".join(text_parts),
+        "pages": 1,
+        "images": 0,
+        "tables": 0
+    }
+
+
+def extract_json(file_content: bytes) -> Dict[str, Any]:
+    """
+    Extract and format JSON content for knowledge base
+
+    Invalid JSON is returned as plain text ("valid_json": False).
+    """
+    text = file_content.decode('utf-8', errors='ignore')
+
+    try:
+        formatted_text = json_to_readable_text(json.loads(text))
+        valid_json = True
+    except json.JSONDecodeError:
+        formatted_text = text
+        valid_json = False
+
+    return {
+        "text": formatted_text,
+        "pages": 1,
+        "images": 0,
+        "tables": 0,
+        "valid_json": valid_json
+    }
+
+
+def json_to_readable_text(data: Any, prefix: str = "", depth: int = 0) -> str:
+    """Convert JSON structure to readable text for embedding"""
+    lines = []
+    indent = "  " * depth
+
+    if isinstance(data, dict):
+        for key, value in data.items():
+            readable_key = key.replace('_', ' ').replace('-', ' ').title()
+
+            if isinstance(value, (dict, list)):
+                lines.append(f"{indent}## {readable_key}")
+                lines.append(json_to_readable_text(value, prefix, depth + 1))
+            else:
+                if value is not None and str(value).strip():
+                    lines.append(f"{indent}{readable_key}: {value}")
+
+    elif isinstance(data, list):
+        for i, item in enumerate(data):
+            if isinstance(item, dict):
+                # Check for common name/title fields
+                item_name = item.get('name') or item.get('title') or item.get('id') or f"Item {i + 1}"
+                lines.append(f"{indent}### {item_name}")
+                lines.append(json_to_readable_text(item, prefix, depth + 1))
+            else:
+                lines.append(f"{indent}- {item}")
+    else:
+        lines.append(f"{indent}{data}")
+
+    return '\n'.join(lines)
@@ -3,6 +3,7 @@ Image Processor Service
 Handles image processing and embedding generation using CLIP
 """
 
+import asyncio
 import logging
 import uuid
 import time
@@ -25,6 +26,9 @@ logger = logging.getLogger(__name__)
 class ImageProcessor:
     """Process images and generate CLIP embeddings"""
     
+    # ViT-B/32 at 224px: pixel tensor (~0.6 MB) plus forward activations, per image
+    ACTIVATION_BYTES_PER_IMAGE = 8 * 1024 * 1024
+    
     def __init__(self):
         """Initialize CLIP model and processor"""
         try:
@@ -41,9 +45,16 @@ class ImageProcessor:
                 torch.set_num_threads(2)  # Limit CPU threads
                 logger.info("CLIP model loaded on CPU with optimizations")
              
+            self.batch_size = max(1, int(getattr(settings, 'CLIP_BATCH_SIZE', 16)))
+            self.batch_memory_bytes = int(getattr(settings, 'CLIP_BATCH_MEMORY_MB', 512)) * 1024 * 1024
+            
             # Get queue instance
             max_concurrent = int(getattr(settings, 'IMAGE_PROCESSING_CONCURRENCY', 1))
-            self.queue = get_image_queue(max_concurrent=max_concurrent)
+            self.queue = get_image_queue(
+                max_concurrent=max_concurrent,
+                batch_window_ms=float(getattr(settings, 'CLIP_MICROBATCH_WINDOW_MS', 10)),
+                max_batch_size=self.batch_size
+            )
             logger.info(f"Image processor queue initialized with concurrency={max_concurrent}")
                 
         except Exception as e:
@@ -53,66 +64,126 @@ class ImageProcessor:
     async def generate_text_embedding(self, text: str) -> Dict[str, Any]:
         """
         Generate embedding for text query (for text-to-image search)
-        NO QUEUE - text embeddings are lightweight
+        Micro-batched with concurrent queries, no queue slot - text embeddings are lightweight
         Args:
             text: Query text
             
         Returns:
             Dict with embedding and metadata
         """
+        return await self.queue.submit("text", self._generate_text_embeddings_internal, text, slotted=False)
+    
+    async def _generate_text_embeddings_internal(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Internal method - text embeddings for one micro-batch
+        Called by queue, not directly
+        """
         start_time = time.time()
         
         try:
-            # Preprocess text
-            inputs = self.processor(
-                text=text,
-                return_tensors="pt",
-                padding=True,
-                truncation=True
-            )
-            
-            # Move to GPU if available
-            if torch.cuda.is_available():
-                inputs = {k: v.to("cuda") for k, v in inputs.items()}
-            
-            # Generate text features
-            with torch.no_grad():
-                text_features = self.model.get_text_features(**inputs)
-                # Normalize
-                text_features = text_features / text_features.norm(dim=-1, keepdim=True)
-            
-            # Convert to list
-            embedding = text_features.cpu().numpy().tolist()[0]
+            embeddings = await asyncio.to_thread(self._text_features, texts)
             
             processing_time = int((time.time() - start_time) * 1000)
             
-            return {
-                "embedding": embedding,
-                "dimension": len(embedding),
-                "model": "openai/clip-vit-base-patch32",
-                "processing_time_ms": processing_time,
-                "tokens_estimated": len(text.split())  # Rough estimate
-            }
+            return [
+                {
+                    "embedding": embedding,
+                    "dimension": len(embedding),
+                    "model": "openai/clip-vit-base-patch32",
+                    "processing_time_ms": processing_time,
+                    "batch_size": len(texts),
+                    "tokens_estimated": len(text.split())  # Rough estimate
+                }
+                for text, embedding in zip(texts, embeddings)
+            ]
             
         except Exception as e:
             logger.error(f"Error generating text embedding: {e}")
             raise
     
+    def _text_features(self, texts: List[str]) -> List[List[float]]:
+        """Normalized CLIP text features for a batch"""
+        # Preprocess text
+        inputs = self.processor(
+            text=texts,
+            return_tensors="pt",
+            padding=True,
+            truncation=True
+        )
+        
+        # Move to GPU if available
+        if torch.cuda.is_available():
+            inputs = {k: v.to("cuda") for k, v in inputs.items()}
+        
+        # Generate text features
+        with torch.no_grad():
+            text_features = self.model.get_text_features(**inputs)
+            # Normalize
+            text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+        
+        # Convert to list
+        return text_features.cpu().numpy().tolist()
+    
     async def generate_image_embedding(self, image: Image.Image) -> Dict[str, Any]:
         """
         Generate embedding for an image - QUEUED
-        This goes through the queue to control memory usage
+        This goes through the queue to control memory usage; concurrent calls
+        within CLIP_MICROBATCH_WINDOW_MS share one forward pass
         """
-        # Process through queue
-        return await self.queue.process(
-            self._generate_image_embedding_internal,
-            image,
-            cleanup=True
-        )
+        return await self.queue.submit("image", self._generate_image_embeddings_internal, image)
     
-    async def _generate_image_embedding_internal(self, image: Image.Image) -> Dict[str, Any]:
+    async def generate_image_embeddings(self, images: List[Image.Image]) -> List[Dict[str, Any]]:
         """
-        Internal method - actual image embedding generation
+        Generate embeddings for several images - QUEUED, one forward pass per batch
+        
+        Images are split into batches of at most CLIP_BATCH_SIZE images and
+        CLIP_BATCH_MEMORY_MB (estimated, see _image_memory); each batch takes
+        one queue slot.
+        
+        Args:
+            images: PIL images
+            
+        Returns:
+            One result per image, in input order (same shape as generate_image_embedding)
+        """
+        results = []
+        for batch in self._image_batches(images):
+            results.extend(await self.queue.process(
+                self._generate_image_embeddings_internal,
+                batch,
+                cleanup=True,
+                items=len(batch)
+            ))
+        return results
+    
+    def _image_batches(self, images: List[Image.Image]) -> List[List[Image.Image]]:
+        """Split images by CLIP_BATCH_SIZE and the batch memory cap (at least one image per batch)"""
+        batches = []
+        current = []
+        current_bytes = 0
+        
+        for image in images:
+            size = self._image_memory(image)
+            if current and (len(current) >= self.batch_size or current_bytes + size > self.batch_memory_bytes):
+                batches.append(current)
+                current = []
+                current_bytes = 0
+            current.append(image)
+            current_bytes += size
+        
+        if current:
+            batches.append(current)
+        return batches
+    
+    @classmethod
+    def _image_memory(cls, image: Image.Image) -> int:
+        """Estimated bytes an image takes in a batch: decoded pixels + pixel tensor and activations"""
+        width, height = image.size
+        return width * height * len(image.getbands()) + cls.ACTIVATION_BYTES_PER_IMAGE
+    
+    async def _generate_image_embeddings_internal(self, images: List[Image.Image]) -> List[Dict[str, Any]]:
+        """
+        Internal method - actual image embedding generation for one batch
         Called by queue, not directly
         """
         start_time = time.time()
@@ -122,43 +193,54 @@ class ImageProcessor:
             if torch.cuda.is_available():
                 torch.cuda.empty_cache()
             
-            # Preprocess image
-            inputs = self.processor(
-                images=image,
-                return_tensors="pt",
-                padding=True
-            )
-            
-            # Move to GPU if available
-            if torch.cuda.is_available():
-                inputs = {k: v.to("cuda") for k, v in inputs.items()}
-            
-            # Generate image features
-            with torch.no_grad():
-                image_features = self.model.get_image_features(**inputs)
-                image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-            
-            # Convert to list
-            embedding = image_features.cpu().numpy().tolist()[0]
-            
-            # Cleanup tensors immediately
-            del inputs, image_features
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
+            # Forward pass off the event loop
+            embeddings = await asyncio.to_thread(self._image_features, images)
             
             processing_time = int((time.time() - start_time) * 1000)
             
-            return {
-                "embedding": embedding,
-                "dimension": len(embedding),
-                "model": "openai/clip-vit-base-patch32",
-                "processing_time_ms": processing_time,
-                "image_size": image.size
-            }
+            return [
+                {
+                    "embedding": embedding,
+                    "dimension": len(embedding),
+                    "model": "openai/clip-vit-base-patch32",
+                    "processing_time_ms": processing_time,
+                    "batch_size": len(images),
+                    "image_size": image.size
+                }
+                for image, embedding in zip(images, embeddings)
+            ]
             
         except Exception as e:
-            logger.error(f"Error generating image embedding: {e}")
+            logger.error(f"Error generating image embeddings ({len(images)} images): {e}")
             raise
+    
+    def _image_features(self, images: List[Image.Image]) -> List[List[float]]:
+        """Normalized CLIP image features for a batch"""
+        # Preprocess images
+        inputs = self.processor(
+            images=images,
+            return_tensors="pt",
+            padding=True
+        )
+        
+        # Move to GPU if available
+        if torch.cuda.is_available():
+            inputs = {k: v.to("cuda") for k, v in inputs.items()}
+        
+        # Generate image features
+        with torch.no_grad():
+            image_features = self.model.get_image_features(**inputs)
+            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+        
+        # Convert to list
+        embeddings = image_features.cpu().numpy().tolist()
+        
+        # Cleanup tensors immediately
+        del inputs, image_features
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        
+        return embeddings
             
     async def process_image_file(self, file_path: Path, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
         """
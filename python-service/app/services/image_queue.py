@@ -7,9 +7,14 @@ import asyncio
 import logging
 import time
 import torch
-from typing import Callable, Any, Dict, Optional
+from contextlib import asynccontextmanager
+from typing import Callable, Any, Dict, List, Optional, Set, Tuple
 from datetime import datetime
 
+from app.utils.metrics import (
+    IMAGE_QUEUE_WAITING, IMAGE_QUEUE_ACTIVE, IMAGE_QUEUE_WAIT, IMAGE_TASKS
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,18 +24,30 @@ class ImageProcessingQueue:
     Prevents memory overload by limiting concurrent CLIP model operations
     """
     
-    def __init__(self, max_concurrent: int = 1):
+    def __init__(self, max_concurrent: int = 1, batch_window_ms: float = 0, max_batch_size: int = 1):
         """
         Initialize queue
         
         Args:
             max_concurrent: Maximum number of concurrent image processing tasks
+            batch_window_ms: How long submit() collects concurrent requests
+                into one batch (0 = no micro-batching)
+            max_batch_size: Most requests per micro-batch
         """
         self.max_concurrent = max_concurrent
         self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.batch_window = max(0.0, batch_window_ms) / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        # Micro-batching state per kind ("image", "text")
+        self._pending: Dict[str, List[Tuple[Any, asyncio.Future]]] = {}
+        self._batch_full: Dict[str, asyncio.Event] = {}
+        self._flushers: Dict[str, asyncio.Task] = {}
+        self._batch_tasks: Set[asyncio.Task] = set()
         self.active_tasks = 0
         self.total_processed = 0
         self.total_failed = 0
+        self.total_batches = 0
+        self.total_batched_items = 0
         self.queue_stats = {
             'started_at': datetime.now(),
             'total_wait_time_ms': 0,
@@ -39,21 +56,41 @@ class ImageProcessingQueue:
         }
         self._lock = asyncio.Lock()
         
-        logger.info(f"Image processing queue initialized with max_concurrent={max_concurrent}")
+        logger.info(
+            f"Image processing queue initialized with max_concurrent={max_concurrent}, "
+            f"batch window={batch_window_ms}ms, max batch={self.max_batch_size}"
+        )
+    
+    @asynccontextmanager
+    async def _slot(self):
+        """Acquire a processing slot, tracking waiting tasks for /metrics"""
+        IMAGE_QUEUE_WAITING.inc()
+        try:
+            await self.semaphore.acquire()
+        finally:
+            IMAGE_QUEUE_WAITING.dec()
+        try:
+            yield
+        finally:
+            self.semaphore.release()
     
     async def process(
         self, 
         func: Callable, 
         *args, 
         cleanup: bool = True,
+        items: int = 1,
         **kwargs
     ) -> Any:
         """
-        Process an image through the queue with concurrency control
+        Process an image (or a batch of images) through the queue with concurrency control
+        
+        A batch takes one slot: func runs one forward pass for all of it.
         
         Args:
             func: Async function to execute (should be image processing function)
             cleanup: Whether to cleanup memory after processing
+            items: Images func processes, for stats
             *args: Arguments to pass to function
             **kwargs: Keyword arguments to pass to function
             
@@ -63,50 +100,67 @@ class ImageProcessingQueue:
         wait_start = time.time()
         
         # Wait for available slot
-        async with self.semaphore:
-            wait_time = int((time.time() - wait_start) * 1000)
+        async with self._slot():
+            return await self._execute(func, args, kwargs, wait_start, cleanup, items)
+    
+    async def _execute(
+        self,
+        func: Callable,
+        args: tuple,
+        kwargs: dict,
+        wait_start: float,
+        cleanup: bool,
+        items: int
+    ) -> Any:
+        """Run func in an acquired slot, with stats and metrics"""
+        wait_time = int((time.time() - wait_start) * 1000)
+        IMAGE_QUEUE_WAIT.observe(wait_time / 1000)
+        IMAGE_QUEUE_ACTIVE.inc()
+        
+        async with self._lock:
+            self.active_tasks += 1
+            self.queue_stats['total_wait_time_ms'] += wait_time
+            if self.active_tasks > self.queue_stats['peak_concurrent']:
+                self.queue_stats['peak_concurrent'] = self.active_tasks
+        
+        process_start = time.time()
+        
+        try:
+            logger.debug(
+                f"Processing image (active: {self.active_tasks}/{self.max_concurrent}, "
+                f"waited: {wait_time}ms)"
+            )
+            
+            # Execute the processing function
+            result = await func(*args, **kwargs)
+            
+            process_time = int((time.time() - process_start) * 1000)
             
             async with self._lock:
-                self.active_tasks += 1
-                self.queue_stats['total_wait_time_ms'] += wait_time
-                if self.active_tasks > self.queue_stats['peak_concurrent']:
-                    self.queue_stats['peak_concurrent'] = self.active_tasks
+                self.total_processed += items
+                self.queue_stats['total_process_time_ms'] += process_time
+            IMAGE_TASKS.labels("success").inc(items)
             
-            process_start = time.time()
+            logger.debug(f"{items} image(s) processed successfully in {process_time}ms")
             
-            try:
-                logger.debug(
-                    f"Processing image (active: {self.active_tasks}/{self.max_concurrent}, "
-                    f"waited: {wait_time}ms)"
-                )
-                
-                # Execute the processing function
-                result = await func(*args, **kwargs)
-                
-                process_time = int((time.time() - process_start) * 1000)
-                
-                async with self._lock:
-                    self.total_processed += 1
-                    self.queue_stats['total_process_time_ms'] += process_time
-                
-                logger.debug(f"Image processed successfully in {process_time}ms")
-                
-                # Optional memory cleanup
-                if cleanup:
-                    self._cleanup_memory()
-                
-                return result
-                
-            except Exception as e:
-                async with self._lock:
-                    self.total_failed += 1
-                
-                logger.error(f"Image processing failed: {e}")
-                raise
-                
-            finally:
-                async with self._lock:
-                    self.active_tasks -= 1
+            # Optional memory cleanup
+            if cleanup:
+                self._cleanup_memory()
+            
+            return result
+            
+        except Exception as e:
+            async with self._lock:
+                self.total_failed += items
+            IMAGE_TASKS.labels("failure").inc(items)
+            
+            logger.error(f"Image processing failed: {e}")
+            raise
+            
+        finally:
+            IMAGE_QUEUE_ACTIVE.dec()
+            async with self._lock:
+                self.active_tasks -= 1
     
     def _cleanup_memory(self):
         """Cleanup GPU/CPU memory after processing"""
@@ -117,6 +171,136 @@ class ImageProcessingQueue:
         except Exception as e:
             logger.warning(f"Memory cleanup warning: {e}")
     
+    async def submit(
+        self,
+        kind: str,
+        func: Callable,
+        item: Any,
+        slotted: bool = True
+    ) -> Any:
+        """
+        Process one item, coalesced with concurrent submissions of the same kind
+        
+        Items submitted within batch_window_ms of the first pending one (or
+        until max_batch_size are pending) go to a single func call, and each
+        caller gets its own result. While all slots are busy, arriving items
+        keep joining the next batch.
+        
+        Args:
+            kind: Batching key - only items of the same kind share a call
+            func: Async function taking a list of items, returning one result per item in order
+            item: This caller's item
+            slotted: Take a processing slot (image batches); False runs the
+                batch without waiting for one (text batches are light)
+            
+        Returns:
+            This item's result (or raises its error)
+        """
+        if self.batch_window <= 0:
+            if not slotted:
+                return (await func([item]))[0]
+            return (await self.process(func, [item], items=1))[0]
+        
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(kind, [])
+        full = self._batch_full.setdefault(kind, asyncio.Event())
+        pending.append((item, future))
+        
+        if kind not in self._flushers:
+            self._flushers[kind] = asyncio.create_task(self._flush(kind, func, slotted))
+        elif len(pending) >= self.max_batch_size:
+            full.set()
+        
+        return await future
+    
+    async def _flush(self, kind: str, func: Callable, slotted: bool):
+        """Cut batches of one kind while items are pending"""
+        pending = self._pending[kind]
+        full = self._batch_full[kind]
+        
+        try:
+            while pending:
+                if len(pending) < self.max_batch_size:
+                    try:
+                        await asyncio.wait_for(full.wait(), self.batch_window)
+                    except asyncio.TimeoutError:
+                        pass
+                full.clear()
+                
+                wait_start = time.time()
+                if slotted:
+                    IMAGE_QUEUE_WAITING.inc()
+                    try:
+                        await self.semaphore.acquire()
+                    finally:
+                        IMAGE_QUEUE_WAITING.dec()
+                
+                # Everything that arrived while waiting for the slot joins this batch
+                batch = [(item, future) for item, future in pending[:self.max_batch_size] if not future.done()]
+                del pending[:self.max_batch_size]
+                
+                if not batch:
+                    if slotted:
+                        self.semaphore.release()
+                    continue
+                
+                task = asyncio.create_task(self._run_batch(func, batch, wait_start, slotted))
+                self._batch_tasks.add(task)
+                task.add_done_callback(self._batch_tasks.discard)
+        finally:
+            self._flushers.pop(kind, None)
+            # Only left over if this flusher was cancelled
+            for _, future in pending:
+                if not future.done():
+                    future.cancel()
+            pending.clear()
+    
+    async def _run_batch(
+        self,
+        func: Callable,
+        batch: List[Tuple[Any, asyncio.Future]],
+        wait_start: float,
+        slotted: bool
+    ):
+        """Run one micro-batch and deliver results; a failed batch is retried item by item"""
+        items = [item for item, _ in batch]
+        
+        try:
+            if slotted:
+                results = await self._execute(func, (items,), {}, wait_start, True, len(items))
+            else:
+                results = await func(items)
+            
+            async with self._lock:
+                self.total_batches += 1
+                self.total_batched_items += len(items)
+            
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+                return
+            
+            # One bad input shouldn't fail everyone else's request
+            logger.warning(f"Micro-batch of {len(batch)} failed ({e}), retrying items individually")
+            for item, future in batch:
+                try:
+                    if slotted:
+                        result = await self._execute(func, ([item],), {}, time.time(), True, 1)
+                    else:
+                        result = await func([item])
+                    if not future.done():
+                        future.set_result(result[0])
+                except Exception as item_error:
+                    if not future.done():
+                        future.set_exception(item_error)
+        finally:
+            if slotted:
+                self.semaphore.release()
+    
     async def process_batch(
         self,
         items: list,
@@ -231,13 +415,18 @@ class ImageProcessingQueue:
             'avg_wait_time_ms': round(avg_wait, 2),
             'avg_process_time_ms': round(avg_process, 2),
             'runtime_seconds': round(runtime, 2),
-            'throughput_per_minute': round((self.total_processed / runtime) * 60, 2) if runtime > 0 else 0
+            'throughput_per_minute': round((self.total_processed / runtime) * 60, 2) if runtime > 0 else 0,
+            'batch_window_ms': round(self.batch_window * 1000, 2),
+            'micro_batches': self.total_batches,
+            'avg_micro_batch_size': round(self.total_batched_items / self.total_batches, 2) if self.total_batches else 0
         }
     
     def reset_stats(self):
         """Reset statistics"""
         self.total_processed = 0
         self.total_failed = 0
+        self.total_batches = 0
+        self.total_batched_items = 0
         self.queue_stats = {
             'started_at': datetime.now(),
             'total_wait_time_ms': 0,
@@ -251,12 +440,18 @@ class ImageProcessingQueue:
 _global_queue: Optional[ImageProcessingQueue] = None
 
 
-def get_image_queue(max_concurrent: int = 1) -> ImageProcessingQueue:
+def get_image_queue(
+    max_concurrent: int = 1,
+    batch_window_ms: float = 0,
+    max_batch_size: int = 1
+) -> ImageProcessingQueue:
     """
     Get or create global image processing queue
     
     Args:
         max_concurrent: Max concurrent tasks (only used on first call)
+        batch_window_ms: Micro-batching window (only used on first call)
+        max_batch_size: Max micro-batch size (only used on first call)
         
     Returns:
         ImageProcessingQueue instance
@@ -264,18 +459,28 @@ def get_image_queue(max_concurrent: int = 1) -> ImageProcessingQueue:
     global _global_queue
     
     if _global_queue is None:
-        _global_queue = ImageProcessingQueue(max_concurrent=max_concurrent)
+        _global_queue = ImageProcessingQueue(
+            max_concurrent=max_concurrent,
+            batch_window_ms=batch_window_ms,
+            max_batch_size=max_batch_size
+        )
     
     return _global_queue
 
 
 def set_queue_concurrency(max_concurrent: int):
     """
-    Set queue concurrency (creates new queue)
+    Set queue concurrency (creates new queue, keeping the micro-batching settings)
     
     Args:
         max_concurrent: New max concurrent value
     """
     global _global_queue
-    _global_queue = ImageProcessingQueue(max_concurrent=max_concurrent)
-    logger.info(f"Image queue concurrency set to {max_concurrent}")
\ No newline at end of file
+    batch_window_ms = _global_queue.batch_window * 1000 if _global_queue else 0
+    max_batch_size = _global_queue.max_batch_size if _global_queue else 1
+    _global_queue = ImageProcessingQueue(
+        max_concurrent=max_concurrent,
+        batch_window_ms=batch_window_ms,
+        max_batch_size=max_batch_size
+    )
+    logger.info(f"Image queue concurrency set to {max_concurrent}")
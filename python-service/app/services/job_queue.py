@@ -0,0 +1,331 @@
+"""
+Job Queue
+Durable ingestion job queue on Redis Streams
+
+- One stream per tenant (ingest:jobs:{tenant_id}) and one consumer group
+  shared by all ingest workers (app/worker.py). A read takes at most one
+  job per tenant, rotating tenant order, so one tenant uploading hundreds
+  of files can't starve the others.
+- Jobs stay in the group's pending list until acked. A running job
+  heartbeats (XCLAIM resets its idle time); a job idle for longer than
+  JOB_VISIBILITY_TIMEOUT (its worker died) is claimed by another worker.
+- A failed job is retried with exponential backoff by pushing its idle
+  time forward, so it becomes claimable once the backoff has passed. The
+  Redis delivery count is the attempt number.
+- After JOB_MAX_ATTEMPTS the job is moved to the dead-letter stream.
+"""
+
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import redis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """Redis Streams job queue with per-tenant fairness"""
+
+    STREAM_PREFIX = "ingest:jobs:"
+    TENANTS_KEY = "ingest:tenants"
+    DEAD_LETTER_STREAM = "ingest:dead"
+    DEAD_LETTER_MAXLEN = 10000
+    GROUP = "ingest-workers"
+
+    # Job types (dispatched by app/worker.py)
+    TYPE_DOCUMENT = "document"
+    TYPE_SCRAPE = "scrape"
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        self.redis_client = redis_client or redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            password=settings.REDIS_PASSWORD or None,
+            db=settings.REDIS_DB,
+            decode_responses=True
+        )
+        self.visibility_timeout_ms = settings.JOB_VISIBILITY_TIMEOUT * 1000
+        self.max_attempts = max(1, settings.JOB_MAX_ATTEMPTS)
+        self.retry_backoff = settings.JOB_RETRY_BACKOFF
+        self._groups = set()
+        self._rotation = 0
+        self._reclaim_rotation = 0
+
+    def _stream(self, tenant_id: str) -> str:
+        return f"{self.STREAM_PREFIX}{tenant_id}"
+
+    def _ensure_group(self, stream: str):
+        """Create the consumer group (and stream) once per process"""
+        if stream in self._groups:
+            return
+        try:
+            self.redis_client.xgroup_create(stream, self.GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._groups.add(stream)
+
+    def enqueue(self, job_type: str, tenant_id: str, job_id: str, payload: Dict[str, Any]) -> str:
+        """
+        Add a job to the tenant's stream
+
+        Args:
+            job_type: TYPE_DOCUMENT or TYPE_SCRAPE
+            tenant_id: Fairness key
+            job_id: document_id / scrape job_id (for logs and dead letters)
+            payload: JSON-serializable handler arguments
+
+        Returns:
+            Stream entry ID
+        """
+        stream = self._stream(tenant_id)
+        self._ensure_group(stream)
+
+        entry_id = self.redis_client.xadd(stream, {
+            "type": job_type,
+            "job_id": job_id,
+            "tenant_id": tenant_id,
+            "payload": json.dumps(payload),
+            "enqueued_at": datetime.now().isoformat()
+        })
+        self.redis_client.sadd(self.TENANTS_KEY, tenant_id)
+
+        logger.info(f"Enqueued {job_type} job {job_id} for tenant {tenant_id} ({entry_id})")
+        return entry_id
+
+    def _job(self, stream: str, entry_id: str, fields: Dict[str, str], attempt: int) -> Dict[str, Any]:
+        return {
+            "stream": stream,
+            "entry_id": entry_id,
+            "type": fields.get("type"),
+            "job_id": fields.get("job_id"),
+            "tenant_id": fields.get("tenant_id"),
+            "payload": json.loads(fields.get("payload") or "{}"),
+            "attempt": attempt
+        }
+
+    @staticmethod
+    def _entry_key(entry_id: str) -> tuple:
+        ms, _, seq = entry_id.partition("-")
+        return int(ms), int(seq or 0)
+
+    def _waiting_tenants(self, tenants: List[str]) -> List[str]:
+        """Tenants whose stream has entries not yet delivered to the group (one round trip)"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for tenant_id in tenants:
+            stream = self._stream(tenant_id)
+            pipe.xinfo_stream(stream)
+            pipe.xinfo_groups(stream)
+        fetched = pipe.execute(raise_on_error=False)
+
+        waiting = []
+        for tenant_id, info, groups in zip(tenants, fetched[0::2], fetched[1::2]):
+            if isinstance(info, Exception) or isinstance(groups, Exception):
+                continue
+            group = next((g for g in groups if g.get("name") == self.GROUP), None)
+            if group is None:
+                continue
+            if self._entry_key(info["last-generated-id"]) > self._entry_key(group["last-delivered-id"]):
+                waiting.append(tenant_id)
+        return waiting
+
+    def read(self, consumer: str, count: int, block_ms: int = 2000) -> List[Dict[str, Any]]:
+        """
+        Read up to `count` new jobs, at most one per tenant (blocking)
+
+        Only tenants with undelivered jobs are read, starting at a tenant
+        that rotates between calls, so every tenant with work gets a turn
+        and idle tenants cost nothing. With no work waiting, blocks on all
+        tenant streams; jobs beyond `count` delivered by that wait are
+        released to reclaim() as first attempts.
+        """
+        tenants = sorted(self.redis_client.smembers(self.TENANTS_KEY))
+        if not tenants or count <= 0:
+            time.sleep(block_ms / 1000)
+            return []
+
+        offset = self._rotation % len(tenants)
+        self._rotation += 1
+        tenants = tenants[offset:] + tenants[:offset]
+        for tenant_id in tenants:
+            self._ensure_group(self._stream(tenant_id))
+
+        waiting = self._waiting_tenants(tenants)[:count]
+        if waiting:
+            streams = {self._stream(tenant_id): ">" for tenant_id in waiting}
+            response = self.redis_client.xreadgroup(self.GROUP, consumer, streams, count=1)
+        else:
+            streams = {self._stream(tenant_id): ">" for tenant_id in tenants}
+            response = self.redis_client.xreadgroup(self.GROUP, consumer, streams, count=1, block=block_ms)
+
+        order = {self._stream(tenant_id): i for i, tenant_id in enumerate(tenants)}
+        delivered = sorted(
+            ((stream, entry_id, fields) for stream, entries in response or [] for entry_id, fields in entries),
+            key=lambda item: order.get(item[0], len(order))
+        )
+
+        for stream, entry_id, _ in delivered[count:]:
+            # Idle and with no delivery counted, so reclaim() runs it as attempt 1
+            self.redis_client.xclaim(
+                stream, self.GROUP, consumer, 0, [entry_id],
+                idle=self.visibility_timeout_ms, retrycount=0, justid=True
+            )
+
+        return [self._job(stream, entry_id, fields, attempt=1) for stream, entry_id, fields in delivered[:count]]
+
+    def reclaim(self, consumer: str, count: int) -> List[Dict[str, Any]]:
+        """
+        Claim jobs whose visibility timeout (or retry backoff) has expired
+
+        A returned job whose attempt exceeds max_attempts was lost on its
+        final attempt; the caller records the failure and dead-letters it.
+
+        Only expired entries are listed (XPENDING IDLE, Redis >= 6.2), paged
+        from the last one seen, so jobs behind a long run of running ones are
+        still found. The starting tenant rotates between calls, as in read().
+        """
+        jobs = []
+        tenants = sorted(self.redis_client.smembers(self.TENANTS_KEY))
+        if count <= 0 or not tenants:
+            return jobs
+
+        offset = self._reclaim_rotation % len(tenants)
+        self._reclaim_rotation += 1
+
+        for tenant_id in tenants[offset:] + tenants[:offset]:
+            stream = self._stream(tenant_id)
+            self._ensure_group(stream)
+
+            start = "-"
+            while len(jobs) < count:
+                pending = self.redis_client.xpending_range(
+                    stream, self.GROUP, start, "+", count, idle=self.visibility_timeout_ms
+                )
+                for entry in pending:
+                    if len(jobs) >= count:
+                        return jobs
+
+                    # min_idle_time makes the claim atomic across competing workers
+                    claimed = self.redis_client.xclaim(
+                        stream, self.GROUP, consumer, self.visibility_timeout_ms, [entry["message_id"]]
+                    )
+                    if not claimed or not claimed[0][1]:
+                        continue
+
+                    entry_id, fields = claimed[0]
+                    job = self._job(stream, entry_id, fields, attempt=entry["times_delivered"] + 1)
+
+                    logger.warning(
+                        f"Reclaimed {job['type']} job {job['job_id']} (attempt {job['attempt']}/{self.max_attempts})"
+                    )
+                    jobs.append(job)
+
+                if len(pending) < count:
+                    break
+                start = f"({pending[-1]['message_id']}"
+
+        return jobs
+
+    def heartbeat(self, job: Dict[str, Any], consumer: str):
+        """Reset the job's idle time so it isn't reclaimed while running"""
+        self.redis_client.xclaim(
+            job["stream"], self.GROUP, consumer, 0, [job["entry_id"]], justid=True
+        )
+
+    def ack(self, job: Dict[str, Any]):
+        """Job finished - remove it from the pending list and the stream"""
+        pipe = self.redis_client.pipeline()
+        pipe.xack(job["stream"], self.GROUP, job["entry_id"])
+        pipe.xdel(job["stream"], job["entry_id"])
+        pipe.execute()
+
+        if job.get("tenant_id"):
+            self._drop_tenant_if_drained(job["tenant_id"])
+
+    def _drop_tenant_if_drained(self, tenant_id: str):
+        """Take a tenant whose stream is empty out of the rotation (enqueue adds it back)"""
+        stream = self._stream(tenant_id)
+        try:
+            with self.redis_client.pipeline() as pipe:
+                # WATCH: a job enqueued meanwhile aborts the removal
+                pipe.watch(stream)
+                if pipe.xlen(stream) == 0:
+                    pipe.multi()
+                    pipe.srem(self.TENANTS_KEY, tenant_id)
+                    pipe.execute()
+        except redis.WatchError:
+            pass
+        except Exception as e:
+            logger.warning(f"Could not drop drained tenant {tenant_id}: {e}")
+
+    def retry_or_dead_letter(self, job: Dict[str, Any], consumer: str, error: str) -> bool:
+        """
+        Schedule a retry after a failed attempt, or dead-letter the job
+
+        Returns:
+            True if the job will be retried
+        """
+        if job["attempt"] >= self.max_attempts:
+            self.dead_letter(job, error)
+            return False
+
+        backoff_ms = self.retry_backoff * 1000 * (2 ** (job["attempt"] - 1))
+        # Leave it pending but "idle" so reclaim() picks it up once the backoff has passed
+        self.redis_client.xclaim(
+            job["stream"], self.GROUP, consumer, 0, [job["entry_id"]],
+            idle=max(0, self.visibility_timeout_ms - backoff_ms), justid=True
+        )
+        logger.warning(
+            f"{job['type']} job {job['job_id']} failed (attempt {job['attempt']}/{self.max_attempts}), "
+            f"retrying in {backoff_ms // 1000}s: {error}"
+        )
+        return True
+
+    def dead_letter(self, job: Dict[str, Any], error: str):
+        """Move a job to the dead-letter stream"""
+        self.redis_client.xadd(self.DEAD_LETTER_STREAM, {
+            "type": job["type"] or "",
+            "job_id": job["job_id"] or "",
+            "tenant_id": job["tenant_id"] or "",
+            "payload": json.dumps(job["payload"]),
+            "attempts": job["attempt"],
+            "error": str(error)[:1000],
+            "failed_at": datetime.now().isoformat()
+        }, maxlen=self.DEAD_LETTER_MAXLEN, approximate=True)
+        self.ack(job)
+        logger.error(f"{job['type']} job {job['job_id']} dead-lettered after {job['attempt']} attempts: {error}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth per tenant (waiting/pending) and dead-letter count"""
+        tenants = {}
+        for tenant_id in sorted(self.redis_client.smembers(self.TENANTS_KEY)):
+            stream = self._stream(tenant_id)
+            length = self.redis_client.xlen(stream)
+            pending = 0
+            try:
+                pending = self.redis_client.xpending(stream, self.GROUP)["pending"]
+            except redis.ResponseError:
+                pass
+            tenants[tenant_id] = {"waiting": length - pending, "pending": pending}
+
+        return {
+            "tenants": tenants,
+            "dead_letter": self.redis_client.xlen(self.DEAD_LETTER_STREAM)
+        }
+
+
+# Singleton instance
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Get or create the job queue singleton"""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue()
+    return _job_queue
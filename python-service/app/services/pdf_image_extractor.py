@@ -1,17 +1,23 @@
 """
 PDF Image Extraction Service
 Extracts images from PDF files and saves them properly to disk
+
+Each distinct image is stored once: repeats within a document are folded
+into one entry, and an image already stored in the KB shares its file.
 """
 
 import fitz  # PyMuPDF
+import hashlib
 import io
 import logging
 import uuid
 from pathlib import Path
 from PIL import Image
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple, Union, Callable, Awaitable
 import time
 
+from app.services.extractors import open_pymupdf
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,30 +31,61 @@ class PDFImageExtractor:
     
     async def extract_pdf_images(
         self,
-        pdf_content: bytes,
+        pdf_content: Union[bytes, str],
         document_id: str,
         kb_id: str,
-        tenant_id: str
+        tenant_id: str,
+        kb_images_lookup: Optional[Callable[[List[str]], Awaitable[Dict[str, Dict[str, Any]]]]] = None,
+        stats: Optional[Dict[str, int]] = None
     ) -> List[Dict[str, Any]]:
         """
-        Extract all images from a PDF document
+        Extract the distinct images of a PDF document
+        
+        An image repeated across pages (same xref or same bytes) is returned
+        once, with every page in "pages". Images smaller than
+        PDF_IMAGE_MIN_SIDE / PDF_IMAGE_MIN_AREA pixels or PDF_IMAGE_MIN_BYTES
+        (icons, bullets, spacers) are skipped.
         
         Args:
-            pdf_content: PDF file content as bytes
+            pdf_content: PDF file content as bytes, or a file path
             document_id: Document ID
             kb_id: Knowledge base ID
             tenant_id: Tenant ID
+            kb_images_lookup: Awaited once with the content hashes of this
+                PDF's images; returns those already stored in the KB, by hash
+                ({"id", "filename", "storage_url", "duplicate_of", "document_ids"}).
+                Images stored for this document are skipped; images stored
+                for another document reuse its file and get "duplicate_of"
+            stats: Optional dict filled with counts (images_found, images_extracted,
+                duplicates, skipped_small, already_stored, reused_files)
             
         Returns:
             List of extracted image metadata
         """
+        stats = stats if stats is not None else {}
+        for key in ("images_found", "images_extracted", "duplicates", "skipped_small", "already_stored", "reused_files"):
+            stats[key] = 0
+        
         try:
             # Open PDF document
-            pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
+            pdf_document = open_pymupdf(pdf_content)
             extracted_images = []
             
             logger.info(f"Extracting images from PDF: {document_id}, {pdf_document.page_count} pages")
             
+            # Hash every image first so stored copies are looked up in one query
+            xref_hashes, image_data = self._hash_images(pdf_document, stats)
+            kb_images = {}
+            if kb_images_lookup and image_data:
+                kb_images = await kb_images_lookup(list(image_data))
+            
+            # content hash -> image metadata
+            images_by_hash: Dict[str, Dict[str, Any]] = {}
+            
+            # Create storage directory for KB
+            kb_images_dir = self.images_dir / kb_id
+            kb_images_dir.mkdir(parents=True, exist_ok=True)
+            
             # Iterate through pages
             for page_number in range(pdf_document.page_count):
                 page = pdf_document[page_number]
@@ -56,34 +93,51 @@ class PDFImageExtractor:
                 # Get list of images on this page
                 image_list = page.get_images(full=True)
                 
-                logger.info(f"Page {page_number + 1}: Found {len(image_list)} images")
+                logger.debug(f"Page {page_number + 1}: Found {len(image_list)} images")
                 
                 # Extract each image
                 for image_index, img in enumerate(image_list):
+                    stats["images_found"] += 1
                     try:
-                        xref = img[0]  # Image reference number
+                        content_hash = xref_hashes.get(img[0])  # None = skipped or unreadable
+                        if content_hash is None:
+                            continue
                         
-                        # Extract image data
-                        base_image = pdf_document.extract_image(xref)
+                        if content_hash in images_by_hash:
+                            self._add_page(images_by_hash[content_hash], page_number + 1, stats)
+                            continue
+                        
+                        base_image = image_data.pop(content_hash)
                         image_bytes = base_image["image"]  # Image data as bytes
                         image_ext = base_image["ext"]  # Image extension (png, jpeg, etc.)
                         
+                        stored = kb_images.get(content_hash)
+                        if stored and document_id in stored.get("document_ids", ()):
+                            # Stored by an earlier run for this document
+                            images_by_hash[content_hash] = {"pages": [page_number + 1]}
+                            stats["already_stored"] += 1
+                            continue
+                        
                         # Generate unique image ID
                         image_id = str(uuid.uuid4())
                         
-                        # Create storage directory for KB
-                        kb_images_dir = self.images_dir / kb_id
-                        kb_images_dir.mkdir(parents=True, exist_ok=True)
-                        
-                        # Save image file to disk
-                        filename = f"{image_id}_page{page_number + 1}_img{image_index + 1}.{image_ext}"
-                        file_path = kb_images_dir / filename
-                        
-                        # CRITICAL: Write image bytes to file
-                        with open(file_path, "wb") as image_file:
-                            image_file.write(image_bytes)
-                        
-                        logger.info(f"✅ Saved image: {file_path} ({len(image_bytes)} bytes)")
+                        if stored:
+                            # Same image in another document of the KB: share its file (and embedding)
+                            filename = stored["filename"]
+                            file_path = kb_images_dir / filename
+                            storage_url = stored.get("storage_url") or f"/storage/images/{kb_id}/{filename}"
+                            stats["reused_files"] += 1
+                        else:
+                            # Save image file to disk
+                            filename = f"{image_id}_page{page_number + 1}_img{image_index + 1}.{image_ext}"
+                            file_path = kb_images_dir / filename
+                            storage_url = f"/storage/images/{kb_id}/{filename}"
+                            
+                            # CRITICAL: Write image bytes to file
+                            with open(file_path, "wb") as image_file:
+                                image_file.write(image_bytes)
+                            
+                            logger.info(f"✅ Saved image: {file_path} ({len(image_bytes)} bytes)")
                         
                         # Get image dimensions using PIL
                         try:
@@ -104,20 +158,24 @@ class PDFImageExtractor:
                             "kb_id": kb_id,
                             "tenant_id": tenant_id,
                             "page_number": page_number + 1,
+                            "pages": [page_number + 1],
                             "image_index": image_index + 1,
                             "filename": filename,
                             "storage_path": str(file_path),
-                            "storage_url": f"/storage/images/{kb_id}/{filename}",
+                            "storage_url": storage_url,
                             "file_size_bytes": len(image_bytes),
                             "width": width,
                             "height": height,
                             "format": image_format,
                             "mode": mode,
                             "content_type": f"image/{image_ext}",
+                            "content_hash": content_hash,
+                            "duplicate_of": (stored.get("duplicate_of") or stored["id"]) if stored else None,
                             "created_at": time.time(),
                             "embedding_dimension": 512  # CLIP embedding dimension
                         }
                         
+                        images_by_hash[content_hash] = image_metadata
                         extracted_images.append(image_metadata)
                         
                     except Exception as e:
@@ -126,7 +184,8 @@ class PDFImageExtractor:
             
             pdf_document.close()
             
-            logger.info(f"✅ Successfully extracted {len(extracted_images)} images from PDF {document_id}")
+            stats["images_extracted"] = len(extracted_images)
+            logger.info(f"✅ Successfully extracted {len(extracted_images)} images from PDF {document_id}: {stats}")
             
             return extracted_images
             
@@ -134,6 +193,65 @@ class PDFImageExtractor:
             logger.error(f"Error extracting images from PDF {document_id}: {e}")
             raise
     
+    @staticmethod
+    def _hash_images(
+        pdf_document,
+        stats: Dict[str, int]
+    ) -> Tuple[Dict[int, Optional[str]], Dict[str, Dict[str, Any]]]:
+        """
+        Content hash of every image xref in the document
+        
+        Returns:
+            ({xref: content hash, or None if too small or unreadable},
+             {content hash: extract_image() result})
+        """
+        from app.config import settings
+        
+        min_side = settings.PDF_IMAGE_MIN_SIDE
+        min_area = settings.PDF_IMAGE_MIN_AREA
+        min_bytes = settings.PDF_IMAGE_MIN_BYTES
+        
+        xref_hashes: Dict[int, Optional[str]] = {}
+        image_data: Dict[str, Dict[str, Any]] = {}
+        
+        for page_number in range(pdf_document.page_count):
+            for img in pdf_document[page_number].get_images(full=True):
+                xref = img[0]  # Image reference number
+                if xref in xref_hashes:
+                    continue
+                xref_hashes[xref] = None
+                
+                # Pixel size from the image dictionary - no need to decode
+                width, height = img[2], img[3]
+                if min(width, height) < min_side or width * height < min_area:
+                    stats["skipped_small"] += 1
+                    continue
+                
+                try:
+                    base_image = pdf_document.extract_image(xref)
+                except Exception as e:
+                    logger.error(f"Error extracting image xref {xref} from page {page_number + 1}: {e}")
+                    continue
+                
+                if len(base_image["image"]) < min_bytes:
+                    stats["skipped_small"] += 1
+                    continue
+                
+                content_hash = hashlib.sha256(base_image["image"]).hexdigest()
+                xref_hashes[xref] = content_hash
+                image_data.setdefault(content_hash, base_image)
+        
+        return xref_hashes, image_data
+    
+    @staticmethod
+    def _add_page(image_metadata: Optional[Dict[str, Any]], page_number: int, stats: Dict[str, int]):
+        """Record another occurrence of an already extracted image"""
+        if image_metadata is None:
+            return
+        stats["duplicates"] += 1
+        if image_metadata["pages"][-1] != page_number:
+            image_metadata["pages"].append(page_number)
+    
     async def save_extracted_image(
         self,
         image_bytes: bytes,
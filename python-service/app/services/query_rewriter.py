@@ -10,14 +10,20 @@ Features:
 - Resolves pronouns and references
 - Expands ambiguous queries
 - Uses conversation history for context
+- Caches rewrites per (history window, query) in Redis
+- Skips the LLM when the history cannot add anything to the query
 
 Author: AIVA Team
 Version: 1.0.0
 """
 
+import hashlib
+import json
 import logging
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from app.utils.metrics import track_openai, record_openai_tokens, record_cache
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +49,13 @@ class QueryRewriter:
         # Returns: "How much does the iPhone 15 cost?"
     """
     
+    # Messages (and chars per message) actually sent to the LLM - the cache
+    # key is built from exactly this window so equal prompts share an entry
+    HISTORY_WINDOW = 6  # Last 3 turns
+    MAX_MESSAGE_CHARS = 500
+    
+    CACHE_PREFIX = "query_rewrite:"
+    
     def __init__(self, model: str = "gpt-4o-mini"):
         """
         Initialize query rewriter.
@@ -50,9 +63,18 @@ class QueryRewriter:
         Args:
             model: OpenAI model to use
         """
+        from app.config import settings
+        
         self.model = model
         self._client = None
-        logger.info(f"QueryRewriter initialized with model: {model}")
+        self._redis_client = None
+        self.enable_cache = getattr(settings, 'ENABLE_QUERY_REWRITE_CACHE', True)
+        self.cache_ttl = getattr(settings, 'QUERY_REWRITE_CACHE_TTL', 3600)
+        self.rule_enhancer = get_rule_enhancer()
+        logger.info(
+            f"QueryRewriter initialized with model: {model} "
+            f"(cache={self.enable_cache}, ttl={self.cache_ttl}s)"
+        )
     
     @property
     def client(self):
@@ -63,6 +85,21 @@ class QueryRewriter:
             self._client = OpenAI(api_key=settings.OPENAI_API_KEY)
         return self._client
     
+    @property
+    def redis_client(self):
+        """Lazy load Redis client for the rewrite cache"""
+        if self._redis_client is None:
+            import redis
+            from app.config import settings
+            self._redis_client = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                password=settings.REDIS_PASSWORD or None,
+                db=settings.REDIS_DB,
+                decode_responses=True
+            )
+        return self._redis_client
+    
     async def rewrite(
         self,
         query: str,
@@ -100,19 +137,90 @@ class QueryRewriter:
             logger.debug(f"Query is standalone, no rewrite needed: {query[:50]}")
             return query
         
+        window = self._build_history_window(recent_history)
+        
+        # Cheap pre-check: standalone query and nothing new in the history
+        if not needs_rewrite and self._history_adds_nothing(query, window):
+            logger.debug(f"History adds no new terms, skipping LLM rewrite: {query[:50]}")
+            return query
+        
+        cache_key = self._get_cache_key(query, window, enrich_with_context)
+        cached = self._get_cached_rewrite(cache_key)
+        if cached is not None:
+            logger.info(f"Query rewrite cache HIT: '{query[:30]}...' -> '{cached[:50]}...'")
+            return cached
+        
         try:
             rewritten = await self._rewrite_with_llm(query, recent_history, enrich_with_context)
             
-            if rewritten and rewritten != query:
+            if not rewritten:
+                rewritten = query
+            
+            self._cache_rewrite(cache_key, rewritten)
+            
+            if rewritten != query:
                 logger.info(f"Query rewritten: '{query[:30]}...' -> '{rewritten[:50]}...'")
-                return rewritten
             
-            return query
+            return rewritten
             
         except Exception as e:
             logger.error(f"Query rewrite error: {e}")
             return query
     
+    def _build_history_window(self, history: List[Dict[str, str]]) -> List[Tuple[str, str]]:
+        """Truncated (role, content) pairs exactly as they are sent to the LLM."""
+        return [
+            (msg.get("role", "user"), (msg.get("content") or "")[:self.MAX_MESSAGE_CHARS])
+            for msg in history[-self.HISTORY_WINDOW:]
+        ]
+    
+    def _history_adds_nothing(self, query: str, window: List[Tuple[str, str]]) -> bool:
+        """
+        True when every content term of the history window is already in the query.
+        
+        In that case the LLM has no subject to resolve and no keywords to add,
+        so the rewrite cannot change anything.
+        """
+        query_terms = self.rule_enhancer.extract_keywords(query)
+        history_terms: Set[str] = set()
+        for _, content in window:
+            history_terms |= self.rule_enhancer.extract_keywords(content)
+        return not (history_terms - query_terms)
+    
+    def _get_cache_key(
+        self,
+        query: str,
+        window: List[Tuple[str, str]],
+        enrich_with_context: bool
+    ) -> str:
+        """Hash of model, prompt mode, truncated history window and query."""
+        payload = json.dumps(
+            [self.model, enrich_with_context, window, query.strip()],
+            ensure_ascii=False
+        )
+        return f"{self.CACHE_PREFIX}{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+    
+    def _get_cached_rewrite(self, cache_key: str) -> Optional[str]:
+        """Return cached rewrite, or None on miss / cache unavailable."""
+        if not self.enable_cache:
+            return None
+        try:
+            cached = self.redis_client.get(cache_key)
+            record_cache("query_rewrite", hits=int(cached is not None), misses=int(cached is None))
+            return cached
+        except Exception as e:
+            logger.warning(f"Query rewrite cache lookup failed: {e}")
+            return None
+    
+    def _cache_rewrite(self, cache_key: str, rewritten: str):
+        """Store rewrite result (including unchanged queries) with TTL."""
+        if not self.enable_cache:
+            return
+        try:
+            self.redis_client.setex(cache_key, self.cache_ttl, rewritten)
+        except Exception as e:
+            logger.warning(f"Query rewrite cache write failed: {e}")
+    
     def _is_standalone_query(self, query: str) -> bool:
         """
         Check if query is likely standalone (doesn't need context).
@@ -164,11 +272,9 @@ class QueryRewriter:
             history: Conversation history
             enrich_with_context: If True, add relevant context even for clear queries
         """
-        # Build context string
+        # Build context string (last 3 turns, long messages truncated)
         context_parts = []
-        for msg in history[-6:]:  # Last 3 turns
-            role = msg.get("role", "user")
-            content = msg.get("content", "")[:500]  # Truncate long messages
+        for role, content in self._build_history_window(history):
             context_parts.append(f"{role.upper()}: {content}")
         
         context_str = "\n".join(context_parts)
@@ -214,12 +320,14 @@ RULES:
 
 REWRITTEN QUERY:"""
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=150,
-            temperature=0
-        )
+        with track_openai("query_rewrite", self.model):
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=150,
+                temperature=0
+            )
+        record_openai_tokens("query_rewrite", self.model, getattr(response, "usage", None))
         
         rewritten = response.choices[0].message.content.strip()
         
@@ -261,12 +369,14 @@ Original query: {query}
 Return ONLY the variations, one per line, numbered 1-{num_variations}:"""
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=200,
-                temperature=0.7
-            )
+            with track_openai("query_variations", self.model):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=200,
+                    temperature=0.7
+                )
+            record_openai_tokens("query_variations", self.model, getattr(response, "usage", None))
             
             content = response.choices[0].message.content.strip()
             
@@ -327,8 +437,39 @@ class RuleBasedQueryEnhancer:
             "email": "what is the email for",
         }
         
+        # Words that carry no searchable context (used by extract_keywords)
+        self.stop_words = {
+            "a", "an", "the", "is", "are", "was", "were", "be", "been",
+            "to", "of", "in", "for", "on", "with", "at", "by", "from",
+            "and", "or", "but", "not", "no", "yes", "so", "if", "then",
+            "do", "does", "did", "can", "could", "would", "should",
+            "i", "me", "my", "we", "our", "you", "your", "it", "its",
+            "this", "that", "these", "those", "what", "which", "who",
+            "how", "when", "where", "why", "there", "here", "about",
+            "will", "shall", "may", "might", "must", "need", "have", "has",
+            "hi", "hello", "hey", "thanks", "thank", "please", "ok", "okay",
+            "sure", "help", "today", "welcome", "anything", "else",
+        }
+        
         logger.info("RuleBasedQueryEnhancer initialized")
     
+    def extract_keywords(self, text: str) -> Set[str]:
+        """
+        Extract normalized content terms (abbreviations expanded, stop words removed).
+        
+        Args:
+            text: Query or message text
+            
+        Returns:
+            Set of lowercase keywords
+        """
+        keywords: Set[str] = set()
+        for token in re.findall(r'\w+', text.lower()):
+            for word in self.abbreviations.get(token, token).split():
+                if len(word) > 1 and word not in self.stop_words:
+                    keywords.add(word)
+        return keywords
+    
     def enhance(self, query: str) -> str:
         """
         Enhance query with rule-based improvements.
@@ -7,18 +7,24 @@ This service reranks search results using a cross-encoder model
 for more accurate relevance scoring.
 
 Options:
-1. LLM-based reranking (uses OpenAI for scoring)
-2. Local cross-encoder (uses sentence-transformers - optional)
+1. LLM-based reranking (uses OpenAI for scoring, listwise or pointwise,
+   with a (query, chunk) -> score cache)
+2. Local cross-encoder (transformers + torch, batched CPU inference)
 
 Author: AIVA Team
 Version: 1.0.0
 """
 
+import re
+import json
+import hashlib
 import logging
 import asyncio
 from typing import List, Dict, Any, Optional, Tuple
 from abc import ABC, abstractmethod
 
+from app.utils.metrics import track_openai, record_openai_tokens, record_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -43,21 +49,46 @@ class LLMReranker(BaseReranker):
     This is more accurate than cross-encoders for complex queries
     but has higher latency and cost.
     
+    Modes:
+        listwise  - all candidates scored in a single chat completion (default)
+        pointwise - one completion per candidate
+    
+    Scores are cached per (query, chunk) in Redis so repeated questions
+    don't pay for the same judgement twice.
+    
     Usage:
         reranker = LLMReranker()
         reranked = await reranker.rerank(query, results, top_k=5)
     """
     
-    def __init__(self, model: str = "gpt-4o-mini"):
+    CACHE_PREFIX = "rerank_score:"
+    
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        mode: str = "listwise",
+        listwise_max_chars: int = 600,
+        enable_cache: bool = True,
+        cache_ttl: int = 3600
+    ):
         """
         Initialize LLM reranker.
         
         Args:
             model: OpenAI model to use for scoring
+            mode: "listwise" or "pointwise"
+            listwise_max_chars: Per-candidate truncation in the listwise prompt
+            enable_cache: Cache (query, chunk) -> score in Redis
+            cache_ttl: Cache TTL in seconds
         """
         self.model = model
+        self.mode = mode if mode in ("listwise", "pointwise") else "listwise"
+        self.listwise_max_chars = listwise_max_chars
+        self.enable_cache = enable_cache
+        self.cache_ttl = cache_ttl
         self._client = None
-        logger.info(f"LLMReranker initialized with model: {model}")
+        self._redis_client = None
+        logger.info(f"LLMReranker initialized with model: {model}, mode: {self.mode}")
     
     @property
     def client(self):
@@ -68,6 +99,21 @@ class LLMReranker(BaseReranker):
             self._client = OpenAI(api_key=settings.OPENAI_API_KEY)
         return self._client
     
+    @property
+    def redis_client(self):
+        """Lazy load Redis client for the score cache"""
+        if self._redis_client is None:
+            import redis
+            from app.config import settings
+            self._redis_client = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                password=settings.REDIS_PASSWORD or None,
+                db=settings.REDIS_DB,
+                decode_responses=True
+            )
+        return self._redis_client
+    
     async def rerank(
         self, 
         query: str, 
@@ -91,42 +137,198 @@ class LLMReranker(BaseReranker):
         if len(results) <= 1:
             return results
         
-        # Score each result
-        scored_results = []
+        result_keys = [self._result_key(r) for r in results]
+        cache_key = self._cache_key(query)
         
-        # Process in parallel with batching
-        batch_size = 5
-        for i in range(0, len(results), batch_size):
-            batch = results[i:i + batch_size]
-            scores = await asyncio.gather(*[
-                self._score_relevance(query, r.get("content", ""))
-                for r in batch
-            ])
+        # Cached scores first
+        scores: Dict[str, float] = self._get_cached_scores(cache_key, result_keys)
+        
+        pending = [
+            (key, r) for key, r in zip(result_keys, results)
+            if key not in scores
+        ]
+        
+        if pending:
+            new_scores = None
+            if self.mode == "listwise":
+                new_scores = await self._score_listwise(
+                    query, [r.get("content", "") for _, r in pending]
+                )
             
-            for result, score in zip(batch, scores):
-                result_copy = result.copy()
-                result_copy["rerank_score"] = score
-                result_copy["original_score"] = result.get("score", 0)
-                # Combine scores: 70% rerank, 30% original
-                result_copy["score"] = 0.7 * score + 0.3 * result.get("score", 0)
-                result_copy["scoring_details"] = result_copy.get("scoring_details", {})
-                result_copy["scoring_details"]["rerank_score"] = score
-                result_copy["scoring_details"]["reranking_model"] = self.model
-                scored_results.append(result_copy)
+            if new_scores is None:
+                new_scores = await self._score_pointwise(
+                    query, [r.get("content", "") for _, r in pending]
+                )
+            
+            fresh = {}
+            for (key, _), score in zip(pending, new_scores):
+                # None = scoring failed; use the neutral default but don't cache it
+                if score is not None:
+                    fresh[key] = score
+                scores[key] = 0.5 if score is None else score
+            
+            self._cache_scores(cache_key, fresh)
+        
+        cache_hits = len(results) - len(pending)
+        if self.enable_cache:
+            record_cache("rerank", hits=cache_hits, misses=len(pending))
+        
+        scored_results = []
+        for key, result in zip(result_keys, results):
+            score = scores[key]
+            result_copy = result.copy()
+            result_copy["rerank_score"] = score
+            result_copy["original_score"] = result.get("score", 0)
+            # Combine scores: 70% rerank, 30% original
+            result_copy["score"] = 0.7 * score + 0.3 * result.get("score", 0)
+            result_copy["scoring_details"] = result_copy.get("scoring_details", {})
+            result_copy["scoring_details"]["rerank_score"] = score
+            result_copy["scoring_details"]["reranking_model"] = self.model
+            scored_results.append(result_copy)
         
         # Sort by new score
         scored_results.sort(key=lambda x: x["score"], reverse=True)
         
-        logger.info(f"Reranked {len(results)} results, returning top {top_k}")
+        logger.info(
+            f"Reranked {len(results)} results ({cache_hits} cached, mode={self.mode}), "
+            f"returning top {top_k}"
+        )
         
         return scored_results[:top_k]
     
-    async def _score_relevance(self, query: str, content: str) -> float:
+    def _result_key(self, result: Dict[str, Any]) -> str:
+        """Stable per-chunk key (chunk ID, or content hash when there is none)"""
+        key = result.get("chunk_id") or result.get("result_id")
+        if key:
+            return str(key)
+        return "content:" + hashlib.md5(result.get("content", "").encode()).hexdigest()
+    
+    def _cache_key(self, query: str) -> str:
+        """Redis hash key for a (model, normalized query)"""
+        normalized = " ".join(query.lower().split())
+        query_hash = hashlib.sha256(f"{self.model}:{normalized}".encode()).hexdigest()
+        return f"{self.CACHE_PREFIX}{query_hash}"
+    
+    def _get_cached_scores(self, cache_key: str, result_keys: List[str]) -> Dict[str, float]:
+        """Fetch cached scores for the given chunks in one HMGET"""
+        if not self.enable_cache:
+            return {}
+        try:
+            values = self.redis_client.hmget(cache_key, result_keys)
+            return {
+                key: float(value)
+                for key, value in zip(result_keys, values)
+                if value is not None
+            }
+        except Exception as e:
+            logger.warning(f"Rerank cache read failed: {e}")
+            return {}
+    
+    def _cache_scores(self, cache_key: str, scores: Dict[str, float]):
+        """Store new scores and refresh the TTL"""
+        if not self.enable_cache or not scores:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hset(cache_key, mapping=scores)
+            pipe.expire(cache_key, self.cache_ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Rerank cache write failed: {e}")
+    
+    async def _score_listwise(self, query: str, contents: List[str]) -> Optional[List[float]]:
+        """
+        Score all candidates in a single LLM call.
+        
+        Returns:
+            Scores (0-1) in candidate order, or None if the response
+            could not be parsed (caller falls back to pointwise)
+        """
+        documents = []
+        for idx, content in enumerate(contents, 1):
+            content = " ".join((content or "").split())
+            if len(content) > self.listwise_max_chars:
+                content = content[:self.listwise_max_chars] + "..."
+            documents.append(f"[{idx}] {content}")
+        
+        prompt = f"""Rate the relevance of each document to the query on a scale of 0 to 10.
+Respond with JSON only, in the form {{"scores": [s1, s2, ...]}} with exactly {len(contents)} numbers, one per document, in document order.
+
+Query: {query}
+
+Documents:
+{chr(10).join(documents)}"""
+        
+        try:
+            with track_openai("rerank_listwise", self.model):
+                response = await asyncio.to_thread(
+                    self.client.chat.completions.create,
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=8 * len(contents) + 20,
+                    temperature=0,
+                    response_format={"type": "json_object"}
+                )
+            record_openai_tokens("rerank_listwise", self.model, getattr(response, "usage", None))
+            
+            return self._parse_listwise_scores(
+                response.choices[0].message.content, len(contents)
+            )
+            
+        except Exception as e:
+            logger.error(f"Listwise LLM scoring error: {e}")
+            return None
+    
+    def _parse_listwise_scores(self, text: str, expected: int) -> Optional[List[float]]:
+        """Parse a score vector from the listwise response"""
+        raw_scores = None
+        
+        try:
+            data = json.loads(text)
+            if isinstance(data, dict):
+                raw_scores = data.get("scores")
+            elif isinstance(data, list):
+                raw_scores = data
+        except (ValueError, TypeError):
+            # Not JSON - take the numbers in order
+            raw_scores = re.findall(r'\d+\.?\d*', text or "")
+        
+        try:
+            scores = [min(max(float(s) / 10.0, 0.0), 1.0) for s in raw_scores or []]
+        except (ValueError, TypeError):
+            scores = []
+        
+        if len(scores) != expected:
+            logger.warning(f"Listwise rerank returned {len(scores)} scores for {expected} documents")
+            return None
+        
+        return scores
+    
+    async def _score_pointwise(self, query: str, contents: List[str]) -> List[Optional[float]]:
+        """Score candidates one call each (in parallel batches)"""
+        scores: List[Optional[float]] = []
+        
+        batch_size = 5
+        for i in range(0, len(contents), batch_size):
+            batch = contents[i:i + batch_size]
+            scores.extend(await asyncio.gather(*[
+                self._score_relevance(query, content, default=None)
+                for content in batch
+            ]))
+        
+        return scores
+    
+    async def _score_relevance(
+        self,
+        query: str,
+        content: str,
+        default: Optional[float] = 0.5
+    ) -> Optional[float]:
         """
         Score relevance of content to query using LLM.
         
         Returns:
-            Relevance score between 0 and 1
+            Relevance score between 0 and 1 (default if scoring fails)
         """
         if not content:
             return 0.0
@@ -147,12 +349,15 @@ Document:
 Relevance score (0-10):"""
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=5,
-                temperature=0
-            )
+            with track_openai("rerank_pointwise", self.model):
+                response = await asyncio.to_thread(
+                    self.client.chat.completions.create,
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=5,
+                    temperature=0
+                )
+            record_openai_tokens("rerank_pointwise", self.model, getattr(response, "usage", None))
             
             score_text = response.choices[0].message.content.strip()
             
@@ -162,16 +367,15 @@ Relevance score (0-10):"""
                 return min(max(score / 10.0, 0.0), 1.0)  # Normalize to 0-1
             except ValueError:
                 # Try to extract number
-                import re
                 numbers = re.findall(r'\d+\.?\d*', score_text)
                 if numbers:
                     score = float(numbers[0])
                     return min(max(score / 10.0, 0.0), 1.0)
-                return 0.5  # Default
+                return default
                 
         except Exception as e:
             logger.error(f"LLM scoring error: {e}")
-            return 0.5  # Default score on error
+            return default
 
 
 class SimpleReranker(BaseReranker):
@@ -243,11 +447,152 @@ class SimpleReranker(BaseReranker):
     
     def _tokenize(self, text: str) -> List[str]:
         """Simple tokenization"""
-        import re
         tokens = re.findall(r'\b\w+\b', text)
         return [t for t in tokens if len(t) > 2]
 
 
+class CrossEncoderReranker(BaseReranker):
+    """
+    Local cross-encoder reranker (CPU by default, no API cost).
+    
+    Loads a sequence-classification cross-encoder (e.g. ms-marco-MiniLM-L-6-v2)
+    from a local directory (never downloaded) and scores all (query, chunk)
+    pairs in batched forward passes, one request at a time. CPU threads are
+    torch's process-wide setting (ImageProcessor limits it), not changed here.
+    
+    Usage:
+        reranker = CrossEncoderReranker("/path/to/ms-marco-MiniLM-L-6-v2")
+        reranked = await reranker.rerank(query, results, top_k=5)
+    """
+    
+    def __init__(
+        self,
+        model_path: str,
+        max_length: int = 256,
+        batch_size: int = 64
+    ):
+        """
+        Args:
+            model_path: Local directory of the cross-encoder
+            max_length: Max tokens per (query, chunk) pair
+            batch_size: Max pairs per forward pass
+        
+        Raises:
+            ValueError: model_path is not a local directory
+        """
+        import os
+        import threading
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        
+        if not model_path or not os.path.isdir(model_path):
+            raise ValueError(
+                f"CROSS_ENCODER_MODEL_PATH must be a local model directory, got '{model_path}'"
+            )
+        
+        self.torch = torch
+        self.model_path = model_path
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+        self.model = AutoModelForSequenceClassification.from_pretrained(
+            model_path, local_files_only=True
+        )
+        
+        if torch.cuda.is_available():
+            self.device = "cuda"
+            self.model = self.model.to("cuda")
+        else:
+            self.device = "cpu"
+        self.model.eval()
+        
+        logger.info(
+            f"CrossEncoderReranker loaded {model_path} on {self.device} "
+            f"(max_length={max_length}, torch threads={torch.get_num_threads()})"
+        )
+    
+    async def rerank(
+        self, 
+        query: str, 
+        results: List[Dict[str, Any]], 
+        top_k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Rerank by cross-encoder relevance.
+        """
+        if not results:
+            return []
+        
+        if len(results) <= 1:
+            return results
+        
+        try:
+            scores = await asyncio.to_thread(
+                self.score_pairs, query, [r.get("content", "") for r in results]
+            )
+        except Exception as e:
+            logger.error(f"Cross-encoder scoring error: {e}")
+            return results[:top_k]
+        
+        scored_results = []
+        for result, score in zip(results, scores):
+            result_copy = result.copy()
+            result_copy["rerank_score"] = score
+            result_copy["original_score"] = result.get("score", 0)
+            # Combine scores: 70% rerank, 30% original
+            result_copy["score"] = 0.7 * score + 0.3 * result.get("score", 0)
+            result_copy["scoring_details"] = result_copy.get("scoring_details", {})
+            result_copy["scoring_details"]["rerank_score"] = score
+            result_copy["scoring_details"]["reranking_model"] = self.model_path
+            scored_results.append(result_copy)
+        
+        scored_results.sort(key=lambda x: x["score"], reverse=True)
+        
+        return scored_results[:top_k]
+    
+    def score_pairs(self, query: str, contents: List[str]) -> List[float]:
+        """
+        Score (query, content) pairs, 0-1 (blocking - run in a thread).
+        
+        Requests are scored one at a time so concurrent searches don't
+        oversubscribe the CPU threads torch shares with CLIP.
+        """
+        with self._lock:
+            return self._score_pairs(query, contents)
+    
+    def _score_pairs(self, query: str, contents: List[str]) -> List[float]:
+        torch = self.torch
+        scores: List[float] = []
+        
+        for i in range(0, len(contents), self.batch_size):
+            batch = contents[i:i + self.batch_size]
+            encoded = self.tokenizer(
+                [query] * len(batch),
+                batch,
+                padding=True,
+                truncation="only_second",
+                max_length=self.max_length,
+                return_tensors="pt"
+            )
+            if self.device != "cpu":
+                encoded = {k: v.to(self.device) for k, v in encoded.items()}
+            
+            with torch.inference_mode():
+                logits = self.model(**encoded).logits
+            
+            # Single-logit models (ms-marco) -> sigmoid, 2-class -> P(relevant)
+            if logits.shape[-1] == 1:
+                probs = torch.sigmoid(logits[:, 0])
+            else:
+                probs = torch.softmax(logits, dim=-1)[:, 1]
+            
+            scores.extend(probs.float().cpu().tolist())
+        
+        return scores
+
+
 class HybridReranker(BaseReranker):
     """
     Hybrid reranker that uses simple reranking first,
@@ -256,14 +601,20 @@ class HybridReranker(BaseReranker):
     This balances quality and cost.
     """
     
-    def __init__(self, llm_model: str = "gpt-4o-mini", llm_top_k: int = 10):
+    def __init__(
+        self,
+        llm_model: str = "gpt-4o-mini",
+        llm_top_k: int = 10,
+        **llm_kwargs
+    ):
         """
         Args:
             llm_model: Model for LLM reranking
             llm_top_k: How many top results to rerank with LLM
+            **llm_kwargs: LLMReranker options (mode, cache settings)
         """
         self.simple_reranker = SimpleReranker()
-        self.llm_reranker = LLMReranker(model=llm_model)
+        self.llm_reranker = LLMReranker(model=llm_model, **llm_kwargs)
         self.llm_top_k = llm_top_k
         logger.info(f"HybridReranker initialized (LLM top-{llm_top_k})")
     
@@ -306,20 +657,40 @@ class RerankerFactory:
         Create a reranker instance.
         
         Args:
-            reranker_type: "simple", "llm", or "hybrid"
+            reranker_type: "simple", "cross_encoder", "llm", or "hybrid"
             **kwargs: Additional arguments for the reranker
             
         Returns:
             Reranker instance
         """
+        llm_kwargs = {
+            k: kwargs[k]
+            for k in ("mode", "listwise_max_chars", "enable_cache", "cache_ttl")
+            if k in kwargs
+        }
+        
         if reranker_type == "simple":
             return SimpleReranker()
+        elif reranker_type == "cross_encoder":
+            try:
+                return CrossEncoderReranker(
+                    model_path=kwargs.get("model_path", ""),
+                    max_length=kwargs.get("max_length", 256),
+                    batch_size=kwargs.get("batch_size", 64)
+                )
+            except ValueError:
+                # Misconfiguration - fail instead of quietly reranking with 'simple'
+                raise
+            except Exception as e:
+                logger.error(f"Failed to load cross-encoder reranker: {e}, using simple")
+                return SimpleReranker()
         elif reranker_type == "llm":
-            return LLMReranker(model=kwargs.get("model", "gpt-4o-mini"))
+            return LLMReranker(model=kwargs.get("model", "gpt-4o-mini"), **llm_kwargs)
         elif reranker_type == "hybrid":
             return HybridReranker(
                 llm_model=kwargs.get("model", "gpt-4o-mini"),
-                llm_top_k=kwargs.get("llm_top_k", 10)
+                llm_top_k=kwargs.get("llm_top_k", 10),
+                **llm_kwargs
             )
         else:
             logger.warning(f"Unknown reranker type: {reranker_type}, using simple")
@@ -343,6 +714,16 @@ def get_reranker(reranker_type: str = None) -> BaseReranker:
         if reranker_type is None:
             reranker_type = getattr(settings, 'RERANKER_TYPE', 'simple')
         
-        _reranker_instance = RerankerFactory.create(reranker_type)
+        _reranker_instance = RerankerFactory.create(
+            reranker_type,
+            model=getattr(settings, 'RERANKER_MODEL', 'gpt-4o-mini'),
+            mode=getattr(settings, 'RERANKER_MODE', 'listwise'),
+            listwise_max_chars=getattr(settings, 'RERANKER_LISTWISE_MAX_CHARS', 600),
+            enable_cache=getattr(settings, 'ENABLE_RERANK_CACHE', True),
+            cache_ttl=getattr(settings, 'RERANK_CACHE_TTL', 3600),
+            model_path=getattr(settings, 'CROSS_ENCODER_MODEL_PATH', ''),
+            max_length=getattr(settings, 'CROSS_ENCODER_MAX_LENGTH', 256),
+            batch_size=getattr(settings, 'CROSS_ENCODER_BATCH_SIZE', 64)
+        )
     
     return _reranker_instance
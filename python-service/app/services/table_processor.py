@@ -8,18 +8,47 @@ This approach preserves table structure that text extraction loses.
 import logging
 import asyncio
 import base64
+import hashlib
 import io
 import re
 import json
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Union
 from openai import AsyncOpenAI
 
+from app.services.embedding_batcher import RateLimiter
+from app.utils.metrics import track_openai, record_openai_tokens, record_cache
+
 logger = logging.getLogger(__name__)
 
 
 class TableProcessor:
     """Process tables from PDFs using vision-based extraction for accuracy"""
     
+    # Pages rendered per extraction pool task
+    RENDER_BATCH = 8
+    RATE_LIMIT_RETRIES = 4
+    
+    # Part of the vision cache key - bump when the vision prompt or parsing changes
+    VISION_PROMPT_VERSION = "1"
+    VISION_CACHE_PREFIX = "table_vision:"
+    
+    # Table-to-text: distinct tables per document are converted several per
+    # request and cached by normalized markdown hash
+    TEXT_PROMPT_VERSION = "1"
+    TEXT_CACHE_PREFIX = "table_text:"
+    TEXT_BATCH_MAX_CHARS = 12000  # Markdown per request, keeps output within max_tokens
+    TEXT_CONCURRENCY = 4
+    
+    TEXT_SYSTEM_PROMPT = """You are a data analyst converting tables to searchable natural language.
+
+CRITICAL RULES:
+- Preserve EVERY number exactly as shown
+- Include units (millions, PKR, USD, %, etc.) 
+- State the EXACT column header for each value (e.g., "Budget Estimate 2025-26")
+- Include year-over-year comparisons when multiple years shown
+- DO NOT skip any data
+- Format: "[Row Name] for [Column Header] was [Value]" """
+    
     def __init__(self):
         from app.config import settings
         
@@ -30,34 +59,72 @@ class TableProcessor:
         self.max_tables_per_doc = getattr(settings, 'MAX_TABLES_PER_DOC', 100)
         self.decompose_tables = getattr(settings, 'DECOMPOSE_TABLES', True)
         self.use_vision = getattr(settings, 'USE_VISION_FOR_TABLES', True)
+        self.prefilter = getattr(settings, 'TABLE_PREFILTER', True)
+        self.crop_padding = getattr(settings, 'TABLE_CROP_PADDING', 16)
+        self.vision_concurrency = max(1, getattr(settings, 'TABLE_VISION_CONCURRENCY', 4))
+        self.enable_vision_cache = getattr(settings, 'ENABLE_TABLE_VISION_CACHE', True)
+        self.vision_cache_ttl = getattr(settings, 'TABLE_VISION_CACHE_TTL', 30 * 24 * 3600)
+        self.text_batch_size = max(1, getattr(settings, 'TABLE_TEXT_BATCH_SIZE', 8))
+        self.enable_text_cache = getattr(settings, 'ENABLE_TABLE_TEXT_CACHE', True)
+        self.text_cache_ttl = getattr(settings, 'TABLE_TEXT_CACHE_TTL', 90 * 24 * 3600)
+        self._redis_client = None
         
         logger.info(f"TableProcessor initialized - enabled: {self.enabled}, vision: {self.use_vision}, model: {self.vision_model}")
     
+    @property
+    def redis_client(self):
+        """Lazy load Redis client for the vision and table text caches"""
+        if self._redis_client is None:
+            import redis
+            from app.config import settings
+            self._redis_client = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                password=settings.REDIS_PASSWORD or None,
+                db=settings.REDIS_DB,
+                decode_responses=True
+            )
+        return self._redis_client
+    
     async def extract_tables_from_pdf(
         self,
-        pdf_content: bytes,
-        document_name: str = "Document"
+        pdf_content: Union[bytes, str],
+        document_name: str = "Document",
+        stats: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Extract tables from PDF using vision-based approach.
         Converts pages to images and uses GPT-4o to understand table structure.
+        
+        Args:
+            stats: Optional dict filled with page counts of the vision pass
+                (pages_scanned, pages_sent_to_vision, pages_skipped)
         """
         if not self.enabled:
             return []
         
         if self.use_vision:
-            return await self._extract_tables_vision(pdf_content, document_name)
+            return await self._extract_tables_vision(pdf_content, document_name, stats)
         else:
             return await self._extract_tables_pdfplumber(pdf_content, document_name)
     
     async def _extract_tables_vision(
         self,
-        pdf_content: bytes,
-        document_name: str
+        pdf_content: Union[bytes, str],
+        document_name: str,
+        stats: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Vision-based table extraction using GPT-4o.
         More accurate but slightly more expensive.
+        
+        With TABLE_PREFILTER a local pass (extractors.find_table_regions)
+        flags pages that likely contain tables; only those are rendered,
+        cropped to the table area, and sent to the vision model. Rendering
+        and the pre-pass run in the extraction pool, one batch ahead of the
+        vision requests, which run TABLE_VISION_CONCURRENCY at a time under
+        the process-wide vision rate limiter. Results are cached by rendered
+        image hash (see _extract_page_tables).
         """
         try:
             import fitz  # PyMuPDF for PDF to image conversion
@@ -65,61 +132,216 @@ class TableProcessor:
             logger.error("PyMuPDF not installed - required for vision-based extraction")
             return await self._extract_tables_pdfplumber(pdf_content, document_name)
         
+        from app.services import extractors
+        from app.services.extraction_pool import run_extraction
+        
         tables = []
+        stats = stats if stats is not None else {}
+        stats.update(vision_requests=0, vision_cache_hits=0)
+        render_task = None
+        
+        def render(batch):
+            # Use higher resolution for better accuracy (2x zoom for clarity)
+            return asyncio.create_task(run_extraction(extractors.render_pdf_regions, pdf_content, batch, 2.0))
         
         try:
-            pdf_doc = fitz.open(stream=pdf_content, filetype="pdf")
+            if self.prefilter:
+                scan = await run_extraction(extractors.find_table_regions, pdf_content, self.crop_padding)
+                total_pages = scan["pages"]
+                regions = sorted(scan["regions"].items())
+            else:
+                total_pages = await run_extraction(extractors.pdf_page_count, pdf_content)
+                regions = [(index, None) for index in range(total_pages)]
             
-            for page_num in range(pdf_doc.page_count):
-                page = pdf_doc[page_num]
-                
-                # Convert page to image
-                # Use higher resolution for better accuracy
-                mat = fitz.Matrix(2.0, 2.0)  # 2x zoom for clarity
-                pix = page.get_pixmap(matrix=mat)
-                img_bytes = pix.tobytes("png")
-                
-                # Convert to base64
-                img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-                
-                logger.info(f"Processing page {page_num + 1} with vision model...")
+            skipped = total_pages - len(regions)
+            stats.update(
+                pages_scanned=total_pages,
+                pages_sent_to_vision=len(regions),
+                pages_skipped=skipped
+            )
+            logger.info(
+                f"Table prefilter for {document_name}: {len(regions)}/{total_pages} pages flagged, "
+                f"{skipped} skipped"
+            )
+            
+            semaphore = asyncio.Semaphore(self.vision_concurrency)
+            batches = [regions[i:i + self.RENDER_BATCH] for i in range(0, len(regions), self.RENDER_BATCH)]
+            if batches:
+                render_task = render(batches[0])
+            
+            for batch_index in range(len(batches)):
+                images = await render_task
+                render_task = render(batches[batch_index + 1]) if batch_index + 1 < len(batches) else None
                 
-                # Extract tables using vision
-                page_tables = await self._extract_tables_from_image(
-                    img_base64,
-                    page_num + 1,
-                    document_name
-                )
+                page_results = await asyncio.gather(*(
+                    self._extract_page_tables(img_bytes, page_index + 1, document_name, semaphore, stats)
+                    for page_index, img_bytes in images
+                ))
                 
-                if page_tables:
-                    tables.extend(page_tables)
-                    logger.info(f"Page {page_num + 1}: Extracted {len(page_tables)} tables via vision")
+                for (page_index, _), page_tables in zip(images, page_results):
+                    if page_tables:
+                        tables.extend(page_tables)
+                        logger.info(f"Page {page_index + 1}: Extracted {len(page_tables)} tables via vision")
                 
                 if len(tables) >= self.max_tables_per_doc:
                     logger.warning(f"Reached max tables limit ({self.max_tables_per_doc})")
+                    tables = tables[:self.max_tables_per_doc]
                     break
             
-            pdf_doc.close()
-            logger.info(f"Vision extraction complete: {len(tables)} tables from {document_name}")
+            logger.info(
+                f"Vision extraction complete: {len(tables)} tables from {document_name} "
+                f"({stats['vision_requests']} requests, {stats['vision_cache_hits']} cached pages)"
+            )
             
         except Exception as e:
             logger.error(f"Vision-based extraction failed: {e}")
             # Fallback to pdfplumber
             return await self._extract_tables_pdfplumber(pdf_content, document_name)
+        finally:
+            if render_task is not None:
+                render_task.cancel()
         
         return tables
     
+    async def _extract_page_tables(
+        self,
+        img_bytes: bytes,
+        page_num: int,
+        document_name: str,
+        semaphore: asyncio.Semaphore,
+        stats: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Tables on one rendered page (region), from the cache or the vision model
+        
+        The cache key is the sha256 of the PNG plus vision model and
+        VISION_PROMPT_VERSION, so re-uploads and reprocessing of the same
+        PDF make no API calls. Failed or unparseable responses aren't cached.
+        """
+        cache_key = self._vision_cache_key(img_bytes)
+        extracted = self._get_cached_vision(cache_key)
+        
+        if extracted is None:
+            img_base64 = base64.b64encode(img_bytes).decode('utf-8')
+            
+            async with semaphore:
+                logger.info(f"Processing page {page_num} with vision model...")
+                stats["vision_requests"] += 1
+                extracted = await self._extract_tables_from_image(
+                    img_base64,
+                    page_num,
+                    document_name,
+                    self._vision_request_tokens(img_bytes)
+                )
+            
+            if extracted is None:
+                return []
+            self._cache_vision(cache_key, extracted)
+        else:
+            stats["vision_cache_hits"] += 1
+        
+        return self._vision_tables(extracted, page_num, document_name)
+    
+    @staticmethod
+    def _vision_request_tokens(img_bytes: bytes) -> int:
+        """
+        Input tokens of a "detail: high" image request, for the rate limiter:
+        85 + 170 per 512px tile after OpenAI's downscaling (fit in 2048x2048,
+        shortest side 768), plus the prompt
+        """
+        # PNG IHDR: width and height are big-endian uint32 at bytes 16-24
+        width = int.from_bytes(img_bytes[16:20], "big") or 1
+        height = int.from_bytes(img_bytes[20:24], "big") or 1
+        
+        scale = min(1.0, 2048 / max(width, height))
+        width, height = width * scale, height * scale
+        scale = min(1.0, 768 / min(width, height))
+        width, height = width * scale, height * scale
+        
+        tiles = -(-int(width) // 512) * -(-int(height) // 512)
+        return 85 + 170 * tiles + 300
+    
+    def _vision_cache_key(self, img_bytes: bytes) -> str:
+        """Hash of rendered image, vision model and prompt version"""
+        digest = hashlib.sha256(img_bytes).hexdigest()
+        return f"{self.VISION_CACHE_PREFIX}{self.vision_model}:{self.VISION_PROMPT_VERSION}:{digest}"
+    
+    def _get_cached_vision(self, cache_key: str) -> Optional[List[Dict[str, Any]]]:
+        """Return cached extraction, or None on miss / cache unavailable"""
+        if not self.enable_vision_cache:
+            return None
+        try:
+            cached = self.redis_client.get(cache_key)
+            record_cache("table_vision", hits=int(cached is not None), misses=int(cached is None))
+            return json.loads(cached) if cached is not None else None
+        except Exception as e:
+            logger.warning(f"Table vision cache lookup failed: {e}")
+            return None
+    
+    def _cache_vision(self, cache_key: str, extracted: List[Dict[str, Any]]):
+        """Store a parsed extraction (including pages without tables) with TTL"""
+        if not self.enable_vision_cache:
+            return
+        try:
+            self.redis_client.setex(cache_key, self.vision_cache_ttl, json.dumps(extracted))
+        except Exception as e:
+            logger.warning(f"Table vision cache write failed: {e}")
+    
     async def _extract_tables_from_image(
         self,
         img_base64: str,
         page_num: int,
-        document_name: str
-    ) -> List[Dict[str, Any]]:
+        document_name: str,
+        request_tokens: int = 0
+    ) -> Optional[List[Dict[str, Any]]]:
         """
         Use GPT-4o vision to extract tables from a page image.
-        Returns structured table data.
+        Returns the parsed table objects (see _vision_tables), or None if the
+        request failed or the response wasn't valid JSON.
         """
         try:
+            for attempt in range(self.RATE_LIMIT_RETRIES + 1):
+                await get_vision_rate_limiter().acquire(request_tokens)
+                try:
+                    response = await self._vision_completion(img_base64, document_name)
+                    break
+                except Exception as e:
+                    if getattr(e, "status_code", None) != 429 or attempt == self.RATE_LIMIT_RETRIES:
+                        raise
+                    delay = 2 ** attempt
+                    logger.warning(f"Table vision rate limited, retrying in {delay}s")
+                    await asyncio.sleep(delay)
+            
+            result_text = response.choices[0].message.content.strip()
+            
+            # Clean up response (remove markdown code blocks if present)
+            if result_text.startswith("```"):
+                result_text = re.sub(r'^```json?\n?', '', result_text)
+                result_text = re.sub(r'\n?```$', '', result_text)
+            
+            # Parse JSON
+            try:
+                extracted_tables = json.loads(result_text)
+            except json.JSONDecodeError as e:
+                logger.error(f"Failed to parse vision response as JSON: {e}")
+                logger.debug(f"Response was: {result_text[:500]}")
+                return None
+            
+            # Ensure it's a list
+            if isinstance(extracted_tables, dict):
+                extracted_tables = [extracted_tables]
+            if not isinstance(extracted_tables, list):
+                return None
+            
+            return extracted_tables
+            
+        except Exception as e:
+            logger.error(f"Vision extraction failed for page {page_num}: {e}")
+            return None
+    
+    async def _vision_completion(self, img_base64: str, document_name: str):
+        """One vision chat completion (changing the prompt: bump VISION_PROMPT_VERSION)"""
+        with track_openai("table_vision", self.vision_model):
             response = await self.client.chat.completions.create(
                 model=self.vision_model,
                 messages=[
@@ -160,75 +382,60 @@ Return ONLY valid JSON array, no explanation."""
                 temperature=0.1,
                 max_tokens=4096
             )
+        record_openai_tokens("table_vision", self.vision_model, getattr(response, "usage", None))
+        return response
+    
+    def _vision_tables(
+        self,
+        extracted_tables: List[Any],
+        page_num: int,
+        document_name: str
+    ) -> List[Dict[str, Any]]:
+        """Convert parsed vision output to our standard table format"""
+        tables = []
+        for table_idx, table_data in enumerate(extracted_tables):
+            if not isinstance(table_data, dict):
+                continue
             
-            result_text = response.choices[0].message.content.strip()
-            
-            # Clean up response (remove markdown code blocks if present)
-            if result_text.startswith("```"):
-                result_text = re.sub(r'^```json?\n?', '', result_text)
-                result_text = re.sub(r'\n?```$', '', result_text)
-            
-            # Parse JSON
-            try:
-                extracted_tables = json.loads(result_text)
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse vision response as JSON: {e}")
-                logger.debug(f"Response was: {result_text[:500]}")
-                return []
+            headers = table_data.get("headers", [])
+            rows = table_data.get("rows", [])
             
-            # Ensure it's a list
-            if isinstance(extracted_tables, dict):
-                extracted_tables = [extracted_tables]
+            if not headers or not rows:
+                continue
             
-            # Convert to our standard format
-            tables = []
-            for table_idx, table_data in enumerate(extracted_tables):
-                if not isinstance(table_data, dict):
+            # Convert rows to our format
+            data_rows = []
+            for row in rows:
+                if isinstance(row, dict):
+                    row_header = row.get("row_header", "")
+                    values = row.get("values", [])
+                    data_row = [row_header] + [str(v) if v is not None else "" for v in values]
+                elif isinstance(row, list):
+                    data_row = [str(v) if v is not None else "" for v in row]
+                else:
                     continue
-                
-                headers = table_data.get("headers", [])
-                rows = table_data.get("rows", [])
-                
-                if not headers or not rows:
-                    continue
-                
-                # Convert rows to our format
-                data_rows = []
-                for row in rows:
-                    if isinstance(row, dict):
-                        row_header = row.get("row_header", "")
-                        values = row.get("values", [])
-                        data_row = [row_header] + [str(v) if v is not None else "" for v in values]
-                    elif isinstance(row, list):
-                        data_row = [str(v) if v is not None else "" for v in row]
-                    else:
-                        continue
-                    data_rows.append(data_row)
-                
-                # Generate markdown
-                markdown = self._table_to_markdown(headers, data_rows)
-                
-                tables.append({
-                    "page": page_num,
-                    "table_index": table_idx + 1,
-                    "headers": headers,
-                    "data_rows": data_rows,
-                    "markdown": markdown,
-                    "row_count": len(data_rows),
-                    "col_count": len(headers),
-                    "document_name": document_name,
-                    "extraction_method": "vision"
-                })
+                data_rows.append(data_row)
             
-            return tables
+            # Generate markdown
+            markdown = self._table_to_markdown(headers, data_rows)
             
-        except Exception as e:
-            logger.error(f"Vision extraction failed for page {page_num}: {e}")
-            return []
+            tables.append({
+                "page": page_num,
+                "table_index": table_idx + 1,
+                "headers": headers,
+                "data_rows": data_rows,
+                "markdown": markdown,
+                "row_count": len(data_rows),
+                "col_count": len(headers),
+                "document_name": document_name,
+                "extraction_method": "vision"
+            })
+        
+        return tables
     
     async def _extract_tables_pdfplumber(
         self,
-        pdf_content: bytes,
+        pdf_content: Union[bytes, str],
         document_name: str
     ) -> List[Dict[str, Any]]:
         """
@@ -241,7 +448,8 @@ Return ONLY valid JSON array, no explanation."""
             import pdfplumber
             import io
             
-            with pdfplumber.open(io.BytesIO(pdf_content)) as pdf:
+            source = pdf_content if isinstance(pdf_content, str) else io.BytesIO(pdf_content)
+            with pdfplumber.open(source) as pdf:
                 for page_num, page in enumerate(pdf.pages):
                     page_tables = page.extract_tables()
                     
@@ -310,41 +518,43 @@ Return ONLY valid JSON array, no explanation."""
         if not self.enabled:
             return table.get("markdown", "")
         
+        description = await self._describe_table(table, document_context)
+        if description is None:
+            return f"Table from Page {table['page']}:\n{table.get('markdown', '')}"
+        
+        page_ref = f"(Page {table['page']}, Table {table['table_index']})"
+        return f"{description}\n\n{page_ref}"
+    
+    async def _describe_table(
+        self,
+        table: Dict[str, Any],
+        document_context: str = "",
+        stats: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """One table -> description (without page reference), None on failure"""
         try:
             prompt = self._build_conversion_prompt(table, document_context)
             
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are a data analyst converting tables to searchable natural language.
-
-CRITICAL RULES:
-- Preserve EVERY number exactly as shown
-- Include units (millions, PKR, USD, %, etc.) 
-- State the EXACT column header for each value (e.g., "Budget Estimate 2025-26")
-- Include year-over-year comparisons when multiple years shown
-- DO NOT skip any data
-- Format: "[Row Name] for [Column Header] was [Value]" """
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.1,
-                max_tokens=3000
-            )
+            with track_openai("table_to_text", self.model):
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": self.TEXT_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    temperature=0.1,
+                    max_tokens=3000
+                )
+            record_openai_tokens("table_to_text", self.model, getattr(response, "usage", None))
             
             description = response.choices[0].message.content.strip()
-            page_ref = f"(Page {table['page']}, Table {table['table_index']})"
-            
-            return f"{description}\n\n{page_ref}"
+            if stats is not None:
+                self._count_text_usage(stats, response, prompt, description)
+            return description
             
         except Exception as e:
             logger.error(f"Error converting table to natural language: {e}")
-            return f"Table from Page {table['page']}:\n{table.get('markdown', '')}"
+            return None
     
     def _build_conversion_prompt(self, table: Dict[str, Any], document_context: str) -> str:
         """Build the prompt for table conversion"""
@@ -369,6 +579,229 @@ Output clear, searchable sentences.""")
         
         return "\n".join(prompt_parts)
     
+    async def _describe_table_batch(
+        self,
+        batch: List[Tuple[str, Dict[str, Any]]],
+        document_context: str,
+        semaphore: asyncio.Semaphore,
+        stats: Dict[str, Any]
+    ) -> Dict[str, str]:
+        """
+        Several tables in one structured request
+        
+        Args:
+            batch: (table hash, table) pairs
+        
+        Returns:
+            table hash -> description for every table the response covered;
+            missing ones (bad JSON, truncated output) are left to the caller
+        """
+        ids = {f"T{position + 1}": table_hash for position, (table_hash, _) in enumerate(batch)}
+        prompt = self._build_batch_prompt(batch, document_context)
+        
+        try:
+            async with semaphore:
+                stats["text_requests"] += 1
+                with track_openai("table_to_text", self.model):
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": self.TEXT_SYSTEM_PROMPT},
+                            {"role": "user", "content": prompt}
+                        ],
+                        temperature=0.1,
+                        max_tokens=min(16000, 3000 * len(batch)),
+                        response_format={"type": "json_object"}
+                    )
+            record_openai_tokens("table_to_text", self.model, getattr(response, "usage", None))
+            
+            result_text = response.choices[0].message.content.strip()
+            self._count_text_usage(stats, response, prompt, result_text)
+            entries = json.loads(result_text).get("tables", [])
+        except Exception as e:
+            logger.error(f"Batched table conversion failed ({len(batch)} tables): {e}")
+            return {}
+        
+        descriptions = {}
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            table_hash = ids.get(str(entry.get("id", "")).strip())
+            description = entry.get("description")
+            if table_hash and isinstance(description, str) and description.strip():
+                descriptions[table_hash] = description.strip()
+        
+        return descriptions
+    
+    def _build_batch_prompt(
+        self,
+        batch: List[Tuple[str, Dict[str, Any]]],
+        document_context: str
+    ) -> str:
+        """Prompt for several tables (changing it: bump TEXT_PROMPT_VERSION)"""
+        prompt_parts = []
+        
+        if document_context:
+            prompt_parts.append(f"Document: {document_context}")
+        
+        for position, (_, table) in enumerate(batch):
+            prompt_parts.append(f"\n### Table T{position + 1}")
+            prompt_parts.append(f"Column Headers: {table['headers']}")
+            prompt_parts.append(f"Table ({table['row_count']} rows, {table['col_count']} columns):")
+            prompt_parts.append(table['markdown'])
+        
+        prompt_parts.append("""
+
+Convert EACH table to natural language, independently. For EACH row:
+1. State the row name (first column)
+2. State the value for EACH column with its EXACT header name
+3. Include any trends or changes between years
+
+Return a JSON object with one entry per table:
+{"tables": [{"id": "T1", "description": "clear, searchable sentences"}]}""")
+        
+        return "\n".join(prompt_parts)
+    
+    def _pack_text_batches(
+        self,
+        pending: List[Tuple[str, Dict[str, Any]]]
+    ) -> List[List[Tuple[str, Dict[str, Any]]]]:
+        """Group tables into requests of up to TABLE_TEXT_BATCH_SIZE tables / TEXT_BATCH_MAX_CHARS"""
+        batches = []
+        current = []
+        current_chars = 0
+        
+        for item in pending:
+            size = len(item[1].get("markdown", ""))
+            if current and (len(current) >= self.text_batch_size or current_chars + size > self.TEXT_BATCH_MAX_CHARS):
+                batches.append(current)
+                current = []
+                current_chars = 0
+            current.append(item)
+            current_chars += size
+        
+        if current:
+            batches.append(current)
+        return batches
+    
+    @staticmethod
+    def _count_text_usage(stats: Dict[str, Any], response, prompt: str, output: str):
+        """Add a response's token usage to stats (estimated from lengths if missing)"""
+        usage = getattr(response, "usage", None)
+        input_tokens = getattr(usage, "prompt_tokens", None)
+        output_tokens = getattr(usage, "completion_tokens", None)
+        stats["text_input_tokens"] = stats.get("text_input_tokens", 0) + (
+            input_tokens if isinstance(input_tokens, int) else len(prompt) // 4
+        )
+        stats["text_output_tokens"] = stats.get("text_output_tokens", 0) + (
+            output_tokens if isinstance(output_tokens, int) else len(output) // 4
+        )
+    
+    @staticmethod
+    def _table_hash(table: Dict[str, Any]) -> str:
+        """sha256 of the markdown with whitespace collapsed and case folded"""
+        lines = (" ".join(line.split()).lower() for line in table.get("markdown", "").splitlines())
+        normalized = "\n".join(line for line in lines if line)
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    
+    def _text_cache_key(self, table_hash: str, document_context: str) -> str:
+        """Table hash, document context (it's in the prompt), model and prompt version"""
+        context = hashlib.sha256(document_context.encode("utf-8")).hexdigest()[:16]
+        return f"{self.TEXT_CACHE_PREFIX}{self.model}:{self.TEXT_PROMPT_VERSION}:{context}:{table_hash}"
+    
+    def _get_cached_texts(self, cache_keys: List[str]) -> List[Optional[str]]:
+        """Cached descriptions (None per miss); all misses if the cache is unavailable"""
+        if not self.enable_text_cache or not cache_keys:
+            return [None] * len(cache_keys)
+        try:
+            cached = self.redis_client.mget(cache_keys)
+            hits = sum(1 for value in cached if value is not None)
+            record_cache("table_text", hits=hits, misses=len(cached) - hits)
+            return cached
+        except Exception as e:
+            logger.warning(f"Table text cache lookup failed: {e}")
+            return [None] * len(cache_keys)
+    
+    def _cache_texts(self, entries: Dict[str, str]):
+        """Store descriptions (cache key -> description) with TTL"""
+        if not self.enable_text_cache or not entries:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for cache_key, description in entries.items():
+                pipe.setex(cache_key, self.text_cache_ttl, description)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Table text cache write failed: {e}")
+    
+    async def _describe_tables(
+        self,
+        unique_tables: Dict[str, Dict[str, Any]],
+        document_context: str,
+        stats: Dict[str, Any]
+    ) -> Dict[str, str]:
+        """
+        Descriptions for distinct tables (table hash -> description)
+        
+        Cached ones come from Redis; the rest are converted TABLE_TEXT_BATCH_SIZE
+        per request, TEXT_CONCURRENCY requests at a time. Tables a batch
+        response doesn't cover are retried one per request; tables that still
+        fail are left out (callers fall back to markdown) and not cached.
+        """
+        hashes = list(unique_tables)
+        cache_keys = {table_hash: self._text_cache_key(table_hash, document_context) for table_hash in hashes}
+        cached = self._get_cached_texts([cache_keys[table_hash] for table_hash in hashes])
+        
+        descriptions = {
+            table_hash: description
+            for table_hash, description in zip(hashes, cached)
+            if description is not None
+        }
+        stats["text_cache_hits"] = len(descriptions)
+        
+        pending = [(table_hash, unique_tables[table_hash]) for table_hash in hashes if table_hash not in descriptions]
+        if not pending:
+            return descriptions
+        
+        semaphore = asyncio.Semaphore(self.TEXT_CONCURRENCY)
+        converted = {}
+        
+        batches = self._pack_text_batches(pending)
+        for result in await asyncio.gather(*(
+            self._describe_table_batch(batch, document_context, semaphore, stats)
+            for batch in batches
+        )):
+            converted.update(result)
+        
+        missing = [(table_hash, table) for table_hash, table in pending if table_hash not in converted]
+        if missing:
+            logger.warning(f"{len(missing)} tables missing from batched responses, converting individually")
+            
+            async def describe_one(table):
+                async with semaphore:
+                    stats["text_requests"] += 1
+                    return await self._describe_table(table, document_context, stats)
+            
+            results = await asyncio.gather(*(describe_one(table) for _, table in missing))
+            for (table_hash, _), description in zip(missing, results):
+                if description:
+                    converted[table_hash] = description
+        
+        self._cache_texts({cache_keys[table_hash]: description for table_hash, description in converted.items()})
+        descriptions.update(converted)
+        return descriptions
+    
+    @staticmethod
+    def _page_reference(occurrences: List[Dict[str, Any]]) -> str:
+        """(Page X, Table Y), listing the other pages of a repeated table"""
+        first = occurrences[0]
+        page_ref = f"Page {first['page']}, Table {first['table_index']}"
+        
+        other_pages = sorted({t["page"] for t in occurrences[1:]} - {first["page"]})
+        if other_pages:
+            page_ref += f"; repeated on pages {', '.join(str(page) for page in other_pages)}"
+        return f"({page_ref})"
+    
     def decompose_table_to_chunks(
         self,
         table: Dict[str, Any],
@@ -426,12 +859,15 @@ Output clear, searchable sentences.""")
     
     async def process_document_tables(
         self,
-        pdf_content: bytes,
+        pdf_content: Union[bytes, str],
         document_name: str = "Document",
         document_context: str = ""
     ) -> Dict[str, Any]:
         """
         Main method: Extract and process all tables from a PDF.
+        
+        Tables repeated across pages (same normalized markdown) yield one
+        description and one set of row chunks, referencing every page.
         """
         if not self.enabled:
             return {
@@ -442,61 +878,83 @@ Output clear, searchable sentences.""")
             }
         
         # Step 1: Extract tables (using vision or pdfplumber)
-        tables = await self.extract_tables_from_pdf(pdf_content, document_name)
+        page_stats = {}
+        tables = await self.extract_tables_from_pdf(pdf_content, document_name, stats=page_stats)
         
         if not tables:
             return {
                 "table_descriptions": [],
                 "table_chunks": [],
                 "tables_found": 0,
-                "processing_stats": {}
+                "processing_stats": {
+                    **page_stats,
+                    "estimated_cost_usd": round(page_stats.get("vision_requests", 0) * 0.003, 6)
+                } if page_stats else {}
             }
         
-        logger.info(f"Processing {len(tables)} tables from {document_name}")
+        # Step 2: Group repeated tables (headers/footers, grids on every page)
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for table in tables:
+            groups.setdefault(self._table_hash(table), []).append(table)
+        
+        logger.info(f"Processing {len(tables)} tables ({len(groups)} distinct) from {document_name}")
+        
+        # Step 3: Convert distinct tables to natural language (cached, batched)
+        text_stats = {"text_requests": 0, "text_cache_hits": 0, "text_input_tokens": 0, "text_output_tokens": 0}
+        try:
+            descriptions = await self._describe_tables(
+                {table_hash: occurrences[0] for table_hash, occurrences in groups.items()},
+                document_context or document_name,
+                text_stats
+            )
+        except Exception as e:
+            logger.error(f"Table to text conversion failed: {e}")
+            descriptions = {}
         
-        # Step 2: Convert tables to natural language and decompose
+        # Step 4: One description and one set of row chunks per distinct table
         table_descriptions = []
         table_chunks = []
-        total_input_tokens = 0
-        total_output_tokens = 0
         
-        for table in tables:
-            try:
-                # Convert to natural language description
-                description = await self.table_to_natural_language(
-                    table,
-                    document_context or document_name
-                )
-                
+        for table_hash, occurrences in groups.items():
+            table = occurrences[0]
+            description = descriptions.get(table_hash)
+            
+            if description is None:
                 table_descriptions.append({
-                    "content": description,
+                    "content": f"Table from Page {table['page']}:\n{table['markdown']}",
                     "page": table["page"],
                     "table_index": table["table_index"],
-                    "type": "table_description"
+                    "type": "table_markdown"
                 })
-                
-                # Decompose into row-level chunks
-                if self.decompose_tables:
-                    row_chunks = self.decompose_table_to_chunks(table, document_name)
-                    table_chunks.extend(row_chunks)
-                    logger.info(f"Table {table['page']}-{table['table_index']}: {len(row_chunks)} row chunks created")
-                
-                # Estimate tokens
-                total_input_tokens += len(table["markdown"]) // 4
-                total_output_tokens += len(description) // 4
-                
-            except Exception as e:
-                logger.error(f"Error processing table on page {table['page']}: {e}")
+            else:
                 table_descriptions.append({
-                    "content": f"Table from Page {table['page']}:\n{table['markdown']}",
+                    "content": f"{description}\n\n{self._page_reference(occurrences)}",
                     "page": table["page"],
                     "table_index": table["table_index"],
-                    "type": "table_markdown"
+                    "type": "table_description"
                 })
+            
+            # Decompose into row-level chunks
+            if self.decompose_tables:
+                try:
+                    row_chunks = self.decompose_table_to_chunks(table, document_name)
+                except Exception as e:
+                    logger.error(f"Error decomposing table on page {table['page']}: {e}")
+                    continue
+                if len(occurrences) > 1:
+                    pages = sorted({t["page"] for t in occurrences})
+                    for chunk in row_chunks:
+                        chunk["metadata"]["pages"] = pages
+                table_chunks.extend(row_chunks)
+                logger.info(f"Table {table['page']}-{table['table_index']}: {len(row_chunks)} row chunks created")
         
         # Calculate cost estimate
-        # Vision: ~$0.003 per page, Text generation: GPT-4o-mini pricing
-        vision_cost = len(set(t["page"] for t in tables)) * 0.003  # Per unique page
+        # Vision: ~$0.003 per request (cached pages are free), Text generation: GPT-4o-mini pricing
+        # (cached and repeated tables cost nothing)
+        total_input_tokens = text_stats["text_input_tokens"]
+        total_output_tokens = text_stats["text_output_tokens"]
+        vision_requests = page_stats.get("vision_requests", len(set(t["page"] for t in tables)))
+        vision_cost = vision_requests * 0.003
         input_cost = (total_input_tokens / 1_000_000) * 0.15
         output_cost = (total_output_tokens / 1_000_000) * 0.60
         total_cost = vision_cost + input_cost + output_cost
@@ -505,11 +963,16 @@ Output clear, searchable sentences.""")
             "tables_processed": len(tables),
             "descriptions_generated": len(table_descriptions),
             "row_chunks_created": len(table_chunks),
+            "unique_tables": len(groups),
+            "duplicate_tables": len(tables) - len(groups),
+            "text_requests": text_stats["text_requests"],
+            "text_cache_hits": text_stats["text_cache_hits"],
             "extraction_method": tables[0].get("extraction_method", "unknown") if tables else "none",
             "estimated_input_tokens": total_input_tokens,
             "estimated_output_tokens": total_output_tokens,
             "estimated_cost_usd": round(total_cost, 6),
-            "model": self.vision_model if self.use_vision else self.model
+            "model": self.vision_model if self.use_vision else self.model,
+            **page_stats
         }
         
         logger.info(f"Table processing complete: {processing_stats}")
@@ -531,4 +994,20 @@ def get_table_processor() -> TableProcessor:
     global _table_processor
     if _table_processor is None:
         _table_processor = TableProcessor()
-    return _table_processor
\ No newline at end of file
+    return _table_processor
+
+
+# Process-wide limiter: concurrent documents share one vision API budget
+_vision_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_vision_rate_limiter() -> RateLimiter:
+    """Get or create the table vision RateLimiter singleton"""
+    global _vision_rate_limiter
+    if _vision_rate_limiter is None:
+        from app.config import settings
+        _vision_rate_limiter = RateLimiter(
+            requests_per_minute=getattr(settings, 'TABLE_VISION_REQUESTS_PER_MINUTE', 500),
+            tokens_per_minute=getattr(settings, 'TABLE_VISION_TOKENS_PER_MINUTE', 450000)
+        )
+    return _vision_rate_limiter
@@ -3,10 +3,11 @@ Vector Store Service
 Store and search vectors in Redis
 """
 
+import asyncio
 import json
 import logging
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable
 import numpy as np
 import redis
 import mysql.connector
@@ -14,6 +15,9 @@ import mysql.connector
 from app.config import settings
 from app.services.embeddings import EmbeddingService
 from app.services.semantic_cache import SemanticCache 
+from app.services.bm25_index import get_bm25_index
+from app.utils.timing import SpanRecorder
+from app.utils.metrics import track_redis, track_mysql, record_cache
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +39,8 @@ class VectorStore:
         
         self.semantic_cache = SemanticCache()
         self.enable_cache = getattr(settings, 'ENABLE_SEMANTIC_CACHE', True)
+        
+        self.bm25_index = get_bm25_index()
     
     def _get_mysql_connection(self):
         """Get MySQL connection"""
@@ -52,10 +58,106 @@ class VectorStore:
         kb_id: str,
         tenant_id: str,
         chunks: List[Dict[str, Any]],
-        embeddings: List[Dict[str, Any]]
+        embeddings: List[Dict[str, Any]],
+        mark_completed: bool = True
     ):
         """
         Store document chunks and embeddings
+        
+        MySQL rows go in with batched executemany (one transaction) while the
+        Redis vectors and BM25 postings are written through pipelines; all
+        three run concurrently in worker threads. The transaction (rows and
+        completed status) is only committed once the vectors are written, so
+        stored rows always have vectors. If either write fails, the rows are
+        rolled back and the vectors and postings of this call are removed.
+        
+        Args:
+            mark_completed: Set the document status to completed in the same
+                transaction. The streaming pipeline stores a document in
+                several calls and passes False.
+        """
+        batch_size = max(1, getattr(settings, 'STORE_BATCH_SIZE', 500))
+        
+        # Create embedding lookup
+        embedding_map = {emb["chunk_id"]: emb for emb in embeddings}
+        stored_chunks = []
+        chunk_rows = []
+        vector_items = []
+        
+        for chunk in chunks:
+            chunk_id = chunk["chunk_id"]
+            embedding_data = embedding_map.get(chunk_id)
+            
+            if not embedding_data:
+                logger.warning(f"No embedding for chunk {chunk_id}")
+                continue
+            
+            chunk_rows.append((
+                chunk_id,
+                document_id,
+                kb_id,
+                chunk["chunk_index"],
+                chunk["content"],
+                chunk.get("chunk_type", "text"),
+                json.dumps(chunk.get("metadata", {}))
+            ))
+            
+            vector_data = {
+                "chunk_id": chunk_id,
+                "document_id": document_id,
+                "kb_id": kb_id,
+                "embedding": embedding_data["embedding"],
+                "content": chunk["content"][:500],  # Store preview
+                "chunk_type": chunk.get("chunk_type", "text"),
+                "metadata": chunk.get("metadata", {})
+            }
+            vector_items.append((f"{self.prefix}{kb_id}:{chunk_id}", json.dumps(vector_data)))
+            stored_chunks.append(chunk)
+        
+        mysql_result, redis_result, _ = await asyncio.gather(
+            asyncio.to_thread(self._insert_chunk_rows, document_id, chunk_rows, batch_size, mark_completed),
+            asyncio.to_thread(self._write_vectors, vector_items, batch_size),
+            asyncio.to_thread(self._index_keywords, kb_id, document_id, stored_chunks),
+            return_exceptions=True
+        )
+        
+        error = next((r for r in (mysql_result, redis_result) if isinstance(r, BaseException)), None)
+        if error is None:
+            try:
+                await asyncio.to_thread(self._finish_transaction, mysql_result, True)
+            except Exception as e:
+                error = e
+        elif not isinstance(mysql_result, BaseException):
+            # Vectors failed - don't commit rows a search (or a resumed run) would treat as stored
+            await asyncio.to_thread(self._finish_transaction, mysql_result, False)
+        
+        if error is not None:
+            logger.error(f"Error storing document: {error}")
+            self._delete_vectors([key for key, _ in vector_items], batch_size)
+            try:
+                self.bm25_index.remove_chunks(kb_id, [c["chunk_id"] for c in stored_chunks])
+            except Exception as e:
+                logger.error(f"Failed to clean up BM25 postings after store error: {e}")
+            raise error
+        
+        logger.info(f"Stored {len(stored_chunks)} chunks for document {document_id}")
+    
+    def _index_keywords(self, kb_id: str, document_id: str, chunks: List[Dict[str, Any]]):
+        """Keyword index over full chunk content (not the 500-char preview) - never fails the store"""
+        try:
+            self.bm25_index.index_chunks(kb_id, chunks)
+        except Exception as e:
+            logger.error(f"BM25 indexing failed for document {document_id}: {e}")
+    
+    def _insert_chunk_rows(
+        self, document_id: str, chunk_rows: List[tuple], batch_size: int, mark_completed: bool = True
+    ):
+        """
+        Insert chunk rows in multi-row batches and optionally mark the document
+        completed, in one transaction left open for _finish_transaction
+        
+        Returns:
+            (connection, cursor)
         """
         conn = self._get_mysql_connection()
         cursor = conn.cursor()
@@ -66,92 +168,69 @@ class VectorStore:
                 "SELECT id FROM yovo_tbl_aiva_documents WHERE id = %s",
                 (document_id,)
             )
-            doc_exists = cursor.fetchone()
-            
-            # If document doesn't exist, we need to create it first
-            # This should have been done in the document_processor, but let's handle it here too
-            if not doc_exists:
+            if not cursor.fetchone():
+                # This should have been done in the document_processor
                 logger.warning(f"Document {document_id} not found, creating record...")
-                #cursor.execute("""
-                #    INSERT INTO yovo_tbl_aiva_documents 
-                #    (id, kb_id, tenant_id, filename, original_filename, file_type,
-                #     file_size_bytes, storage_url, status, created_at, updated_at)
-                #    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-                #""", (
-                #    document_id,
-                #    kb_id,
-                #    tenant_id,
-                #    f"doc_{document_id}",
-                #    "unknown",
-                #    "text/plain",
-                #    0,
-                #    f"/storage/documents/{document_id}",
-                #    "processing"
-                #))
-                #logger.info(f"Created document record for {document_id}")
             
-            # Create embedding lookup
-            embedding_map = {emb["chunk_id"]: emb for emb in embeddings}
-            
-            # Store chunks in MySQL
-            for chunk in chunks:
-                chunk_id = chunk["chunk_id"]
-                embedding_data = embedding_map.get(chunk_id)
-                
-                if not embedding_data:
-                    logger.warning(f"No embedding for chunk {chunk_id}")
-                    continue
-                
-                # Insert chunk into MySQL
-                cursor.execute("""
-                    INSERT INTO yovo_tbl_aiva_document_chunks 
-                    (id, document_id, kb_id, chunk_index, content, chunk_type, metadata, created_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
-                """, (
-                    chunk_id,
-                    document_id,
-                    kb_id,
-                    chunk["chunk_index"],
-                    chunk["content"],
-                    chunk.get("chunk_type", "text"),
-                    json.dumps(chunk.get("metadata", {}))
-                ))
-                
-                # Store vector in Redis
-                vector_key = f"{self.prefix}{kb_id}:{chunk_id}"
-                vector_data = {
-                    "chunk_id": chunk_id,
-                    "document_id": document_id,
-                    "kb_id": kb_id,
-                    "embedding": embedding_data["embedding"],
-                    "content": chunk["content"][:500],  # Store preview
-                    "chunk_type": chunk.get("chunk_type", "text"),
-                    "metadata": chunk.get("metadata", {})
-                }
-                
-                self.redis_client.set(
-                    vector_key,
-                    json.dumps(vector_data)
-                )
+            with track_mysql("insert_chunks"):
+                for i in range(0, len(chunk_rows), batch_size):
+                    cursor.executemany("""
+                        INSERT INTO yovo_tbl_aiva_document_chunks 
+                        (id, document_id, kb_id, chunk_index, content, chunk_type, metadata, created_at)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+                    """, chunk_rows[i:i + batch_size])
             
             # Update document status to completed
-            cursor.execute("""
-                UPDATE yovo_tbl_aiva_documents 
-                SET status = 'completed', updated_at = NOW()
-                WHERE id = %s
-            """, (document_id,))
+            if mark_completed:
+                cursor.execute("""
+                    UPDATE yovo_tbl_aiva_documents 
+                    SET status = 'completed', updated_at = NOW()
+                    WHERE id = %s
+                """, (document_id,))
             
-            conn.commit()
-            logger.info(f"Stored {len(chunks)} chunks for document {document_id}")
+            return conn, cursor
             
-        except Exception as e:
+        except Exception:
             conn.rollback()
-            logger.error(f"Error storing document: {e}")
+            cursor.close()
+            conn.close()
             raise
+    
+    @staticmethod
+    def _finish_transaction(transaction: Tuple[Any, Any], commit: bool):
+        """Commit or roll back the transaction opened by _insert_chunk_rows"""
+        conn, cursor = transaction
+        try:
+            if commit:
+                conn.commit()
+            else:
+                conn.rollback()
+        except Exception:
+            if commit:
+                conn.rollback()
+                raise
+            logger.error("Rollback of chunk rows failed", exc_info=True)
         finally:
             cursor.close()
             conn.close()
     
+    def _write_vectors(self, vector_items: List[Tuple[str, str]], batch_size: int):
+        """SET vector JSON payloads through non-transactional pipelines"""
+        with track_redis("store_vectors"):
+            for i in range(0, len(vector_items), batch_size):
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key, payload in vector_items[i:i + batch_size]:
+                    pipe.set(key, payload)
+                pipe.execute()
+    
+    def _delete_vectors(self, keys: List[str], batch_size: int):
+        """Best-effort removal of vectors written by a failed store"""
+        try:
+            for i in range(0, len(keys), batch_size):
+                self.redis_client.delete(*keys[i:i + batch_size])
+        except Exception as e:
+            logger.error(f"Failed to clean up vectors after store error: {e}")
+    
     async def search(
         self,
         kb_id: str,
@@ -160,7 +239,11 @@ class VectorStore:
         top_k: int = 5,
         search_type: str = "hybrid",
         filters: Dict[str, Any] = None,
-        include_products: bool = False
+        include_products: bool = False,
+        query_embedding_result: Optional[Dict[str, Any]] = None,
+        variant_embeddings: Optional[List[List[float]]] = None,
+        spans: Optional[SpanRecorder] = None,
+        on_stage: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
         """
         Search vectors using cosine similarity with semantic caching
@@ -172,26 +255,39 @@ class VectorStore:
             top_k: Number of results to return
             search_type: Type of search (text/image/hybrid)
             filters: Optional metadata filters
+            query_embedding_result: Precomputed generate_embedding() result for query
+            variant_embeddings: Embeddings of query variants (multi-query
+                retrieval); rankings per variant are fused with RRF
+            spans: Optional SpanRecorder for per-stage timings
+            on_stage: Optional hook awaited as each part is ready:
+                ("retrieved", {"text_results", "cached"}) after scoring and
+                enrichment, then ("images", {"image_results"}) and
+                ("products", {"product_results"})
             
         Returns:
             Search results dictionary
         """
         import time
         search_start = time.time()
+        spans = spans or SpanRecorder()
         
-        # Generate query embedding
-        query_embedding_result = await self.embedding_service.generate_embedding(query)
+        # Generate query embedding (unless the caller already has it)
+        if query_embedding_result is None:
+            with spans.span("embedding"):
+                query_embedding_result = await self.embedding_service.generate_embedding(query)
         query_embedding = np.array(query_embedding_result["embedding"])
         query_tokens = query_embedding_result["tokens"]
         
         # CHECK SEMANTIC CACHE FIRST (if enabled)
         if self.enable_cache and search_type == "text":
-            cached_result = await self.semantic_cache.get_cached_result(
-                kb_id=kb_id,
-                query=query,
-                query_embedding=query_embedding.tolist(),
-                search_type=search_type
-            )
+            with spans.span("semantic_cache"):
+                cached_result = await self.semantic_cache.get_cached_result(
+                    kb_id=kb_id,
+                    query=query,
+                    query_embedding=query_embedding.tolist(),
+                    search_type=search_type
+                )
+            record_cache("semantic", hits=int(bool(cached_result)), misses=int(not cached_result))
             
             if cached_result:
                 search_time = int((time.time() - search_start) * 1000)
@@ -220,6 +316,11 @@ class VectorStore:
                         "metadata": r.get("metadata", {})
                     })
                 
+                if on_stage is not None:
+                    await on_stage("retrieved", {"text_results": formatted_text_results, "cached": True})
+                    await on_stage("images", {"image_results": cached_result['results'].get('image_results', [])})
+                    await on_stage("products", {"product_results": cached_result['results'].get('product_results', [])})
+                
                 return {
                     "total_found": cached_result['results'].get('total_found', 0),
                     "returned": cached_result['results'].get('returned', 0),
@@ -237,62 +338,42 @@ class VectorStore:
                 }
         
         # CACHE MISS - Perform actual search
-        # Get all vectors for this KB from Redis
-        pattern = f"{self.prefix}{kb_id}:*"
-        keys = self.redis_client.keys(pattern)
-        
-        # Filter out product keys - only get document chunks
-        document_keys = [k for k in keys if b':product:' not in k]
-    
-        if not document_keys:
-            text_results = []
-            chunks_searched = 0
+        # Score every document chunk in the KB (one matrix product)
+        if variant_embeddings and len(variant_embeddings) > 1:
+            query_matrix = np.array(variant_embeddings, dtype=np.float32)
         else:
-            # Calculate similarities for documents (existing code)
-            similarities = []
-            
-            for key in document_keys:
-                try:
-                    vector_data = json.loads(self.redis_client.get(key))
-                    stored_embedding = np.array(vector_data["embedding"])
-                    
-                    similarity = self._cosine_similarity(query_embedding, stored_embedding)
-                    
-                    similarities.append({
-                        "chunk_id": vector_data["chunk_id"],
-                        "document_id": vector_data["document_id"],
-                        "content": vector_data.get("content", ""),
-                        "chunk_type": vector_data.get("chunk_type", "text"),
-                        "metadata": vector_data.get("metadata", {}),
-                        "score": float(similarity)
-                    })
-                    
-                except Exception as e:
-                    logger.error(f"Error processing vector {key}: {e}")
-                    continue
-            
-            similarities.sort(key=lambda x: x["score"], reverse=True)
-            top_results = similarities[:top_k]
-            text_results = await self._enrich_results(top_results)
-            chunks_searched = len(document_keys)
+            query_matrix = query_embedding.reshape(1, -1).astype(np.float32)
+        
+        text_results, chunks_searched = await self.search_text(kb_id, query_matrix, top_k, spans=spans)
+        if on_stage is not None:
+            await on_stage("retrieved", {"text_results": text_results, "cached": False})
+        
+        # ========== FETCH IMAGES FOR DOCUMENTS IN RESULTS ==========
+        with spans.span("images"):
+            image_results = await self.get_document_images(kb_id, text_results)
+        if on_stage is not None:
+            await on_stage("images", {"image_results": image_results})
         
         # ✅ 2. Search products (NEW!)
         product_results = []
         if include_products:
-            try:
-                from app.services.product_search import product_search_service
-                product_results = await product_search_service.search_products(
-                    kb_id=kb_id,
-                    query_embedding=query_embedding,
-                    top_k=top_k,
-                    filters=filters
-                )
-                logger.info(f"Found {len(product_results)} matching products")
-            except Exception as e:
-                logger.error(f"Product search failed: {e}")
-                product_results = []
+            with spans.span("products"):
+                try:
+                    from app.services.product_search import product_search_service
+                    product_results = await product_search_service.search_products(
+                        kb_id=kb_id,
+                        query_embedding=query_embedding,
+                        top_k=top_k,
+                        filters=filters
+                    )
+                    logger.info(f"Found {len(product_results)} matching products")
+                except Exception as e:
+                    logger.error(f"Product search failed: {e}")
+                    product_results = []
         else:
             logger.info("Skipping product search (include_products=False)")
+        if on_stage is not None:
+            await on_stage("products", {"product_results": product_results})
         
         search_time = int((time.time() - search_start) * 1000)
         
@@ -301,7 +382,7 @@ class VectorStore:
             "total_found": len(text_results) + len(product_results),
             "returned": len(text_results),
             "text_results": text_results,
-            "image_results": [],  # Will populate below
+            "image_results": image_results,
             "product_results": product_results,
             "query_tokens": query_tokens,
             "embedding_model": query_embedding_result["model"],
@@ -310,7 +391,63 @@ class VectorStore:
             "cached": False
         }
         
-        # ========== FETCH IMAGES FOR DOCUMENTS IN RESULTS ==========
+        # CACHE THE RESULTS (if enabled and text search)
+        if self.enable_cache and search_type == "text" and len(text_results) > 0:
+            # Convert TextResult Pydantic objects to dict format for caching
+            def serialize_result(r):
+                """Convert TextResult to dict, handling both Pydantic objects and dicts"""
+                if hasattr(r, 'dict'):
+                    # It's a Pydantic object - use .dict() method
+                    result_dict = r.dict()
+                elif hasattr(r, 'model_dump'):
+                    # Pydantic v2 - use .model_dump() method
+                    result_dict = r.model_dump()
+                else:
+                    # It's already a dict
+                    result_dict = r
+                
+                # Add extra fields for cache retrieval
+                if "source" in result_dict and isinstance(result_dict["source"], dict):
+                    result_dict["chunk_id"] = result_dict["source"].get("chunk_id")
+                    result_dict["document_id"] = result_dict["source"].get("document_id")
+                    result_dict["title"] = result_dict["source"].get("document_name", "Document")
+                
+                return result_dict
+            
+            cacheable_results = {
+                "total_found": search_results["total_found"],
+                "returned": search_results["returned"],
+                "text_results": [serialize_result(r) for r in text_results],
+                "image_results": search_results.get("image_results", []),
+                "product_results": search_results.get("product_results", []),
+                "query_tokens": search_results["query_tokens"],
+                "embedding_model": search_results["embedding_model"],
+                "chunks_searched": search_results["chunks_searched"],
+                "search_time_ms": search_results["search_time_ms"]
+            }
+            
+            with spans.span("cache_write"):
+                await self.semantic_cache.cache_result(
+                    kb_id=kb_id,
+                    query=query,
+                    query_embedding=query_embedding.tolist(),
+                    results=cacheable_results,
+                    search_type=search_type,
+                    metadata={
+                        'top_k': top_k,
+                        'filters': filters
+                    }
+                )
+        
+        return search_results
+    
+    async def get_document_images(self, kb_id: str, text_results: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Fetch images belonging to the documents of the given text results
+        
+        Returns:
+            Image result dicts (empty on error - never fails the search)
+        """
         image_results = []
         
         if text_results:
@@ -367,8 +504,9 @@ class VectorStore:
                             LIMIT 20
                         """
                         
-                        cursor.execute(query_sql, (kb_id, *doc_ids))
-                        images = cursor.fetchall()
+                        with track_mysql("document_images"):
+                            cursor.execute(query_sql, (kb_id, *doc_ids))
+                            images = cursor.fetchall()
                         
                         # Generate image URLs
                         base_url = os.getenv('MANAGEMENT_API_URL', 'http://localhost:5000')
@@ -412,57 +550,182 @@ class VectorStore:
                 print(f"Error fetching images: {e}")
                 # Don't fail the search if image fetching fails
         
-        # Update search_results with images
-        search_results["image_results"] = image_results
+        return image_results
+    
+    async def score_chunks(
+        self,
+        kb_id: str,
+        chunk_ids: List[str],
+        query_embedding: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """
+        Cosine-score specific chunks against a query embedding
         
-        # CACHE THE RESULTS (if enabled and text search)
-        if self.enable_cache and search_type == "text" and len(text_results) > 0:
-            # Convert TextResult Pydantic objects to dict format for caching
-            def serialize_result(r):
-                """Convert TextResult to dict, handling both Pydantic objects and dicts"""
-                if hasattr(r, 'dict'):
-                    # It's a Pydantic object - use .dict() method
-                    result_dict = r.dict()
-                elif hasattr(r, 'model_dump'):
-                    # Pydantic v2 - use .model_dump() method
-                    result_dict = r.model_dump()
-                else:
-                    # It's already a dict
-                    result_dict = r
-                
-                # Add extra fields for cache retrieval
-                if "source" in result_dict and isinstance(result_dict["source"], dict):
-                    result_dict["chunk_id"] = result_dict["source"].get("chunk_id")
-                    result_dict["document_id"] = result_dict["source"].get("document_id")
-                    result_dict["title"] = result_dict["source"].get("document_name", "Document")
-                
-                return result_dict
-            
-            cacheable_results = {
-                "total_found": search_results["total_found"],
-                "returned": search_results["returned"],
-                "text_results": [serialize_result(r) for r in text_results],
-                "image_results": search_results.get("image_results", []),
-                "product_results": search_results.get("product_results", []),
-                "query_tokens": search_results["query_tokens"],
-                "embedding_model": search_results["embedding_model"],
-                "chunks_searched": search_results["chunks_searched"],
-                "search_time_ms": search_results["search_time_ms"]
+        Used to give keyword-only hits (BM25 index) a real vector score.
+        
+        Returns:
+            List of {"chunk_id", "score"} for chunks that have a stored vector
+        """
+        embeddings = self.get_chunk_embeddings(kb_id, chunk_ids)
+        
+        return [
+            {
+                "chunk_id": chunk_id,
+                "score": float(self._cosine_similarity(query_embedding, embeddings[chunk_id]))
             }
+            for chunk_id in chunk_ids
+            if chunk_id in embeddings
+        ]
+    
+    def get_chunk_embeddings(self, kb_id: str, chunk_ids: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Fetch stored embeddings for specific chunks in one MGET
+        
+        Returns:
+            Dict of chunk_id -> embedding (chunks without a vector are omitted)
+        """
+        if not chunk_ids:
+            return {}
+        
+        keys = [f"{self.prefix}{kb_id}:{chunk_id}" for chunk_id in chunk_ids]
+        embeddings = {}
+        
+        with track_redis("mget_embeddings"):
+            raw_values = self.redis_client.mget(keys)
+        
+        for chunk_id, raw in zip(chunk_ids, raw_values):
+            if not raw:
+                continue
+            try:
+                embeddings[chunk_id] = np.array(json.loads(raw)["embedding"], dtype=np.float32)
+            except Exception as e:
+                logger.error(f"Error loading embedding for chunk {chunk_id}: {e}")
+        
+        return embeddings
+    
+    async def search_text(
+        self,
+        kb_id: str,
+        query_matrix: np.ndarray,
+        top_k: int,
+        spans: Optional[SpanRecorder] = None
+    ) -> Tuple[List[Any], int]:
+        """
+        Score KB chunks against query vector(s) and enrich the top results
+        
+        Args:
+            kb_id: Knowledge base ID
+            query_matrix: 1 x D query embedding (or V x D variants, RRF-fused)
+            top_k: Number of results
+            spans: Optional SpanRecorder for per-stage timings
             
-            await self.semantic_cache.cache_result(
-                kb_id=kb_id,
-                query=query,
-                query_embedding=query_embedding.tolist(),
-                results=cacheable_results,
-                search_type=search_type,
-                metadata={
-                    'top_k': top_k,
-                    'filters': filters
-                }
-            )
+        Returns:
+            (TextResult list, number of chunks searched)
+        """
+        spans = spans or SpanRecorder()
+        top_results, chunks_searched = self._score_kb(kb_id, query_matrix, top_k, spans=spans)
+        with spans.span("enrichment"):
+            text_results = await self._enrich_results(top_results)
+        return text_results, chunks_searched
+    
+    def _load_kb_vectors(self, kb_id: str, batch_size: int = 500) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """
+        Load all document chunk vectors of a KB (products excluded)
         
-        return search_results
+        Returns:
+            (chunk metadata list, N x D embedding matrix) in matching order
+        """
+        pattern = f"{self.prefix}{kb_id}:*"
+        with track_redis("keys"):
+            document_keys = [k for k in self.redis_client.keys(pattern) if b':product:' not in k]
+        
+        chunks = []
+        vectors = []
+        
+        for i in range(0, len(document_keys), batch_size):
+            batch = document_keys[i:i + batch_size]
+            with track_redis("mget_vectors"):
+                raw_values = self.redis_client.mget(batch)
+            for key, raw in zip(batch, raw_values):
+                if not raw:
+                    continue
+                try:
+                    vector_data = json.loads(raw)
+                    vectors.append(vector_data["embedding"])
+                    chunks.append({
+                        "chunk_id": vector_data["chunk_id"],
+                        "document_id": vector_data["document_id"],
+                        "content": vector_data.get("content", ""),
+                        "chunk_type": vector_data.get("chunk_type", "text"),
+                        "metadata": vector_data.get("metadata", {})
+                    })
+                except Exception as e:
+                    logger.error(f"Error processing vector {key}: {e}")
+                    continue
+        
+        matrix = np.array(vectors, dtype=np.float32) if vectors else np.zeros((0, 0), dtype=np.float32)
+        return chunks, matrix
+    
+    @staticmethod
+    def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+        """L2-normalize rows (zero rows stay zero, i.e. similarity 0)"""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+    
+    def _score_kb(
+        self,
+        kb_id: str,
+        query_matrix: np.ndarray,
+        top_k: int,
+        rrf_k: int = 60,
+        spans: Optional[SpanRecorder] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Score all KB chunks against one or more query vectors
+        
+        Similarities are a single (V x D) . (D x N) product. With several
+        query vectors, each variant's top_k ranking is fused with Reciprocal
+        Rank Fusion; the result 'score' stays the best cosine across variants
+        so thresholds keep working, with 'rrf_score' alongside.
+        
+        Returns:
+            (top results, number of chunks searched)
+        """
+        spans = spans or SpanRecorder()
+        
+        with spans.span("redis_load"):
+            chunks, matrix = self._load_kb_vectors(kb_id)
+        if not chunks:
+            return [], 0
+        
+        with spans.span("scoring"):
+            similarities = self._normalize_rows(query_matrix) @ self._normalize_rows(matrix).T
+        n = len(chunks)
+        k = min(top_k, n)
+        
+        def top_indices(row: np.ndarray) -> np.ndarray:
+            idx = np.argpartition(-row, k - 1)[:k]
+            return idx[np.argsort(-row[idx])]
+        
+        if similarities.shape[0] == 1:
+            return [
+                {**chunks[i], "score": float(similarities[0, i])}
+                for i in top_indices(similarities[0])
+            ], n
+        
+        rrf_scores: Dict[int, float] = {}
+        for row in similarities:
+            for rank, i in enumerate(top_indices(row), 1):
+                rrf_scores[int(i)] = rrf_scores.get(int(i), 0.0) + 1.0 / (rrf_k + rank)
+        
+        best_similarity = similarities.max(axis=0)
+        fused = sorted(rrf_scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
+        
+        return [
+            {**chunks[i], "score": float(best_similarity[i]), "rrf_score": rrf}
+            for i, rrf in fused
+        ], n
     
     def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
         """Calculate cosine similarity between two vectors"""
@@ -503,8 +766,9 @@ class VectorStore:
                 WHERE c.id IN ({placeholders})
             """
             
-            cursor.execute(query, chunk_ids)
-            chunks = cursor.fetchall()
+            with track_mysql("enrich_chunks"):
+                cursor.execute(query, chunk_ids)
+                chunks = cursor.fetchall()
             
             # Create lookup
             chunk_map = {c["chunk_id"]: c for c in chunks}
@@ -532,7 +796,8 @@ class VectorStore:
                     },
                     score=result["score"],
                     scoring_details={
-                        "cosine_similarity": result["score"]
+                        "cosine_similarity": result["score"],
+                        **({"rrf_score": result["rrf_score"]} if "rrf_score" in result else {})
                     },
                     highlight=None
                 ))
@@ -543,6 +808,24 @@ class VectorStore:
             cursor.close()
             conn.close()
     
+    async def get_stored_chunk_ids(self, document_id: str) -> set:
+        """IDs of the chunks already stored for a document (resuming ingestion)"""
+        def query():
+            conn = self._get_mysql_connection()
+            cursor = conn.cursor()
+            try:
+                with track_mysql("select_chunk_ids"):
+                    cursor.execute(
+                        "SELECT id FROM yovo_tbl_aiva_document_chunks WHERE document_id = %s",
+                        (document_id,)
+                    )
+                    return {row[0] for row in cursor.fetchall()}
+            finally:
+                cursor.close()
+                conn.close()
+        
+        return await asyncio.to_thread(query)
+    
     async def delete_document(self, document_id: str):
         """Delete all vectors for a document"""
         conn = self._get_mysql_connection()
@@ -557,9 +840,17 @@ class VectorStore:
             chunks = cursor.fetchall()
             
             # Delete from Redis
+            chunk_ids_by_kb: Dict[str, List[str]] = {}
             for chunk_id, kb_id in chunks:
                 vector_key = f"{self.prefix}{kb_id}:{chunk_id}"
                 self.redis_client.delete(vector_key)
+                chunk_ids_by_kb.setdefault(kb_id, []).append(chunk_id)
+            
+            for kb_id, chunk_ids in chunk_ids_by_kb.items():
+                try:
+                    self.bm25_index.remove_chunks(kb_id, chunk_ids)
+                except Exception as e:
+                    logger.error(f"BM25 index cleanup failed for KB {kb_id}: {e}")
             
             # Delete from MySQL
             cursor.execute(
@@ -600,6 +891,7 @@ class VectorStore:
                 "kb_id": kb_id,
                 "total_chunks": total_chunks,
                 "total_vectors": vector_count,
+                "bm25_indexed_chunks": self.bm25_index.get_stats(kb_id)["doc_count"],
                 "embedding_model": settings.EMBEDDING_MODEL,
                 "vector_dimension": settings.EMBEDDING_DIMENSION
             }
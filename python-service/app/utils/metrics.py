@@ -0,0 +1,222 @@
+"""
+Prometheus metrics
+Request, OpenAI, Redis/MySQL, cache, image queue and ingest metrics
+
+Multi-worker (uvicorn --workers N):
+    Set PROMETHEUS_MULTIPROC_DIR to an empty, writable directory before the
+    service starts (clear it on every restart). Each worker then writes its
+    samples there and GET /metrics aggregates all workers.
+    Without it, /metrics only reports the worker that served the scrape.
+
+Ingest workers (python -m app.worker) are separate processes with their own
+exporter (INGEST_WORKER_METRICS_PORT), see start_metrics_server().
+
+If prometheus_client is not installed every helper here is a no-op.
+"""
+
+import os
+import time
+import logging
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from prometheus_client import (
+        Counter, Gauge, Histogram, CollectorRegistry, REGISTRY,
+        generate_latest, CONTENT_TYPE_LATEST
+    )
+    from prometheus_client import multiprocess
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or os.getenv("prometheus_multiproc_dir")
+
+# Latency buckets (seconds): sub-ms Redis calls up to multi-second LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+JOB_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 3600)
+
+
+class _NoopMetric:
+    """Stand-in when prometheus_client is missing"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, *args, **kwargs):
+        pass
+
+    def inc(self, *args, **kwargs):
+        pass
+
+    def dec(self, *args, **kwargs):
+        pass
+
+    def set(self, *args, **kwargs):
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    HTTP_REQUEST_DURATION = Histogram(
+        "aiva_http_request_duration_seconds", "HTTP request latency",
+        ["method", "route", "status"], buckets=LATENCY_BUCKETS
+    )
+    OPENAI_REQUEST_DURATION = Histogram(
+        "aiva_openai_request_duration_seconds", "OpenAI API call latency",
+        ["operation", "model"], buckets=LATENCY_BUCKETS
+    )
+    OPENAI_ERRORS = Counter(
+        "aiva_openai_errors_total", "OpenAI API call errors",
+        ["operation", "model"]
+    )
+    OPENAI_TOKENS = Counter(
+        "aiva_openai_tokens_total", "OpenAI tokens used",
+        ["operation", "model"]
+    )
+    REDIS_DURATION = Histogram(
+        "aiva_redis_operation_duration_seconds", "Redis operation latency",
+        ["operation"], buckets=LATENCY_BUCKETS
+    )
+    MYSQL_DURATION = Histogram(
+        "aiva_mysql_query_duration_seconds", "MySQL query latency",
+        ["operation"], buckets=LATENCY_BUCKETS
+    )
+    CACHE_REQUESTS = Counter(
+        "aiva_cache_requests_total", "Cache lookups by cache and result (hit/miss)",
+        ["cache", "result"]
+    )
+    IMAGE_QUEUE_WAITING = Gauge(
+        "aiva_image_queue_waiting", "Image tasks waiting for a queue slot",
+        multiprocess_mode="livesum"
+    )
+    IMAGE_QUEUE_ACTIVE = Gauge(
+        "aiva_image_queue_active", "Image tasks currently processing",
+        multiprocess_mode="livesum"
+    )
+    IMAGE_QUEUE_WAIT = Histogram(
+        "aiva_image_queue_wait_seconds", "Time image tasks wait for a queue slot",
+        buckets=LATENCY_BUCKETS
+    )
+    IMAGE_TASKS = Counter(
+        "aiva_image_tasks_total", "Image tasks processed by result",
+        ["result"]
+    )
+    INGEST_JOBS = Counter(
+        "aiva_ingest_jobs_total", "Document ingest jobs by final status",
+        ["status"]
+    )
+    INGEST_JOB_DURATION = Histogram(
+        "aiva_ingest_job_duration_seconds", "Document ingest job duration",
+        ["status"], buckets=JOB_BUCKETS
+    )
+    INGEST_CHUNKS = Counter(
+        "aiva_ingest_chunks_total", "Chunks ingested"
+    )
+    INGEST_PAGES = Counter(
+        "aiva_ingest_pages_total", "Pages ingested"
+    )
+else:
+    HTTP_REQUEST_DURATION = OPENAI_REQUEST_DURATION = OPENAI_ERRORS = OPENAI_TOKENS = _NoopMetric()
+    REDIS_DURATION = MYSQL_DURATION = CACHE_REQUESTS = _NoopMetric()
+    IMAGE_QUEUE_WAITING = IMAGE_QUEUE_ACTIVE = IMAGE_QUEUE_WAIT = IMAGE_TASKS = _NoopMetric()
+    INGEST_JOBS = INGEST_JOB_DURATION = INGEST_CHUNKS = INGEST_PAGES = _NoopMetric()
+
+
+def observe_http(method: str, route: str, status: int, seconds: float):
+    HTTP_REQUEST_DURATION.labels(method, route, str(status)).observe(seconds)
+
+
+@contextmanager
+def track_openai(operation: str, model: str):
+    """Time an OpenAI call; exceptions are counted and re-raised"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        OPENAI_ERRORS.labels(operation, model).inc()
+        raise
+    finally:
+        OPENAI_REQUEST_DURATION.labels(operation, model).observe(time.perf_counter() - start)
+
+
+def record_openai_tokens(operation: str, model: str, usage=None, tokens: Optional[int] = None):
+    """Count tokens from a response.usage object (or an explicit count)"""
+    if tokens is None and usage is not None:
+        tokens = getattr(usage, "total_tokens", None)
+    if tokens:
+        OPENAI_TOKENS.labels(operation, model).inc(tokens)
+
+
+@contextmanager
+def track_redis(operation: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REDIS_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def track_mysql(operation: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        MYSQL_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0):
+    """Count cache hits/misses (ratio = hit / (hit + miss) in PromQL)"""
+    if hits:
+        CACHE_REQUESTS.labels(cache, "hit").inc(hits)
+    if misses:
+        CACHE_REQUESTS.labels(cache, "miss").inc(misses)
+
+
+def record_ingest_job(status: str, seconds: float, chunks: int = 0, pages: int = 0):
+    INGEST_JOBS.labels(status).inc()
+    INGEST_JOB_DURATION.labels(status).observe(seconds)
+    if chunks:
+        INGEST_CHUNKS.inc(chunks)
+    if pages:
+        INGEST_PAGES.inc(pages)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Exposition payload for GET /metrics (aggregated across workers if multiprocess)"""
+    if not PROMETHEUS_AVAILABLE:
+        return b"# prometheus_client not installed\n", CONTENT_TYPE_LATEST
+
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> bool:
+    """Serve this process's metrics on host:port (standalone processes like the ingest worker)"""
+    if not PROMETHEUS_AVAILABLE or not port:
+        return False
+
+    try:
+        from prometheus_client import start_http_server
+        start_http_server(port, addr=host)
+        logger.info(f"Metrics exporter listening on {host}:{port}")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not start metrics exporter on {host}:{port}: {e}")
+        return False
+
+
+def mark_worker_dead():
+    """Drop this worker's live gauges on shutdown (multiprocess mode)"""
+    if PROMETHEUS_AVAILABLE and MULTIPROC_DIR:
+        try:
+            multiprocess.mark_process_dead(os.getpid())
+        except Exception as e:
+            logger.warning(f"Could not mark metrics process dead: {e}")
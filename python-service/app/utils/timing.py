@@ -0,0 +1,72 @@
+"""
+Request timing utilities
+Lightweight per-stage span recorder for search requests
+"""
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+
+
+class SpanRecorder:
+    """
+    Collects per-stage durations (ms) for a single request.
+
+    Usage:
+        spans = SpanRecorder()
+        with spans.span("embedding"):
+            ...
+        spans.as_dict()  # {"embedding": 123.4}
+
+    Repeated spans with the same name are summed.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name: str, duration_ms: float):
+        self.timings[name] = self.timings.get(name, 0.0) + duration_ms
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: round(ms, 1) for name, ms in self.timings.items()}
+
+
+def log_slow_query(
+    logger: logging.Logger,
+    spans: SpanRecorder,
+    threshold_ms: float,
+    **context: Any
+) -> bool:
+    """
+    Log a structured slow-query record if the request exceeded threshold_ms
+
+    Returns:
+        True if the record was logged
+    """
+    total_ms = spans.total_ms()
+    if threshold_ms <= 0 or total_ms < threshold_ms:
+        return False
+
+    record = {
+        "event": "slow_query",
+        "total_ms": round(total_ms, 1),
+        "threshold_ms": threshold_ms,
+        "timings": spans.as_dict(),
+        **context
+    }
+    logger.warning(f"SLOW_QUERY {json.dumps(record, default=str)}")
+    return True
@@ -0,0 +1,93 @@
+"""
+Upload utilities
+Chunked reading of multipart uploads with size enforcement
+
+UploadFile.read() with no size pulls the whole upload into memory. These
+helpers copy it in UPLOAD_CHUNK_SIZE pieces and stop as soon as the limit
+is exceeded; the upload's declared size is checked before anything is copied.
+"""
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Union
+
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
+class UploadTooLarge(ValueError):
+    """Upload exceeds the size limit (routes answer 413)"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"File size exceeds maximum of {max_bytes // (1024 * 1024)}MB")
+
+
+def _check_declared_size(upload: UploadFile, max_bytes: int):
+    size = getattr(upload, "size", None)
+    if size is not None and size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+
+async def save_upload(upload: UploadFile, path: Union[str, Path], max_bytes: int) -> int:
+    """
+    Stream an upload to a file
+
+    Args:
+        upload: Multipart upload
+        path: Destination file (parent directory must exist)
+        max_bytes: Size limit; the partial file is removed when exceeded
+
+    Returns:
+        Bytes written
+
+    Raises:
+        UploadTooLarge
+    """
+    _check_declared_size(upload, max_bytes)
+
+    size = 0
+    f = await asyncio.to_thread(open, path, 'wb')
+    try:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        f.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    f.close()
+
+    return size
+
+
+async def read_upload(upload: UploadFile, max_bytes: int) -> bytes:
+    """
+    Read an upload into memory, chunk by chunk, up to max_bytes
+
+    For endpoints that need the bytes anyway (synchronous processing, images).
+
+    Raises:
+        UploadTooLarge
+    """
+    _check_declared_size(upload, max_bytes)
+
+    chunks = []
+    size = 0
+    while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        chunks.append(chunk)
+
+    return b"".join(chunks)
@@ -0,0 +1,212 @@
+"""
+Ingest Worker
+Consumes document and scrape jobs from the Redis Streams job queue
+
+Run one or more per node, next to (or instead of) the API:
+    python -m app.worker
+    python -m app.worker --concurrency 4 --name ingest-1
+
+Requires ENABLE_JOB_QUEUE=true on the API so uploads are queued instead of
+run as BackgroundTasks. Uploaded files are read from STORAGE_PATH, which
+must be shared when workers run on other nodes.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import sys
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from app.config import settings
+from app.services.job_queue import JobQueue, get_job_queue
+from app.utils.metrics import start_metrics_server
+
+# Configure logging (same format as the API)
+logging.basicConfig(
+    level=getattr(logging, settings.LOG_LEVEL),
+    format='%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)],
+    force=True
+)
+logger = logging.getLogger("app.worker")
+
+
+class IngestWorker:
+    """Run queued jobs with bounded concurrency, heartbeats and retries"""
+
+    def __init__(self, concurrency: int = None, name: str = None, queue: Optional[JobQueue] = None):
+        self.concurrency = max(1, concurrency or settings.INGEST_WORKER_CONCURRENCY)
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.queue = queue or get_job_queue()
+        self.heartbeat_interval = max(1, settings.JOB_VISIBILITY_TIMEOUT // 3)
+        self.active: Set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        """Stop taking new jobs; running jobs finish"""
+        if not self._stopping.is_set():
+            logger.info(f"Worker {self.name} stopping, waiting for {len(self.active)} running jobs...")
+            self._stopping.set()
+
+    async def run(self):
+        logger.info(f"Ingest worker {self.name} started (concurrency={self.concurrency})")
+
+        while not self._stopping.is_set():
+            free = self.concurrency - len(self.active)
+            if free <= 0:
+                await asyncio.wait(self.active, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            try:
+                jobs = await asyncio.to_thread(self.queue.reclaim, self.name, free)
+                if len(jobs) < free:
+                    jobs += await asyncio.to_thread(self.queue.read, self.name, free - len(jobs))
+            except Exception as e:
+                logger.error(f"Job queue read failed: {e}")
+                await asyncio.sleep(5)
+                continue
+
+            for job in jobs:
+                task = asyncio.create_task(self._run_job(job))
+                self.active.add(task)
+                task.add_done_callback(self.active.discard)
+
+        if self.active:
+            await asyncio.gather(*self.active, return_exceptions=True)
+        logger.info(f"Ingest worker {self.name} stopped")
+
+    async def _run_job(self, job: Dict[str, Any]):
+        if job["attempt"] > self.queue.max_attempts:
+            await self._give_up(job, "Worker lost or timed out on the final attempt")
+            return
+
+        stop_heartbeat = asyncio.Event()
+        heartbeat = asyncio.create_task(self._heartbeat(job, stop_heartbeat))
+        final_attempt = job["attempt"] >= self.queue.max_attempts
+
+        try:
+            logger.info(f"Running {job['type']} job {job['job_id']} (attempt {job['attempt']})")
+            await self._dispatch(job, final_attempt)
+        except Exception as e:
+            # A heartbeat landing after the retry's XCLAIM would reset its backoff
+            await self._stop_heartbeat(heartbeat, stop_heartbeat)
+            try:
+                await asyncio.to_thread(self.queue.retry_or_dead_letter, job, self.name, str(e))
+            except Exception as queue_error:
+                # Still pending - reclaimed after the visibility timeout
+                logger.error(f"Could not reschedule job {job['job_id']}: {queue_error}")
+            return
+        finally:
+            await self._stop_heartbeat(heartbeat, stop_heartbeat)
+
+        try:
+            await asyncio.to_thread(self.queue.ack, job)
+        except Exception as e:
+            logger.error(f"Could not ack job {job['job_id']}: {e}")
+
+    async def _dispatch(self, job: Dict[str, Any], final_attempt: bool):
+        from app.services.document_job_processor import get_document_job_processor
+
+        job_processor = get_document_job_processor()
+        payload = job["payload"]
+
+        if job["type"] == JobQueue.TYPE_DOCUMENT:
+            # Chunks stored by an earlier (lost) attempt are resumed from its
+            # checkpoint or removed by process_document_background
+            await job_processor.process_document_background(
+                document_id=payload["document_id"],
+                kb_id=payload["kb_id"],
+                tenant_id=payload["tenant_id"],
+                file_content=None,
+                filename=payload["filename"],
+                content_type=payload["content_type"],
+                metadata=payload.get("metadata") or {},
+                file_path=payload.get("file_path"),
+                final_attempt=final_attempt,
+                raise_errors=True
+            )
+        elif job["type"] == JobQueue.TYPE_SCRAPE:
+            await job_processor.process_scrape_job(
+                **payload, final_attempt=final_attempt, raise_errors=True
+            )
+        else:
+            raise ValueError(f"Unknown job type: {job['type']}")
+
+    async def _give_up(self, job: Dict[str, Any], error: str):
+        """Mark a job failed and dead-letter it without running it again"""
+        from app.services.document_job_processor import get_document_job_processor
+
+        job_processor = get_document_job_processor()
+        payload = job["payload"]
+
+        try:
+            if job["type"] == JobQueue.TYPE_DOCUMENT:
+                await job_processor.update_job_status(
+                    payload["document_id"],
+                    job_processor.STATUS_FAILED,
+                    current_step="Processing failed",
+                    error_message=error
+                )
+                await job_processor._update_document_failed(payload["document_id"], error)
+                job_processor.cleanup_temp_file(payload["document_id"])
+            elif job["type"] == JobQueue.TYPE_SCRAPE:
+                job_processor.redis_client.hset(f"scrape_job:{payload['job_id']}", mapping={
+                    "status": "failed",
+                    "progress": "100",
+                    "current_step": error,
+                    "error_message": error,
+                    "completed_at": datetime.now().isoformat()
+                })
+        except Exception as e:
+            logger.error(f"Could not mark job {job['job_id']} failed: {e}")
+
+        await asyncio.to_thread(self.queue.dead_letter, job, error)
+
+    async def _heartbeat(self, job: Dict[str, Any], stop: asyncio.Event):
+        # Stopped with an event rather than cancel(): a cancelled task would
+        # leave a to_thread heartbeat already in flight running
+        while True:
+            try:
+                await asyncio.wait_for(stop.wait(), self.heartbeat_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await asyncio.to_thread(self.queue.heartbeat, job, self.name)
+            except Exception as e:
+                logger.warning(f"Heartbeat failed for job {job['job_id']}: {e}")
+
+    @staticmethod
+    async def _stop_heartbeat(heartbeat: asyncio.Task, stop: asyncio.Event):
+        """Stop the heartbeat and wait for a call in flight to finish"""
+        stop.set()
+        await heartbeat
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="AIVA ingest worker")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Jobs run at once (default INGEST_WORKER_CONCURRENCY)")
+    parser.add_argument("--name", default=None, help="Consumer name (default hostname-pid)")
+    args = parser.parse_args()
+
+    worker = IngestWorker(concurrency=args.concurrency, name=args.name)
+    start_metrics_server(settings.INGEST_WORKER_METRICS_PORT, settings.INGEST_WORKER_METRICS_HOST)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        from app.services.extraction_pool import shutdown_extraction_pool
+        shutdown_extraction_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
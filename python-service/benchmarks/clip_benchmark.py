@@ -0,0 +1,215 @@
+"""
+CLIP Embedding Benchmark
+========================
+Image embedding throughput on generated images:
+
+    batch size    ImageProcessor.generate_image_embeddings (queue + batched forward pass)
+    concurrent    N in-flight single-image generate_image_embedding requests
+                  (uploads/searches), per micro-batching window
+
+Usage (from python-service/):
+    python -m benchmarks.clip_benchmark
+    python -m benchmarks.clip_benchmark --batch-sizes 1,8,16,32 --images 256 --json clip.json
+    python -m benchmarks.clip_benchmark --random-weights   # offline: same architecture, untrained
+    python -m benchmarks.clip_benchmark --batch-sizes "" --concurrency 1,8,32 --windows 0,5,10,20
+
+Reports images/sec, ms/image, speedup over batch size 1 and peak RSS per
+batch size; request p50/p95 latency, images/sec and average micro-batch
+size per concurrency and window. --random-weights builds ViT-B/32 from its
+default config instead of downloading openai/clip-vit-base-patch32;
+throughput is the same.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import statistics
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.common import latency_summary
+from benchmarks.ingest_benchmark import RSSSampler
+
+
+def generate_images(count: int, width: int, height: int) -> List[Image.Image]:
+    """Deterministic noise + gradient RGB images (decoded, as PDF ingestion hands them to CLIP)"""
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    images = []
+    for _ in range(count):
+        noise = rng.integers(0, 96, (height, width, 3)).astype(np.float32)
+        pixels = np.clip(gradient * rng.random(3) + noise, 0, 255).astype(np.uint8)
+        images.append(Image.fromarray(pixels, "RGB"))
+    return images
+
+
+def use_random_weights():
+    """Make ImageProcessor build an untrained ViT-B/32 CLIP instead of downloading weights"""
+    from transformers import CLIPConfig, CLIPImageProcessor, CLIPModel, CLIPProcessor
+
+    class ImageOnlyProcessor(CLIPImageProcessor):
+        def __call__(self, images=None, padding=None, **kwargs):
+            return super().__call__(images=images, **kwargs)
+
+    CLIPModel.from_pretrained = classmethod(lambda cls, *args, **kwargs: cls(CLIPConfig()))
+    CLIPProcessor.from_pretrained = classmethod(lambda cls, *args, **kwargs: ImageOnlyProcessor())
+
+
+async def run_batch_size(processor, images: List[Image.Image], batch_size: int, args) -> Dict[str, Any]:
+    processor.batch_size = batch_size
+    processor.batch_memory_bytes = args.memory_mb * 1024 * 1024
+
+    for _ in range(args.warmup):
+        await processor.generate_image_embeddings(images[:batch_size])
+
+    seconds = []
+    with RSSSampler() as rss:
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            results = await processor.generate_image_embeddings(images)
+            seconds.append(time.perf_counter() - start)
+
+    assert len(results) == len(images)
+    wall = statistics.median(seconds)
+
+    return {
+        "batch_size": batch_size,
+        "images": len(images),
+        "seconds": wall,
+        "images_per_s": len(images) / wall,
+        "ms_per_image": wall * 1000 / len(images),
+        "peak_rss_mb": rss.peak_mb,
+    }
+
+
+async def run_concurrent(processor, images: List[Image.Image], concurrency: int, window_ms: float, args) -> Dict[str, Any]:
+    """len(images) single-image requests, `concurrency` in flight, through a fresh queue"""
+    from app.services.image_queue import ImageProcessingQueue
+
+    processor.queue = ImageProcessingQueue(
+        max_concurrent=args.queue_concurrency,
+        batch_window_ms=window_ms,
+        max_batch_size=args.max_batch
+    )
+
+    for image in images[:args.warmup]:
+        await processor.generate_image_embedding(image)
+    processor.queue.reset_stats()
+
+    latencies = []
+    next_index = 0
+
+    async def client():
+        nonlocal next_index
+        while next_index < len(images):
+            image = images[next_index]
+            next_index += 1
+            start = time.perf_counter()
+            await processor.generate_image_embedding(image)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    summary = latency_summary(latencies, time.perf_counter() - start)
+    stats = processor.queue.get_stats()
+
+    return {
+        "concurrency": concurrency,
+        "window_ms": window_ms,
+        "requests": len(images),
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "images_per_s": summary["throughput_per_s"],
+        "avg_batch": stats["avg_micro_batch_size"] or 1.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="CLIP image embedding throughput by batch size and concurrent requests")
+    parser.add_argument("--batch-sizes", default="1,4,8,16,32")
+    parser.add_argument("--images", type=int, default=128, help="Images embedded per run")
+    parser.add_argument("--size", default="640x480", help="Generated image size (WxH)")
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs per batch size (median reported)")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--memory-mb", type=int, default=4096, help="CLIP_BATCH_MEMORY_MB for the runs")
+    parser.add_argument("--concurrency", default="", help="Concurrent single-image requests, e.g. 1,8,32 (empty = skip)")
+    parser.add_argument("--windows", default="0,10", help="CLIP_MICROBATCH_WINDOW_MS values for --concurrency (0 = off)")
+    parser.add_argument("--max-batch", type=int, default=16, help="Max micro-batch size (CLIP_BATCH_SIZE)")
+    parser.add_argument("--queue-concurrency", type=int, default=1, help="IMAGE_PROCESSING_CONCURRENCY")
+    parser.add_argument("--threads", type=int, default=None, help="torch threads (ImageProcessor default: 2 on CPU)")
+    parser.add_argument("--random-weights", action="store_true", help="Offline: untrained model, same architecture")
+    parser.add_argument("--json", default=None, help="Write result rows to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show service logs")
+    args = parser.parse_args()
+
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b.strip()]
+    concurrencies = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    windows = [float(w) for w in args.windows.split(",") if w.strip()]
+    width, height = (int(v) for v in args.size.lower().split("x"))
+
+    # Settings validation needs these even though nothing talks to the real services
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    os.environ.setdefault("DB_PASSWORD", "offline-benchmark")
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    if args.random_weights:
+        use_random_weights()
+
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext()
+    with quiet:
+        import torch
+        from app.services.image_processor import ImageProcessor
+
+        processor = ImageProcessor()
+        if args.threads:
+            torch.set_num_threads(args.threads)
+
+    images = generate_images(args.images, width, height)
+    device = "cuda" if torch.cuda.is_available() else f"cpu ({torch.get_num_threads()} threads)"
+
+    print(
+        f"CLIP benchmark | {args.images} images {width}x{height} | runs: {args.runs} | device: {device} | "
+        f"weights: {'random' if args.random_weights else 'openai/clip-vit-base-patch32'}"
+    )
+    rows = []
+    if batch_sizes:
+        print(f"{'batch':>6}{'seconds':>10}{'img/s':>9}{'ms/img':>9}{'speedup':>9}{'peak RSS':>10}")
+    for batch_size in batch_sizes:
+        with quiet:
+            row = await run_batch_size(processor, images, batch_size, args)
+        baseline = rows[0]["images_per_s"] if rows and rows[0]["batch_size"] == 1 else None
+        row["speedup"] = row["images_per_s"] / baseline if baseline else (1.0 if batch_size == 1 else None)
+        rows.append(row)
+        speedup = f"{row['speedup']:.2f}x" if row["speedup"] else "-"
+        print(
+            f"{batch_size:>6}{row['seconds']:>10.2f}{row['images_per_s']:>9.1f}{row['ms_per_image']:>9.1f}"
+            f"{speedup:>9}{row['peak_rss_mb']:>9.0f}M"
+        )
+
+    if concurrencies:
+        print(f"\n{'clients':>8}{'window':>8}{'p50 ms':>9}{'p95 ms':>9}{'img/s':>9}{'avg batch':>11}")
+    for concurrency in concurrencies:
+        for window_ms in windows:
+            with quiet:
+                row = await run_concurrent(processor, images, concurrency, window_ms, args)
+            rows.append(row)
+            print(
+                f"{concurrency:>8}{window_ms:>8.0f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+                f"{row['images_per_s']:>9.1f}{row['avg_batch']:>11.1f}"
+            )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\nWrote {len(rows)} rows to {args.json}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,26 @@
+"""
+Shared benchmark helpers
+"""
+
+import math
+import statistics
+from typing import Dict, List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def latency_summary(latencies_ms: List[float], wall_seconds: float) -> Dict[str, float]:
+    """p50/p95/p99/mean latency (ms) and throughput (ops/s) for one run"""
+    return {
+        "count": len(latencies_ms),
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+        "mean_ms": statistics.mean(latencies_ms),
+        "throughput_per_s": len(latencies_ms) / wall_seconds if wall_seconds > 0 else 0.0,
+    }
@@ -0,0 +1,161 @@
+"""
+Generated fixture documents for ingestion benchmarks
+
+generate_document(fmt, pages) builds an in-memory document of roughly
+`pages` pages (slides, sheets-worth of rows, sections) filled with
+synthetic paragraphs, headings and a table per page where the format has
+tables.
+"""
+
+import io
+import json
+import random
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.standins import TOPICS, synthetic_paragraph
+
+FORMATS = ["pdf", "docx", "pptx", "xlsx", "html", "md", "json"]
+
+CONTENT_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "html": "text/html",
+    "md": "text/markdown",
+    "json": "application/json",
+}
+
+PARAGRAPHS_PER_PAGE = 4
+TABLE_ROWS_PER_PAGE = 8
+
+
+def _page_content(rng: random.Random, page: int) -> Dict[str, Any]:
+    topic = list(TOPICS)[page % len(TOPICS)]
+    words = TOPICS[topic]
+    return {
+        "heading": f"{topic.title()} - section {page + 1}",
+        "paragraphs": [synthetic_paragraph(rng, words, rng.randint(50, 110)) for _ in range(PARAGRAPHS_PER_PAGE)],
+        "table": [["Item", "Code", "Quantity", "Rate"]] + [
+            [rng.choice(words).title(), f"{topic[:3].upper()}-{page}{r:02d}", str(rng.randint(1, 500)), f"{rng.uniform(10, 9999):.2f}"]
+            for r in range(TABLE_ROWS_PER_PAGE)
+        ],
+    }
+
+
+def _pdf(pages: List[Dict[str, Any]]) -> bytes:
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    for page in pages:
+        pdf_page = doc.new_page()
+        lines = [page["heading"], ""] + page["paragraphs"] + [""] + ["  |  ".join(row) for row in page["table"]]
+        pdf_page.insert_textbox(fitz.Rect(50, 50, 545, 800), "\n".join(lines), fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _docx(pages: List[Dict[str, Any]]) -> bytes:
+    from docx import Document
+
+    doc = Document()
+    for page in pages:
+        doc.add_heading(page["heading"], level=1)
+        for paragraph in page["paragraphs"]:
+            doc.add_paragraph(paragraph)
+        table = doc.add_table(rows=len(page["table"]), cols=len(page["table"][0]))
+        for r, row in enumerate(page["table"]):
+            for c, value in enumerate(row):
+                table.cell(r, c).text = value
+        doc.add_page_break()
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def _pptx(pages: List[Dict[str, Any]]) -> bytes:
+    from pptx import Presentation
+
+    prs = Presentation()
+    layout = prs.slide_layouts[1]  # Title and content
+    for page in pages:
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = page["heading"]
+        slide.placeholders[1].text = "\n".join(page["paragraphs"])
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
+
+
+def _xlsx(pages: List[Dict[str, Any]]) -> bytes:
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    sheet = wb.active
+    sheet.title = "Data"
+    sheet.append(pages[0]["table"][0] + ["Notes"])
+    for page in pages:
+        for row, note in zip(page["table"][1:], page["paragraphs"] * 2):
+            sheet.append(row + [note[:200]])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def _html(pages: List[Dict[str, Any]]) -> bytes:
+    parts = ["<html><head><title>Benchmark document</title></head><body>"]
+    for page in pages:
+        parts.append(f"<h1>{page['heading']}</h1>")
+        parts.extend(f"<p>{p}</p>" for p in page["paragraphs"])
+        parts.append("<table>")
+        parts.extend("<tr>" + "".join(f"<td>{v}</td>" for v in row) + "</tr>" for row in page["table"])
+        parts.append("</table>")
+    parts.append("</body></html>")
+    return "\n".join(parts).encode("utf-8")
+
+
+def _markdown(pages: List[Dict[str, Any]]) -> bytes:
+    parts = []
+    for page in pages:
+        parts.append(f"# {page['heading']}\n")
+        parts.extend(f"{p}\n" for p in page["paragraphs"])
+        header, *rows = page["table"]
+        parts.append("| " + " | ".join(header) + " |")
+        parts.append("|" + "---|" * len(header))
+        parts.extend("| " + " | ".join(row) + " |" for row in rows)
+        parts.append("")
+    return "\n".join(parts).encode("utf-8")
+
+
+def _json(pages: List[Dict[str, Any]]) -> bytes:
+    data = {
+        "title": "Benchmark document",
+        "sections": [
+            {
+                "heading": page["heading"],
+                "paragraphs": page["paragraphs"],
+                "items": [dict(zip(page["table"][0], row)) for row in page["table"][1:]],
+            }
+            for page in pages
+        ],
+    }
+    return json.dumps(data, indent=2).encode("utf-8")
+
+
+_BUILDERS = {
+    "pdf": _pdf, "docx": _docx, "pptx": _pptx, "xlsx": _xlsx,
+    "html": _html, "md": _markdown, "json": _json,
+}
+
+
+def generate_document(fmt: str, pages: int, seed: int = 42) -> Tuple[str, str, bytes]:
+    """
+    Returns:
+        (filename, content_type, file bytes)
+    """
+    if fmt not in _BUILDERS:
+        raise ValueError(f"Unknown fixture format: {fmt}")
+    rng = random.Random(seed)
+    content = [_page_content(rng, p) for p in range(pages)]
+    return f"benchmark_{pages}p.{fmt}", CONTENT_TYPES[fmt], _BUILDERS[fmt](content)
@@ -0,0 +1,228 @@
+"""
+Ingestion Benchmark
+===================
+Per-format ingestion throughput on generated fixture documents, fully
+offline (see benchmarks/standins.py). Each document goes through the same
+stages as DocumentJobProcessor.process_document_background:
+
+    extract (DocumentProcessor._extract_content)
+    -> chunk (TextProcessor.process_text)
+    -> embed (_generate_embeddings_batched, fake provider)
+    -> store (VectorStore.store_document)
+
+Usage (from python-service/):
+    pip install fakeredis
+    python -m benchmarks.ingest_benchmark
+    python -m benchmarks.ingest_benchmark --formats pdf,docx --pages 50 --runs 5 --json ingest.json
+
+Reports per-stage time, ms/page, s/MB, chunks/sec and peak RSS per format.
+LLM table processing and PDF image extraction (CLIP) are disabled so only
+extraction and chunking code is measured.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import resource
+import statistics
+import threading
+import time
+import uuid
+from typing import Any, Dict, List
+
+from benchmarks.standins import install_standins
+from benchmarks.document_fixtures import FORMATS, generate_document
+
+STAGES = ["extract", "chunk", "embed", "store"]
+
+
+class RSSSampler:
+    """Track peak resident set size (MB) while active, sampling /proc every few ms"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current_mb() -> float:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+        except (OSError, ValueError):
+            # Non-Linux: lifetime peak only (KB on Linux, bytes on macOS)
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak / (1024 * 1024) if peak > 1 << 32 else peak / 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, self.current_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_mb = self.current_mb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, self.current_mb())
+
+
+async def ingest_once(services: Dict[str, Any], db, filename: str, content_type: str, content: bytes) -> Dict[str, Any]:
+    """Run one document through the ingestion stages; returns per-stage ms and chunk count"""
+    job_processor = services["job_processor"]
+    kb_id = "bench-ingest"
+    document_id = str(uuid.uuid4())
+
+    db.executemany(
+        "INSERT INTO yovo_tbl_aiva_documents (id, kb_id, tenant_id, filename, original_filename, file_type, status) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+        [(document_id, kb_id, "bench", filename, filename, content_type, "processing")]
+    )
+
+    timings = {}
+
+    start = time.perf_counter()
+    # No tenant_id: skips PDF image extraction (CLIP), as noted in the module docstring
+    extraction = await services["doc_processor"]._extract_content(
+        content, filename, content_type, document_id=document_id, kb_id=kb_id
+    )
+    timings["extract"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    processed = await services["text_processor"].process_text(
+        text=extraction["text"],
+        document_id=document_id,
+        kb_id=kb_id,
+        metadata={"filename": filename, "content_type": content_type, "pages": extraction.get("pages", 0)},
+        preserve_formatting=True
+    )
+    timings["chunk"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    embeddings = await job_processor._generate_embeddings_batched(
+        services["embedding_service"], processed["chunks"], document_id
+    )
+    timings["embed"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    await services["vector_store"].store_document(
+        document_id=document_id,
+        kb_id=kb_id,
+        tenant_id="bench",
+        chunks=processed["chunks"],
+        embeddings=embeddings["embeddings"]
+    )
+    timings["store"] = (time.perf_counter() - start) * 1000
+
+    return {"timings": timings, "chunks": len(processed["chunks"])}
+
+
+async def run_format(fmt: str, args, services: Dict[str, Any], db) -> Dict[str, Any]:
+    filename, content_type, content = generate_document(fmt, args.pages)
+    size_mb = len(content) / (1024 * 1024)
+
+    for _ in range(args.warmup):
+        await ingest_once(services, db, filename, content_type, content)
+
+    runs: List[Dict[str, Any]] = []
+    with RSSSampler() as rss:
+        for _ in range(args.runs):
+            runs.append(await ingest_once(services, db, filename, content_type, content))
+
+    stage_ms = {stage: statistics.mean(r["timings"][stage] for r in runs) for stage in STAGES}
+    total_ms = sum(stage_ms.values())
+    chunks = runs[0]["chunks"]
+
+    return {
+        "format": fmt,
+        "pages": args.pages,
+        "size_mb": size_mb,
+        "chunks": chunks,
+        **{f"{stage}_ms": ms for stage, ms in stage_ms.items()},
+        "total_ms": total_ms,
+        "ms_per_page": total_ms / args.pages,
+        "s_per_mb": (total_ms / 1000) / size_mb if size_mb else 0.0,
+        "chunks_per_s": chunks / (total_ms / 1000) if total_ms else 0.0,
+        "peak_rss_mb": rss.peak_mb,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline per-format ingestion throughput benchmark")
+    parser.add_argument("--formats", default=",".join(FORMATS), help=f"Comma-separated: {', '.join(FORMATS)}")
+    parser.add_argument("--pages", type=int, default=20, help="Pages (slides/sections) per generated document")
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs per format")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--redis-url", default=None, help="Use a local Redis instead of fakeredis")
+    parser.add_argument("--json", default=None, help="Write result rows to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show service logs and prints")
+    args = parser.parse_args()
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        parser.error(f"Unknown formats: {', '.join(unknown)}")
+
+    # LLM table extraction needs OpenAI - keep the benchmark offline
+    os.environ.setdefault("ENABLE_TABLE_PROCESSING", "false")
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext()
+    with quiet:
+        standins = install_standins(redis_url=args.redis_url)
+
+        from app.services.document_job_processor import DocumentJobProcessor
+        from app.services.document_processor import DocumentProcessor
+        from app.services.text_processor import TextProcessor
+        from app.services.embeddings import EmbeddingService
+        from app.services.vector_store import VectorStore
+
+        services = {
+            "job_processor": DocumentJobProcessor(),
+            "doc_processor": DocumentProcessor(),
+            "text_processor": TextProcessor(),
+            "embedding_service": EmbeddingService(),
+            "vector_store": VectorStore(),
+        }
+
+    print(
+        f"Ingestion benchmark | {args.pages} pages/doc | runs: {args.runs} | "
+        f"redis: {args.redis_url or 'fakeredis'} | mysql: sqlite stand-in | embeddings: fake"
+    )
+    print(
+        f"{'format':<7}{'MB':>7}{'chunks':>8}{'extract':>10}{'chunk':>9}{'embed':>9}{'store':>9}"
+        f"{'total ms':>10}{'ms/page':>9}{'s/MB':>8}{'chunks/s':>10}{'peak RSS':>10}"
+    )
+
+    rows = []
+    for fmt in formats:
+        try:
+            with quiet:
+                row = await run_format(fmt, args, services, standins["db"])
+        except Exception as e:
+            print(f"{fmt:<7}skipped: {e}")
+            continue
+        rows.append(row)
+        print(
+            f"{fmt:<7}{row['size_mb']:>7.2f}{row['chunks']:>8}{row['extract_ms']:>10.1f}{row['chunk_ms']:>9.1f}"
+            f"{row['embed_ms']:>9.1f}{row['store_ms']:>9.1f}{row['total_ms']:>10.1f}{row['ms_per_page']:>9.1f}"
+            f"{row['s_per_mb']:>8.2f}{row['chunks_per_s']:>10.1f}{row['peak_rss_mb']:>9.0f}M"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\nWrote {len(rows)} rows to {args.json}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
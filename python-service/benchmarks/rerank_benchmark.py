@@ -0,0 +1,132 @@
+"""
+Reranker Benchmark
+==================
+Compares latency and ranking quality of the rerankers on a labelled fixture.
+
+Usage (from python-service/):
+    python -m benchmarks.rerank_benchmark
+    python -m benchmarks.rerank_benchmark --rerankers simple,cross_encoder,llm --runs 5
+
+Quality is NDCG@k and MRR against the fixture's graded relevance labels;
+"vector" is the candidates' original order (no reranking) as a baseline.
+The LLM reranker runs with its score cache disabled and needs OPENAI_API_KEY.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import percentile
+
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "rerank_fixture.json")
+
+
+def ndcg_at_k(ranked: List[Dict[str, Any]], labels: Dict[str, int], k: int) -> float:
+    """NDCG@k with graded relevance"""
+    dcg = sum(
+        (2 ** labels.get(r["chunk_id"], 0) - 1) / math.log2(i + 2)
+        for i, r in enumerate(ranked[:k])
+    )
+    ideal = sorted(labels.values(), reverse=True)[:k]
+    idcg = sum((2 ** rel - 1) / math.log2(i + 2) for i, rel in enumerate(ideal))
+    return dcg / idcg if idcg else 0.0
+
+
+def reciprocal_rank(ranked: List[Dict[str, Any]], labels: Dict[str, int]) -> float:
+    """1 / rank of the first fully relevant (label 2) result"""
+    for i, r in enumerate(ranked):
+        if labels.get(r["chunk_id"], 0) >= 2:
+            return 1.0 / (i + 1)
+    return 0.0
+
+
+def build_reranker(name: str):
+    """Create a reranker with settings taken from the environment/config"""
+    from app.services.reranker import (
+        SimpleReranker, LLMReranker, CrossEncoderReranker
+    )
+    from app.config import settings
+
+    if name == "simple":
+        return SimpleReranker()
+    if name == "cross_encoder":
+        return CrossEncoderReranker(
+            model_path=settings.CROSS_ENCODER_MODEL_PATH,
+            max_length=settings.CROSS_ENCODER_MAX_LENGTH,
+            batch_size=settings.CROSS_ENCODER_BATCH_SIZE
+        )
+    if name in ("llm", "llm_pointwise"):
+        return LLMReranker(
+            model=settings.RERANKER_MODEL,
+            mode="pointwise" if name == "llm_pointwise" else "listwise",
+            enable_cache=False
+        )
+    raise ValueError(f"Unknown reranker: {name}")
+
+
+async def run_reranker(name: str, fixture: Dict[str, Any], top_k: int, runs: int) -> Dict[str, Any]:
+    reranker = build_reranker(name) if name != "vector" else None
+
+    latencies_ms: List[float] = []
+    ndcgs: List[float] = []
+    mrrs: List[float] = []
+
+    for item in fixture["queries"]:
+        query = item["query"]
+        candidates = item["candidates"]
+        labels = {c["chunk_id"]: c["relevance"] for c in candidates}
+
+        ranked = sorted(candidates, key=lambda c: c["score"], reverse=True)
+        for _ in range(runs):
+            start = time.perf_counter()
+            if reranker is not None:
+                ranked = await reranker.rerank(query, [dict(c) for c in candidates], top_k=len(candidates))
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        ndcgs.append(ndcg_at_k(ranked, labels, top_k))
+        mrrs.append(reciprocal_rank(ranked, labels))
+
+    return {
+        "reranker": name,
+        "ndcg": statistics.mean(ndcgs),
+        "mrr": statistics.mean(mrrs),
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "mean_ms": statistics.mean(latencies_ms),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark rerankers on a labelled fixture")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--rerankers", default="vector,simple,cross_encoder,llm",
+                        help="Comma-separated: vector, simple, cross_encoder, llm, llm_pointwise")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs per query")
+    args = parser.parse_args()
+
+    with open(args.fixture, "r", encoding="utf-8") as f:
+        fixture = json.load(f)
+
+    print(f"Fixture: {len(fixture['queries'])} queries | NDCG@{args.top_k} | runs/query: {args.runs}")
+    print(f"{'reranker':<15}{'NDCG':>8}{'MRR':>8}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+
+    for name in [n.strip() for n in args.rerankers.split(",") if n.strip()]:
+        try:
+            row = await run_reranker(name, fixture, args.top_k, args.runs)
+        except Exception as e:
+            print(f"{name:<15}skipped: {e}")
+            continue
+        print(
+            f"{row['reranker']:<15}{row['ndcg']:>8.3f}{row['mrr']:>8.3f}"
+            f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['mean_ms']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
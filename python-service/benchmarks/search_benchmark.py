@@ -0,0 +1,208 @@
+"""
+Search Benchmark
+================
+Latency (p50/p95/p99) and throughput of the search hot path on synthetic
+knowledge bases, fully offline (see benchmarks/standins.py).
+
+Usage (from python-service/):
+    pip install fakeredis
+    python -m benchmarks.search_benchmark
+    python -m benchmarks.search_benchmark --sizes 1000,10000,100000 --queries 50
+    python -m benchmarks.search_benchmark --targets enhanced --configs baseline,bm25,all
+    python -m benchmarks.search_benchmark --redis-url redis://localhost:6379/15 --json baseline.json
+
+Targets:
+    vector    VectorStore.search (text, semantic cache off unless --semantic-cache)
+    enhanced  EnhancedSearchService.search, once per feature config
+    products  ProductSearchService.search_products
+
+Query rewriting is not benchmarked (it needs the LLM); reranking uses the
+local SimpleReranker. Fake embeddings are much cheaper than the OpenAI call
+they replace, so numbers isolate Redis/scoring/MySQL/post-processing cost.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from benchmarks.common import latency_summary
+from benchmarks.standins import (
+    install_standins, seed_knowledge_base, clear_knowledge_base, generate_queries
+)
+
+ENHANCED_FEATURES = ["expansion", "multi_query", "bm25", "intent_filter", "mmr", "threshold", "reranking"]
+
+# Config name -> enabled features (everything else off)
+ENHANCED_CONFIGS: Dict[str, List[str]] = {
+    "baseline": [],
+    **{feature: [feature] for feature in ENHANCED_FEATURES},
+    "all": ENHANCED_FEATURES,
+}
+
+
+async def measure(
+    call: Callable[[str], Awaitable[Any]],
+    queries: List[str],
+    concurrency: int,
+    warmup: int
+) -> Dict[str, float]:
+    """Run call(query) for every query, `concurrency` at a time"""
+    for query in queries[:warmup]:
+        await call(query)
+
+    latencies_ms: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(query: str):
+        async with semaphore:
+            start = time.perf_counter()
+            await call(query)
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(timed(q) for q in queries))
+    return latency_summary(latencies_ms, time.perf_counter() - wall_start)
+
+
+def build_enhanced_service():
+    from app.services.enhanced_search import EnhancedSearchService
+    from app.services.query_expansion import get_query_expansion_service
+    from app.services.reranker import SimpleReranker
+
+    service = EnhancedSearchService()
+    service.vector_store.enable_cache = False
+    service.query_expansion_service = service.query_expansion_service or get_query_expansion_service()
+    service.reranker = SimpleReranker()
+    return service
+
+
+def enhanced_flags(features: List[str]) -> Dict[str, bool]:
+    return {f"use_{feature}": feature in features for feature in ENHANCED_FEATURES} | {"use_rewriting": False}
+
+
+async def run_size(size: int, args, standins: Dict[str, Any]) -> List[Dict[str, Any]]:
+    from app.services.vector_store import VectorStore
+
+    kb_id = f"bench-{size}"
+    num_products = max(100, size // 10) if "products" in args.targets else 0
+
+    seed_start = time.perf_counter()
+    seeded = seed_knowledge_base(kb_id, size, standins["db"], num_products=num_products)
+    print(
+        f"\nKB {kb_id}: {seeded['chunks']} chunks, {seeded['documents']} documents, "
+        f"{seeded['products']} products (seeded in {time.perf_counter() - seed_start:.1f}s)"
+    )
+
+    queries = generate_queries(args.queries)
+    rows = []
+
+    def record(target: str, config: str, stats: Dict[str, float]):
+        row = {"size": size, "target": target, "config": config, **stats}
+        rows.append(row)
+        print(
+            f"{size:>8}  {target:<9}{config:<15}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+            f"{row['p99_ms']:>9.1f}{row['throughput_per_s']:>9.1f}"
+        )
+
+    print(f"{'size':>8}  {'target':<9}{'config':<15}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'qps':>9}")
+
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext()
+
+    try:
+        if "vector" in args.targets:
+            vector_store = VectorStore()
+            vector_store.enable_cache = args.semantic_cache
+
+            async def vector_call(query: str):
+                return await vector_store.search(kb_id=kb_id, query=query, top_k=args.top_k, search_type="text")
+
+            with quiet:
+                stats = await measure(vector_call, queries, args.concurrency, args.warmup)
+            record("vector", "semantic_cache" if args.semantic_cache else "default", stats)
+
+        if "enhanced" in args.targets:
+            service = build_enhanced_service()
+            for config in args.configs:
+                flags = enhanced_flags(ENHANCED_CONFIGS[config])
+
+                async def enhanced_call(query: str, flags=flags):
+                    return await service.search(kb_id=kb_id, query=query, top_k=args.top_k, search_type="text", **flags)
+
+                with quiet:
+                    stats = await measure(enhanced_call, queries, args.concurrency, args.warmup)
+                record("enhanced", config, stats)
+
+        if "products" in args.targets:
+            from app.services.product_search import ProductSearchService
+            from benchmarks.standins import FakeEmbeddingService
+
+            product_service = ProductSearchService()
+            embedder = FakeEmbeddingService()
+            product_queries = {q: embedder.embed(q) for q in generate_queries(args.queries, seed=11)}
+
+            async def product_call(query: str):
+                return await product_service.search_products(
+                    kb_id=kb_id, query_embedding=product_queries[query], top_k=args.top_k
+                )
+
+            with quiet:
+                stats = await measure(product_call, list(product_queries), args.concurrency, args.warmup)
+            record("products", "default", stats)
+
+    finally:
+        clear_knowledge_base(kb_id)
+
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline search latency/throughput benchmark")
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="Comma-separated KB sizes in chunks (e.g. 1000,10000,100000)")
+    parser.add_argument("--targets", default="vector,enhanced,products",
+                        help="Comma-separated: vector, enhanced, products")
+    parser.add_argument("--configs", default=",".join(ENHANCED_CONFIGS),
+                        help=f"Enhanced search configs: {', '.join(ENHANCED_CONFIGS)}")
+    parser.add_argument("--queries", type=int, default=30, help="Timed queries per target/config")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--dimension", type=int, default=256, help="Fake embedding dimension")
+    parser.add_argument("--semantic-cache", action="store_true", help="Leave the semantic cache on for 'vector'")
+    parser.add_argument("--redis-url", default=None, help="Use a local Redis instead of fakeredis")
+    parser.add_argument("--json", default=None, help="Write result rows to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show service logs and prints")
+    args = parser.parse_args()
+
+    args.targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    args.configs = [c.strip() for c in args.configs.split(",") if c.strip()]
+    unknown = [c for c in args.configs if c not in ENHANCED_CONFIGS]
+    if unknown:
+        parser.error(f"Unknown configs: {', '.join(unknown)}")
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+    standins = install_standins(redis_url=args.redis_url, dimension=args.dimension)
+
+    print(
+        f"Search benchmark | redis: {args.redis_url or 'fakeredis'} | mysql: sqlite stand-in | "
+        f"embeddings: fake ({standins['embedding_dimension']}d) | queries: {args.queries} | "
+        f"concurrency: {args.concurrency}"
+    )
+
+    rows = []
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        rows.extend(await run_size(size, args, standins))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        print(f"\nWrote {len(rows)} rows to {args.json}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
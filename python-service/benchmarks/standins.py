@@ -0,0 +1,503 @@
+"""
+Offline Stand-ins
+=================
+Local replacements for the service's external dependencies so benchmarks
+run without network access (e.g. in CI):
+
+- Redis:      fakeredis (in-process), or a real local Redis via --redis-url
+- MySQL:      SQLiteMySQL - mysql.connector-compatible adapter over a shared
+              in-memory SQLite DB with the tables the search path queries
+- Embeddings: FakeEmbeddingService - deterministic hashed bag-of-words
+              vectors (texts sharing words get similar vectors), no OpenAI
+
+install_standins() must run BEFORE any app.services module is imported:
+services create their Redis/MySQL/embedding clients at construction time,
+and some (product_search_service) at import time.
+"""
+
+import datetime
+import json
+import os
+import random
+import re
+import sqlite3
+import zlib
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_DIMENSION = 256
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS yovo_tbl_aiva_documents (
+    id TEXT PRIMARY KEY, kb_id TEXT, tenant_id TEXT, filename TEXT,
+    original_filename TEXT, file_type TEXT, file_size_bytes INTEGER,
+    storage_url TEXT, status TEXT, processing_stats TEXT, error_message TEXT,
+    created_at TEXT, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS yovo_tbl_aiva_document_chunks (
+    id TEXT PRIMARY KEY, document_id TEXT, kb_id TEXT, chunk_index INTEGER,
+    content TEXT, chunk_type TEXT, metadata TEXT, created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_document ON yovo_tbl_aiva_document_chunks (document_id);
+CREATE TABLE IF NOT EXISTS yovo_tbl_aiva_images (
+    id TEXT PRIMARY KEY, kb_id TEXT, filename TEXT, width INTEGER, height INTEGER,
+    storage_url TEXT, metadata TEXT, description TEXT, created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS yovo_tbl_aiva_shopify_stores (
+    id TEXT PRIMARY KEY, kb_id TEXT, shop_domain TEXT
+);
+CREATE TABLE IF NOT EXISTS yovo_tbl_aiva_products (
+    id TEXT PRIMARY KEY, kb_id TEXT, shopify_store_id TEXT, shopify_product_id TEXT,
+    title TEXT, description TEXT, price REAL, compare_at_price REAL, vendor TEXT,
+    product_type TEXT, tags TEXT, status TEXT, total_inventory INTEGER,
+    shopify_metadata TEXT
+);
+CREATE TABLE IF NOT EXISTS yovo_tbl_aiva_product_variants (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, product_id TEXT, shopify_variant_id TEXT,
+    title TEXT, sku TEXT, price REAL, compare_at_price REAL,
+    inventory_quantity INTEGER, option1 TEXT, option2 TEXT, option3 TEXT,
+    available INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_variants_product ON yovo_tbl_aiva_product_variants (product_id);
+CREATE TABLE IF NOT EXISTS yovo_tbl_aiva_product_images (
+    product_id TEXT, image_id TEXT, position INTEGER
+);
+CREATE TABLE IF NOT EXISTS yovo_tbl_aiva_knowledge_bases (
+    id TEXT PRIMARY KEY, stats TEXT, updated_at TEXT
+);
+"""
+
+
+# ============================================================
+# MySQL stand-in
+# ============================================================
+
+class _SQLiteCursor:
+    """Subset of the mysql.connector cursor API used by the services"""
+
+    def __init__(self, conn: sqlite3.Connection, dictionary: bool = False):
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+
+    @staticmethod
+    def _translate(sql: str) -> str:
+        return sql.replace("%s", "?")
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {col[0]: value for col, value in zip(self._cursor.description, row)}
+
+    def execute(self, sql: str, params: Any = None):
+        self._cursor.execute(self._translate(sql), tuple(params or ()))
+
+    def executemany(self, sql: str, seq_of_params: Any):
+        self._cursor.executemany(self._translate(sql), [tuple(p) for p in seq_of_params])
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(r) for r in self._cursor.fetchall()]
+
+    def fetchmany(self, size: int = 1):
+        return [self._row(r) for r in self._cursor.fetchmany(size)]
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class _SQLiteConnection:
+    """Subset of the mysql.connector connection API used by the services"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def cursor(self, dictionary: bool = False, **kwargs):
+        return _SQLiteCursor(self._conn, dictionary=dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def is_connected(self) -> bool:
+        return True
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLiteMySQL:
+    """
+    mysql.connector stand-in backed by a shared in-memory SQLite database
+
+    Usage:
+        db = SQLiteMySQL()
+        mysql.connector.connect = db.connect   # every service connection hits SQLite
+    """
+
+    def __init__(self, name: str = "aiva_bench"):
+        self.uri = f"file:{name}?mode=memory&cache=shared"
+        # Keeps the shared in-memory DB alive for the lifetime of this object
+        self._anchor = self._open()
+        self._anchor.executescript(SCHEMA)
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        conn.create_function("NOW", 0, lambda: datetime.datetime.now().isoformat(sep=" "))
+        conn.create_function("JSON_UNQUOTE", 1, lambda value: value)
+        return conn
+
+    def connect(self, **kwargs) -> _SQLiteConnection:
+        return _SQLiteConnection(self._open())
+
+    def executemany(self, sql: str, rows: List[tuple]):
+        """Bulk-load rows (benchmark setup)"""
+        self._anchor.executemany(sql.replace("%s", "?"), rows)
+        self._anchor.commit()
+
+
+# ============================================================
+# Embedding stand-in
+# ============================================================
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class FakeEmbeddingService:
+    """
+    Deterministic, offline stand-in for EmbeddingService
+
+    Each token maps to a fixed pseudo-random vector (seeded by its CRC32);
+    a text's embedding is the normalized sum of its token vectors.
+    """
+
+    def __init__(self, dimension: int = None):
+        self.model = "fake-embedding"
+        self.dimension = dimension or int(os.getenv("BENCH_EMBEDDING_DIMENSION", DEFAULT_DIMENSION))
+        self._token_vectors: Dict[str, np.ndarray] = {}
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vec = self._token_vectors.get(token)
+        if vec is None:
+            rng = np.random.default_rng(zlib.crc32(token.encode("utf-8")))
+            vec = rng.standard_normal(self.dimension).astype(np.float32)
+            self._token_vectors[token] = vec
+        return vec
+
+    def embed(self, text: str) -> np.ndarray:
+        tokens = _TOKEN_RE.findall(text.lower())
+        if not tokens:
+            return np.zeros(self.dimension, dtype=np.float32)
+        vec = np.sum([self._token_vector(t) for t in tokens], axis=0)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def count_tokens(self, text: str) -> int:
+        return len(_TOKEN_RE.findall(text.lower()))
+
+    def prepare_text(self, text: str):
+        return text, self.count_tokens(text)
+
+    async def embed_batch(self, texts: List[str], model: str = None) -> Dict[str, Any]:
+        return {
+            "embeddings": [self.embed(t).tolist() for t in texts],
+            "tokens": sum(self.count_tokens(t) for t in texts)
+        }
+
+    async def generate_embedding(self, text: str, model: str = None) -> Dict[str, Any]:
+        if not text or not text.strip():
+            raise ValueError("Text cannot be empty")
+        embedding = self.embed(text).tolist()
+        return {
+            "embedding": embedding,
+            "model": self.model,
+            "tokens": self.count_tokens(text),
+            "dimension": len(embedding)
+        }
+
+    async def generate_batch_embeddings(self, texts: List[str], model: str = None) -> List[List[float]]:
+        texts = [t for t in texts if t and t.strip()]
+        return [self.embed(t).tolist() for t in texts]
+
+    async def generate_embeddings_for_chunks(self, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        embeddings = [
+            {
+                "chunk_id": chunk["chunk_id"],
+                "embedding": self.embed(chunk["content"]).tolist(),
+                "tokens": self.count_tokens(chunk["content"])
+            }
+            for chunk in chunks
+        ]
+        return {
+            "embeddings": embeddings,
+            "total_embeddings": len(embeddings),
+            "total_tokens": sum(e["tokens"] for e in embeddings),
+            "model": self.model,
+            "dimension": self.dimension
+        }
+
+
+# ============================================================
+# Installation
+# ============================================================
+
+def install_standins(redis_url: Optional[str] = None, dimension: int = None) -> Dict[str, Any]:
+    """
+    Route Redis, MySQL and embeddings to local stand-ins
+
+    Args:
+        redis_url: Use this (local) Redis instead of fakeredis
+        dimension: Fake embedding dimension
+
+    Returns:
+        {"redis": factory, "db": SQLiteMySQL, "embedding_dimension": int}
+    """
+    # Settings validation needs these even though nothing talks to the real services
+    os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+    os.environ.setdefault("DB_PASSWORD", "offline-benchmark")
+    if dimension:
+        os.environ["BENCH_EMBEDDING_DIMENSION"] = str(dimension)
+
+    import redis
+    import mysql.connector
+
+    if redis_url:
+        real_redis = redis.Redis
+
+        def redis_factory(*args, **kwargs):
+            return real_redis.from_url(redis_url, decode_responses=kwargs.get("decode_responses", False))
+    else:
+        try:
+            import fakeredis
+        except ImportError:
+            raise RuntimeError("fakeredis is required for offline benchmarks (pip install fakeredis) or pass --redis-url")
+
+        server = fakeredis.FakeServer()
+
+        def redis_factory(*args, **kwargs):
+            return fakeredis.FakeRedis(server=server, decode_responses=kwargs.get("decode_responses", False))
+
+    redis.Redis = redis_factory
+
+    db = SQLiteMySQL()
+    mysql.connector.connect = db.connect
+
+    import app.services.embeddings as embeddings_module
+    embeddings_module.EmbeddingService = FakeEmbeddingService
+
+    return {"redis": redis_factory, "db": db, "embedding_dimension": FakeEmbeddingService().dimension}
+
+
+# ============================================================
+# Synthetic knowledge bases
+# ============================================================
+
+TOPICS = {
+    "procurement": ["purchase", "order", "vendor", "requisition", "approval", "quotation", "po", "grn", "invoice", "delivery"],
+    "refunds": ["refund", "return", "damaged", "replacement", "policy", "days", "credit", "payment", "inspection", "claim"],
+    "accounts": ["password", "reset", "login", "account", "email", "locked", "security", "profile", "verification", "link"],
+    "tax": ["tax", "sales", "rate", "electronics", "import", "duty", "inclusive", "percent", "exempt", "filing"],
+    "inventory": ["stock", "reorder", "warehouse", "transfer", "alert", "level", "valuation", "item", "sku", "count"],
+    "shipping": ["shipping", "courier", "tracking", "dispatch", "city", "charges", "express", "cod", "parcel", "address"],
+}
+FILLER = [
+    "the", "a", "to", "and", "of", "for", "is", "in", "on", "with", "by", "from", "then",
+    "open", "select", "click", "enter", "confirm", "submit", "review", "check", "update",
+    "manager", "team", "customer", "system", "module", "settings", "page", "report", "record",
+]
+QUERY_TEMPLATES = [
+    "how to {a} {b}",
+    "what is the {a} {b} policy",
+    "{a} {b} {c}",
+    "steps to {a} the {b}",
+    "why is my {a} {b} not working",
+]
+PRODUCT_TYPES = ["shirt", "kurta", "shoes", "watch", "bag", "wallet", "scarf", "jacket"]
+PRODUCT_ADJECTIVES = ["cotton", "leather", "black", "white", "blue", "summer", "winter", "classic", "slim", "formal"]
+
+
+def synthetic_paragraph(rng: random.Random, topic_words: List[str], words: int) -> str:
+    out = []
+    for _ in range(words):
+        out.append(rng.choice(topic_words) if rng.random() < 0.45 else rng.choice(FILLER))
+    return " ".join(out).capitalize() + "."
+
+
+def generate_queries(count: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = TOPICS[rng.choice(list(TOPICS))]
+        a, b, c = rng.sample(words, 3)
+        queries.append(rng.choice(QUERY_TEMPLATES).format(a=a, b=b, c=c))
+    return queries
+
+
+def seed_knowledge_base(
+    kb_id: str,
+    num_chunks: int,
+    db: SQLiteMySQL,
+    chunks_per_document: int = 20,
+    images_per_document: int = 2,
+    num_products: int = 0,
+    seed: int = 42,
+    batch_size: int = 1000
+) -> Dict[str, int]:
+    """
+    Write a synthetic KB into the stand-ins exactly as ingestion stores it:
+    chunk vectors (vector:{kb}:{chunk}), BM25 postings, MySQL chunk/document/
+    image rows and, optionally, Shopify product vectors + rows.
+
+    Must be called after install_standins().
+    """
+    from app.config import settings
+    from app.services.bm25_index import get_bm25_index
+    import redis
+
+    rng = random.Random(seed)
+    embedder = FakeEmbeddingService()
+    redis_client = redis.Redis(decode_responses=False)
+    bm25_index = get_bm25_index()
+    prefix = settings.REDIS_VECTOR_PREFIX
+    topics = list(TOPICS)
+    now = datetime.datetime.now().isoformat(sep=" ")
+
+    num_documents = max(1, -(-num_chunks // chunks_per_document))
+    db.executemany(
+        "INSERT INTO yovo_tbl_aiva_documents (id, kb_id, tenant_id, filename, original_filename, file_type, status, created_at, updated_at) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        [
+            (f"{kb_id}-doc-{d}", kb_id, "bench", f"doc_{d}.pdf", f"Document {d}.pdf", "application/pdf", "completed", now, now)
+            for d in range(num_documents)
+        ]
+    )
+    db.executemany(
+        "INSERT INTO yovo_tbl_aiva_images (id, kb_id, filename, width, height, storage_url, metadata, description, created_at) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        [
+            (
+                f"{kb_id}-img-{d}-{i}", kb_id, f"doc_{d}.pdf", 800, 600, "",
+                json.dumps({"document_id": f"{kb_id}-doc-{d}", "page_number": i + 1, "image_index": i}),
+                None, now
+            )
+            for d in range(num_documents) for i in range(images_per_document)
+        ]
+    )
+
+    for start in range(0, num_chunks, batch_size):
+        rows = []
+        bm25_chunks = []
+        pipe = redis_client.pipeline(transaction=False)
+
+        for n in range(start, min(start + batch_size, num_chunks)):
+            document_id = f"{kb_id}-doc-{n // chunks_per_document}"
+            chunk_id = f"{kb_id}-chunk-{n}"
+            content = synthetic_paragraph(rng, TOPICS[topics[n % len(topics)]], rng.randint(60, 140))
+            embedding = np.round(embedder.embed(content), 6).tolist()
+
+            rows.append((chunk_id, document_id, kb_id, n % chunks_per_document, content, "text", "{}", now))
+            bm25_chunks.append({"chunk_id": chunk_id, "content": content})
+            pipe.set(f"{prefix}{kb_id}:{chunk_id}", json.dumps({
+                "chunk_id": chunk_id,
+                "document_id": document_id,
+                "kb_id": kb_id,
+                "embedding": embedding,
+                "content": content[:500],
+                "chunk_type": "text",
+                "metadata": {}
+            }))
+
+        pipe.execute()
+        bm25_index.index_chunks(kb_id, bm25_chunks)
+        db.executemany(
+            "INSERT INTO yovo_tbl_aiva_document_chunks (id, document_id, kb_id, chunk_index, content, chunk_type, metadata, created_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            rows
+        )
+
+    if num_products:
+        _seed_products(kb_id, num_products, db, redis_client, embedder, rng)
+
+    return {"chunks": num_chunks, "documents": num_documents, "products": num_products}
+
+
+def _seed_products(kb_id, num_products, db, redis_client, embedder, rng):
+    store_id = f"{kb_id}-store"
+    shop_domain = "bench-store.myshopify.com"
+    db.executemany(
+        "INSERT INTO yovo_tbl_aiva_shopify_stores (id, kb_id, shop_domain) VALUES (%s, %s, %s)",
+        [(store_id, kb_id, shop_domain)]
+    )
+
+    products = []
+    variants = []
+    pipe = redis_client.pipeline(transaction=False)
+
+    for n in range(num_products):
+        product_id = f"{kb_id}-product-{n}"
+        title = f"{rng.choice(PRODUCT_ADJECTIVES)} {rng.choice(PRODUCT_ADJECTIVES)} {rng.choice(PRODUCT_TYPES)}".title()
+        description = f"{title} by Bench Co. Comfortable, durable and available in multiple sizes."
+        price = round(rng.uniform(500, 15000), 2)
+        handle = title.lower().replace(" ", "-") + f"-{n}"
+        inventory = rng.randint(0, 50)
+
+        products.append((
+            product_id, kb_id, store_id, str(100000 + n), title, description, price, None,
+            "Bench Co", title.split()[-1].lower(), json.dumps([]), "active", inventory,
+            json.dumps({"handle": handle})
+        ))
+        for size in ("S", "M", "L"):
+            variants.append((product_id, f"{100000 + n}-{size}", size, f"SKU-{n}-{size}", price, None, inventory // 3, size, None, None, 1))
+
+        pipe.set(f"vector:{kb_id}:product:{product_id}", json.dumps({
+            "product_id": product_id,
+            "shopify_product_id": str(100000 + n),
+            "title": title,
+            "description": description,
+            "price": price,
+            "vendor": "Bench Co",
+            "product_type": title.split()[-1].lower(),
+            "tags": [],
+            "handle": handle,
+            "shop_domain": shop_domain,
+            "total_inventory": inventory,
+            "in_stock": inventory > 0,
+            "embedding": np.round(embedder.embed(f"{title} {description}"), 6).tolist()
+        }))
+
+    pipe.execute()
+    db.executemany(
+        "INSERT INTO yovo_tbl_aiva_products (id, kb_id, shopify_store_id, shopify_product_id, title, description, price, "
+        "compare_at_price, vendor, product_type, tags, status, total_inventory, shopify_metadata) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        products
+    )
+    db.executemany(
+        "INSERT INTO yovo_tbl_aiva_product_variants (product_id, shopify_variant_id, title, sku, price, compare_at_price, "
+        "inventory_quantity, option1, option2, option3, available) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        variants
+    )
+
+
+def clear_knowledge_base(kb_id: str):
+    """Remove a synthetic KB's Redis keys (matters when benchmarking a real local Redis)"""
+    from app.config import settings
+    import redis
+
+    client = redis.Redis(decode_responses=False)
+    for pattern in (f"{settings.REDIS_VECTOR_PREFIX}{kb_id}:*", f"vector:{kb_id}:*", f"bm25:{kb_id}:*"):
+        keys = list(client.scan_iter(match=pattern, count=1000))
+        for i in range(0, len(keys), 1000):
+            client.delete(*keys[i:i + 1000])